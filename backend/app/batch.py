@@ -0,0 +1,166 @@
+import os
+import logging
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .models import Invoice
+from .storage import save_upload, remove_file, UploadTooLarge, NotAPdf, UPLOAD_MAX_MB
+from .cache import DEDUP_MODE, find_duplicate, get_cached_many
+from .pipeline import apply_extractions, STATUS_PENDING, STATUS_DONE
+from .jobs import job_queue
+from .metrics import EXTRACTIONS
+
+log = logging.getLogger("invoice.batch")
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))
+ZIP_MAGIC = b"PK\x03\x04"
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+FAILED = "failed"
+
+
+@dataclass
+class BatchResult:
+    filename: str
+    status: str
+    invoice_id: Optional[int] = None
+    reason: Optional[str] = None
+    # Extraktion der angelegten Invoice: pending (in der Jobqueue) oder done (Cache-Treffer);
+    # weiterer Verlauf samt Fehler über GET /jobs/{invoice_id} bzw. GET /jobs?ids=...
+    job_status: Optional[str] = None
+
+
+class TooManyFiles(Exception):
+    pass
+
+
+def iter_sources(filename: str, src: BinaryIO) -> Iterator[Tuple[str, BinaryIO]]:
+    """Ein hochgeladenes Teil → (Name, Stream) je PDF; ZIP-Archive werden ausgepackt (gestreamt)."""
+    head = src.read(4)
+    src.seek(0)
+    if head != ZIP_MAGIC:
+        yield filename, src
+        return
+    with zipfile.ZipFile(src) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or os.path.basename(info.filename).startswith("."):
+                continue
+            with zf.open(info) as member:
+                yield f"{filename}/{info.filename}", member
+
+
+def ingest_batch(db: Session, uploads: List[Tuple[str, BinaryIO]]) -> List[BatchResult]:
+    """
+    Viele PDFs (oder ZIPs mit PDFs) auf einmal – wie POST /upload, nur je Datei:
+    1) Datei streamen + hashen, Duplikate erkennen
+    2) alle Invoices in einer Transaktion anlegen (ein Flush, ein Commit): Cache-Treffer sofort
+       fertig (Rohtexte/Positionen per executemany), sonst pending
+    3) pending-Invoices im Hintergrund in die Jobqueue einreihen
+    Die Extraktion läuft danach in der Jobqueue, nicht in diesem Request – ihr Ergebnis je Datei
+    über GET /jobs/{invoice_id} (job_status im Ergebnis ist der Stand beim Anlegen).
+    Eine kaputte Datei bricht den Batch nicht ab – sie bekommt status=failed. Scheitert dagegen
+    das Schreiben in die DB, scheitern alle Dateien des Batches (ihre Dateien werden gelöscht).
+    Duplikate (DEDUP_MODE != off) werden nicht erneut importiert, sondern mit der vorhandenen
+    invoice_id gemeldet.
+    """
+    results: List[BatchResult] = []
+    pending: List[Tuple[BatchResult, str, str]] = []  # (Ergebnis, Dateiname, Hash)
+    seen: Dict[str, BatchResult] = {}
+    batch_dups: List[Tuple[BatchResult, BatchResult]] = []  # (Duplikat, erstes Vorkommen im Batch)
+
+    # 1) Speichern
+    count = 0
+    for name, src in uploads:
+        try:
+            for member_name, stream in iter_sources(name, src):
+                count += 1
+                if count > BATCH_MAX_FILES:
+                    raise TooManyFiles()
+                res, entry = _store_one(db, member_name, stream, seen, batch_dups)
+                results.append(res)
+                if entry is not None:
+                    pending.append(entry)
+        except zipfile.BadZipFile:
+            results.append(BatchResult(name, FAILED, reason="Invalid ZIP archive"))
+        except TooManyFiles:
+            for _, uid, _ in pending:
+                remove_file(uid)
+            raise
+
+    # 2) eine Transaktion für den ganzen Batch
+    invoices = [
+        Invoice(source_file=uid, content_hash=content_hash, status=STATUS_PENDING, needs_review=1)
+        for _, uid, content_hash in pending
+    ]
+    cached: List[Tuple[Invoice, Dict]] = []
+    try:
+        db.add_all(invoices)
+        db.flush()
+        hits = get_cached_many(db, [inv.content_hash for inv in invoices])
+        cached = [(inv, hits[inv.content_hash]) for inv in invoices if inv.content_hash in hits]
+        for inv, _ in cached:
+            inv.status = STATUS_DONE
+        apply_extractions(db, cached)
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        log.warning(f"Batch: storing {len(pending)} invoices failed: {exc}")
+        for res, uid, _ in pending:
+            remove_file(uid)
+            res.reason = str(exc)[:500] or exc.__class__.__name__
+        pending, invoices, cached = [], [], []
+
+    queued: List[int] = []
+    for (res, _, _), inv in zip(pending, invoices):
+        res.status = CREATED
+        res.invoice_id = inv.id
+        res.job_status = inv.status
+        if inv.status == STATUS_PENDING:
+            queued.append(inv.id)
+    if cached:
+        EXTRACTIONS.inc(len(cached), result="cached")
+
+    # 3) Extraktion in der Jobqueue
+    job_queue.submit_all(queued, name="extract-batch")
+
+    for res, first in batch_dups:
+        res.invoice_id = first.invoice_id
+    created = len(invoices)
+    log.info(f"Batch: {created} created ({len(queued)} queued, {len(cached)} cached), "
+             f"{len(results) - created} skipped/failed")
+    return results
+
+
+def _store_one(
+    db: Session, name: str, stream: BinaryIO,
+    seen: Dict[str, BatchResult], batch_dups: List[Tuple[BatchResult, BatchResult]],
+) -> Tuple[BatchResult, Optional[Tuple[BatchResult, str, str]]]:
+    res = BatchResult(name, FAILED)
+    try:
+        uid, content_hash = save_upload(stream)
+    except NotAPdf:
+        res.reason = "Not a PDF"
+        return res, None
+    except UploadTooLarge:
+        res.reason = f"File larger than {UPLOAD_MAX_MB:g} MB"
+        return res, None
+
+    if DEDUP_MODE != "off":
+        first = seen.get(content_hash)
+        dup = find_duplicate(db, content_hash)
+        if first is not None or dup is not None:
+            remove_file(uid)
+            res.status = DUPLICATE
+            if dup is not None:
+                res.invoice_id = dup.id
+                res.reason = f"Duplicate of invoice {dup.id}"
+            else:
+                batch_dups.append((res, first))
+                res.reason = f"Duplicate of {first.filename}"
+            return res, None
+        seen[content_hash] = res
+    return res, (res, uid, content_hash)
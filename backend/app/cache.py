@@ -0,0 +1,135 @@
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import ExtractionCache, Invoice
+
+log = logging.getLogger("invoice.cache")
+
+# DEDUP_MODE:
+#   off    – jeder Upload wird neu gespeichert und extrahiert
+#   reuse  – gleiche Datei: gespeicherte Datei + gecachte Extraktion wiederverwenden (neue Invoice)
+#   reject – gleiche Datei: 409 mit Verweis auf die vorhandene Invoice
+DEDUP_MODE = os.getenv("DEDUP_MODE", "reuse").lower()
+# Obergrenze für den Cache (Summe aus Rohtext + JSON), älteste Einträge fliegen zuerst
+EXTRACTION_CACHE_MAX_MB = float(os.getenv("EXTRACTION_CACHE_MAX_MB", "256"))
+
+
+def cache_enabled() -> bool:
+    return DEDUP_MODE != "off"
+
+
+def find_duplicate(db: Session, content_hash: str) -> Optional[Invoice]:
+    """Älteste vorhandene Invoice mit identischem PDF-Inhalt."""
+    return (
+        db.query(Invoice)
+        .filter(Invoice.content_hash == content_hash)
+        .order_by(Invoice.id.asc())
+        .first()
+    )
+
+
+def get_cached(db: Session, content_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Gecachtes Ergebnis im Format von pipeline.run_extraction (oder None)."""
+    if not content_hash or not cache_enabled():
+        return None
+    entry = db.get(ExtractionCache, content_hash)
+    if entry is None:
+        return None
+    return _use(entry)
+
+
+def get_cached_many(db: Session, content_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Wie get_cached für viele Hashes (Batch-Upload) – eine Abfrage, nur Treffer."""
+    hashes = [h for h in set(content_hashes) if h]
+    if not hashes or not cache_enabled():
+        return {}
+    entries = db.query(ExtractionCache).filter(ExtractionCache.content_hash.in_(hashes)).all()
+    return {entry.content_hash: _use(entry) for entry in entries}
+
+
+def _use(entry: ExtractionCache) -> Dict[str, Any]:
+    entry.last_used_at = datetime.utcnow()
+    return {
+        "raw_text": entry.raw_text or "",
+        "parsed": json.loads(entry.parsed_json or "{}"),
+        "items": json.loads(entry.items_json or "[]"),
+    }
+
+
+def put_cached(db: Session, content_hash: Optional[str], result: Dict[str, Any]) -> None:
+    """
+    Ergebnis cachen – best effort: ein Fehler (z.B. Sperre) wird geloggt und nur dieser
+    Schreibvorgang (Savepoint) zurückgerollt, die Extraktion selbst zählt trotzdem.
+    Upsert statt get/add: zwei Jobs mit demselben Hash kollidieren sonst am Primärschlüssel.
+    """
+    if not content_hash or not cache_enabled():
+        return
+    if result.get("ocr_errors"):
+        # unvollständig (OCR einzelner Seiten fehlgeschlagen) – beim nächsten Mal neu versuchen
+        return
+    parsed_json = json.dumps(result["parsed"], default=str)
+    items_json = json.dumps(result["items"], default=str)
+    raw_text = result["raw_text"] or ""
+    values = {
+        "content_hash": content_hash,
+        "raw_text": raw_text,
+        "parsed_json": parsed_json,
+        "items_json": items_json,
+        "size_bytes": len(raw_text.encode("utf-8")) + len(parsed_json) + len(items_json),
+        "last_used_at": datetime.utcnow(),
+    }
+    try:
+        with db.begin_nested():
+            db.execute(_upsert(db.get_bind().dialect.name, values))
+            _evict(db)
+    except Exception as exc:
+        log.warning(f"Caching extraction for {content_hash} failed: {exc}")
+
+
+def _upsert(dialect: str, values: Dict[str, Any]):
+    """INSERT … ON CONFLICT/ON DUPLICATE KEY UPDATE für extraction_cache."""
+    changed = [k for k in values if k != "content_hash"]
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(ExtractionCache).values(**values)
+        return stmt.on_duplicate_key_update({k: stmt.inserted[k] for k in changed})
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f"No upsert for {dialect}")
+    stmt = insert(ExtractionCache).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=[ExtractionCache.content_hash], set_={k: stmt.excluded[k] for k in changed}
+    )
+
+
+def update_cached_header(db: Session, content_hash: Optional[str], parsed: Dict[str, Any]) -> None:
+    """Nach Neuberechnung der Kopffelder (Rohtext unverändert) den Cache-Eintrag nachziehen."""
+    if not content_hash or not cache_enabled():
+        return
+    entry = db.get(ExtractionCache, content_hash)
+    if entry is not None:
+        entry.parsed_json = json.dumps(parsed, default=str)
+
+
+def _evict(db: Session) -> None:
+    limit = int(EXTRACTION_CACHE_MAX_MB * 1024 * 1024)
+    total = db.query(func.coalesce(func.sum(ExtractionCache.size_bytes), 0)).scalar() or 0
+    if total <= limit:
+        return
+    removed = 0
+    for entry in db.query(ExtractionCache).order_by(ExtractionCache.last_used_at.asc()).limit(1000).all():
+        if total <= limit:
+            break
+        total -= entry.size_bytes or 0
+        db.delete(entry)
+        removed += 1
+    log.info(f"Evicted {removed} extraction cache entries")
@@ -1,8 +1,17 @@
 import os
-from sqlalchemy import create_engine
+import time
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
+from .metrics import DB_CONNECTION_SECONDS
+
 # .env im backend-Ordner laden
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
@@ -10,8 +19,125 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL missing in .env")
 
-# zum Debuggen bei Bedarf echo=True setzen
-engine = create_engine(DATABASE_URL, echo = True, pool_pre_ping=True)
+log = logging.getLogger("invoice.db")
+
+# -------- Engine-Einstellungen (Standard: leise, Produktion) --------
+# DB_ECHO: 0 = aus, 1 = SQL loggen, debug = zusätzlich Ergebniszeilen
+# DB_POOL_SIZE / DB_MAX_OVERFLOW: dauerhafte bzw. zusätzliche Verbindungen je Engine (sync und async)
+# DB_POOL_RECYCLE: Sekunden, danach wird eine Verbindung ersetzt (unter MySQLs wait_timeout halten)
+# DB_POOL_TIMEOUT: Sekunden Warten auf eine freie Verbindung, danach Fehler
+# DB_STATEMENT_TIMEOUT: ms je Statement (MySQL: max_execution_time, nur SELECT; 0 = aus)
+_echo = os.getenv("DB_ECHO", "0").lower()
+DB_ECHO: Any = "debug" if _echo == "debug" else _echo in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+
+
+class PoolStats:
+    """
+    Checkout-Statistik eines Pools aus den Pool-Events checkout/checkin: wie oft, wie lange
+    gehalten, höchste gleichzeitige Belegung (= size + max_overflow → Checkouts mussten warten).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.peak_checked_out = 0
+
+    def checked_out(self, in_use: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, in_use)
+
+    def checked_in(self, seconds: float) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.hold_total += seconds
+            self.hold_max = max(self.hold_max, seconds)
+
+    def snapshot(self, pool: Any) -> Dict[str, Any]:
+        with self._lock:
+            avg = self.hold_total / self.checkins if self.checkins else 0.0
+            data = {
+                "checkouts": self.checkouts,
+                "hold_avg_ms": round(avg * 1000, 3),
+                "hold_max_ms": round(self.hold_max * 1000, 3),
+                "peak_checked_out": self.peak_checked_out,
+            }
+        if isinstance(pool, QueuePool):
+            data.update(size=pool.size(), checked_in=pool.checkedin(),
+                        checked_out=pool.checkedout(), overflow=pool.overflow())
+        return data
+
+
+def _engine_kwargs(url: str, pool_class: type) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"echo": DB_ECHO, "pool_pre_ping": True}
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:"):
+        return kwargs  # In-Memory-SQLite: eigener Pool-Typ, Pool-Einstellungen passen nicht
+    kwargs.update(
+        poolclass=pool_class,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return kwargs
+
+
+def _install_statement_timeout(target: Engine) -> None:
+    if not DB_STATEMENT_TIMEOUT:
+        return
+    backend = target.dialect.name
+    if backend == "mysql":
+        sql = f"SET SESSION max_execution_time = {DB_STATEMENT_TIMEOUT}"
+    elif backend == "postgresql":
+        sql = f"SET statement_timeout = {DB_STATEMENT_TIMEOUT}"
+    else:
+        log.info(f"DB_STATEMENT_TIMEOUT not supported for {backend}, ignored")
+        return
+
+    @event.listens_for(target, "connect")
+    def _set_timeout(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            cur.execute(sql)
+        finally:
+            cur.close()
+
+
+def _install_pool_events(target: Engine, name: str, stats: PoolStats) -> None:
+    """
+    Haltedauer jeder Verbindung (Checkout → Checkin) ins Histogramm invoice_db_connection_seconds
+    und in `stats` (GET /db/pool) – über die öffentlichen Pool-Events.
+    """
+    @event.listens_for(target, "checkout")
+    def _checkout(_dbapi_conn, record, _proxy):
+        record.info["checkout_at"] = time.perf_counter()
+        # target.pool erst hier lesen – dispose() ersetzt den Pool (die Listener wandern mit)
+        pool = target.pool
+        stats.checked_out(pool.checkedout() if isinstance(pool, QueuePool) else 0)
+
+    @event.listens_for(target, "checkin")
+    def _checkin(_dbapi_conn, record):
+        t0 = record.info.pop("checkout_at", None)
+        if t0 is not None:
+            seconds = time.perf_counter() - t0
+            DB_CONNECTION_SECONDS.observe(seconds, engine=name)
+            stats.checked_in(seconds)
+
+
+pool_stats = {"sync": PoolStats(), "async": PoolStats()}
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL, QueuePool))
+_install_statement_timeout(engine)
+_install_pool_events(engine, "sync", pool_stats["sync"])
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
@@ -21,3 +147,41 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# -------- Async (API-Lesepfade, PATCH, DELETE) --------
+# gleicher Server, async-Treiber: mysql+pymysql → mysql+aiomysql, sqlite → sqlite+aiosqlite
+# ASYNC_DATABASE_URL überschreibt die Ableitung (z.B. mysql+asyncmy://...)
+_ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver known for {backend}, set ASYNC_DATABASE_URL")
+    return u.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool)
+)
+_install_statement_timeout(async_engine.sync_engine)
+_install_pool_events(async_engine.sync_engine, "async", pool_stats["async"])
+# expire_on_commit=False: nach commit keine impliziten (im Async-Kontext verbotenen) Lazy-Loads
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_status() -> Dict[str, Dict[str, Any]]:
+    """Pool-Auslastung + Checkout-Statistik beider Engines (GET /db/pool)."""
+    return {
+        "sync": pool_stats["sync"].snapshot(engine.pool),
+        "async": pool_stats["async"].snapshot(async_engine.sync_engine.pool),
+    }
@@ -0,0 +1,267 @@
+from __future__ import annotations
+import re
+import time
+import logging
+import unicodedata
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from app.metrics import OCR_PAGES, OCR_SECONDS, stage
+from .ocr import OCR_ZOOM, get_pool, ocr_pages, _ocr_fitz_page, _native_zoom
+from .words import WordTable, words_to_text, layout_text
+
+log = logging.getLogger("invoice.document")
+
+# Textlayer-Qualität je Seite – Seiten, die durchfallen, werden OCR't:
+# MIN_PAGE_CHARS: so viele Buchstaben/Ziffern braucht eine Seite mit seitenfüllendem Scan-Bild
+#   mindestens (ein Streuzeichen auf einem Scan reicht nicht, um OCR zu unterdrücken). Seiten
+#   ohne Scan-Bild genügt ein sauberer Textlayer beliebiger Länge (kurze letzte Seite).
+# MAX_GARBAGE_RATIO: Anteil unlesbarer Zeichen ((cid:NN), U+FFFD, Steuer-/Private-Use-Zeichen),
+#   ab dem der Textlayer als kaputt gilt (fehlende ToUnicode-Tabellen)
+MIN_PAGE_CHARS = 30
+MAX_GARBAGE_RATIO = 0.2
+_CID_RE = re.compile(r"\(cid:\d+\)")
+_GARBAGE_CATEGORIES = {"Cc", "Cf", "Co", "Cn", "Cs"}
+
+# Zeilen-Toleranz für den Rohtext aus dem Textlayer (wie pdfplumber: 3 pt)
+TEXT_Y_TOLERANCE = 3.0
+
+
+def text_layer_ok(text: Optional[str], min_chars: int = MIN_PAGE_CHARS) -> bool:
+    """Ist der Textlayer einer Seite brauchbar (dicht genug, wenig Zeichensalat)?"""
+    chars = [c for c in _CID_RE.sub("\ufffd", text or "") if not c.isspace()]
+    if sum(1 for c in chars if c.isalnum()) < max(1, min_chars):
+        return False
+    garbage = sum(1 for c in chars if c == "\ufffd" or unicodedata.category(c) in _GARBAGE_CATEGORIES)
+    return garbage <= MAX_GARBAGE_RATIO * len(chars)
+
+
+class Document:
+    """
+    Ein PDF, pro Extraktion genau einmal geöffnet (PyMuPDF) und von text_reader (Rohtext für
+    rules.py) und items_ocr (Wortboxen für _cluster_rows) gemeinsam benutzt.
+    Alles lazy und je Seite höchstens einmal: Textlayer-Wörter, Rohtext, OCR.
+    pdfplumber/pypdf werden nur für die Seite gelesen, die es braucht: PyMuPDF kann das PDF nicht
+    öffnen, oder die Seite hat Text, der nicht brauchbar ist (andere Decoder, andere Chancen) –
+    nicht für leere oder Scan-Seiten, die ohnehin OCR'd werden. Beide werden höchstens einmal
+    je Document geöffnet.
+    OCR nur für Seiten ohne brauchbaren Textlayer (_layer_ok); schlägt es für eine Seite fehl,
+    bleibt nur diese leer (`ocr_errors`), der Rest des Dokuments zählt weiter.
+    Seitenbilder werden nicht aufgehoben – nur das OCR-Ergebnis; im Prozess-Pool bekommt jeder
+    Worker einen Stapel Seiten und öffnet das PDF dafür einmal (ocr_pages).
+    `timings` (ms je Stufe: open, fallback, ocr) und `sources` (Rohtext-Quelle je Seite)
+    sammeln, was diese Extraktion gekostet hat (app.metrics).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._doc: Optional[fitz.Document] = None
+        self._open_error: Optional[Exception] = None
+        self._words: Dict[int, WordTable] = {}
+        self._texts: Dict[int, str] = {}
+        self._ocr: Dict[int, WordTable] = {}
+        self._scanned: Dict[int, bool] = {}
+        self.ocr_errors: Dict[int, str] = {}
+        # Fallback-Decoder: None = noch nicht geöffnet, False = nicht verfügbar/kaputt
+        self._plumber_pdf: Any = None
+        self._pypdf_reader: Any = None
+        self._fallback_texts: Dict[Tuple[str, int], Optional[str]] = {}
+        self._plumber_words: Dict[int, Optional[WordTable]] = {}
+        self.timings: Dict[str, float] = {}
+        self.sources: Dict[int, str] = {}
+
+    def __enter__(self) -> "Document":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        if self._plumber_pdf:
+            self._plumber_pdf.close()
+        self._plumber_pdf = self._pypdf_reader = None
+
+    def _fitz(self) -> Optional[fitz.Document]:
+        if self._doc is None and self._open_error is None:
+            try:
+                with stage("open", self.timings):
+                    self._doc = fitz.open(self.path)
+            except Exception as exc:
+                log.warning(f"PyMuPDF could not open {self.path}: {exc}")
+                self._open_error = exc
+        return self._doc
+
+    def _plumber(self) -> Any:
+        if self._plumber_pdf is None:
+            self._plumber_pdf = False
+            try:
+                import pdfplumber
+                self._plumber_pdf = pdfplumber.open(self.path)
+            except Exception as exc:
+                log.debug(f"pdfplumber unavailable for {self.path}: {exc}")
+        return self._plumber_pdf or None
+
+    def _pypdf(self) -> Any:
+        if self._pypdf_reader is None:
+            self._pypdf_reader = False
+            try:
+                from pypdf import PdfReader
+                self._pypdf_reader = PdfReader(self.path)
+            except Exception as exc:
+                log.debug(f"pypdf unavailable for {self.path}: {exc}")
+        return self._pypdf_reader or None
+
+    def _fallback_text(self, name: str, index: int) -> Optional[str]:
+        """Rohtext einer Seite aus pdfplumber/pypdf (None = Decoder nicht verfügbar oder Fehler)."""
+        key = (name, index)
+        if key not in self._fallback_texts:
+            txt = None
+            with stage("fallback", self.timings):
+                handle = self._plumber() if name == "pdfplumber" else self._pypdf()
+                try:
+                    if handle is not None and index < len(handle.pages):
+                        txt = handle.pages[index].extract_text() or ""
+                except Exception as exc:
+                    log.debug(f"{name} failed on {self.path} p{index + 1}: {exc}")
+            self._fallback_texts[key] = txt
+        return self._fallback_texts[key]
+
+    def _fallback_words(self, index: int) -> Optional[WordTable]:
+        """Wortboxen einer Seite aus pdfplumber (None = nicht verfügbar oder Fehler)."""
+        if index not in self._plumber_words:
+            words = None
+            with stage("fallback", self.timings):
+                pdf = self._plumber()
+                try:
+                    if pdf is not None and index < len(pdf.pages):
+                        words = WordTable.from_pdf_words(
+                            pdf.pages[index].extract_words(keep_blank_chars=False, use_text_flow=False),
+                            OCR_ZOOM,
+                        )
+                except Exception as exc:
+                    log.debug(f"pdfplumber failed on {self.path} p{index + 1}: {exc}")
+            self._plumber_words[index] = words
+        return self._plumber_words[index]
+
+    @property
+    def page_count(self) -> int:
+        doc = self._fitz()
+        if doc is not None:
+            return doc.page_count
+        for handle in (self._plumber(), self._pypdf()):
+            if handle is not None:
+                try:
+                    return len(handle.pages)
+                except Exception:
+                    pass
+        raise self._open_error
+
+    # --- Textlayer ---
+    def _native_words(self, index: int) -> WordTable:
+        if index not in self._words:
+            doc = self._fitz()
+            if doc is None:
+                self._words[index] = WordTable()
+            else:
+                self._words[index] = WordTable.from_fitz_words(doc[index].get_text("words"), OCR_ZOOM)
+        return self._words[index]
+
+    def _wants_fallback(self, index: int) -> bool:
+        # leere Seite oder Scan-Seite → gleich OCR; nur "kaputter" Text lohnt einen zweiten Decoder
+        if self._fitz() is None:
+            return True
+        return len(self._native_words(index)) > 0 and not self._is_scanned(index)
+
+    def _is_scanned(self, index: int) -> bool:
+        """Seite mit seitenfüllendem Bild (Scan) – nur dort ist dünner Text verdächtig."""
+        if index not in self._scanned:
+            doc = self._fitz()
+            self._scanned[index] = doc is not None and _native_zoom(doc[index]) is not None
+        return self._scanned[index]
+
+    def _layer_ok(self, index: int, text: Optional[str]) -> bool:
+        """
+        Textlayer brauchbar? Kein Zeichensalat und Text vorhanden; auf Scan-Seiten zusätzlich
+        mindestens MIN_PAGE_CHARS (Streuzeichen), auf digitalen Seiten reicht jede Länge.
+        """
+        if text_layer_ok(text):
+            return True
+        return text_layer_ok(text, min_chars=1) and not self._is_scanned(index)
+
+    def text(self, index: int) -> str:
+        """Rohtext des Textlayers einer Seite – PyMuPDF, sonst pdfplumber, sonst pypdf ("" = keiner)."""
+        if index in self._texts:
+            return self._texts[index]
+        txt = layout_text(self._native_words(index), TEXT_Y_TOLERANCE * OCR_ZOOM)
+        source = "text_layer"
+        if not self._layer_ok(index, txt) and self._wants_fallback(index):
+            for name in ("pdfplumber", "pypdf"):
+                other = self._fallback_text(name, index)
+                if other is not None and self._layer_ok(index, other):
+                    txt, source = other, name
+                    break
+        self._texts[index] = txt
+        # Seiten, die trotzdem durchfallen, setzt text_reader auf "ocr"/"none"
+        self.sources[index] = source
+        return txt
+
+    def words(self, index: int) -> WordTable:
+        """Wortboxen des Textlayers einer Seite (OCR_ZOOM-Pixel) – PyMuPDF, sonst pdfplumber."""
+        words = self._native_words(index)
+        if not self._layer_ok(index, " ".join(words.text)) and self._wants_fallback(index):
+            other = self._fallback_words(index)
+            if other is not None and self._layer_ok(index, " ".join(other.text)):
+                return other
+        return words
+
+    def needs_ocr(self, index: int) -> bool:
+        return not self._layer_ok(index, self.text(index))
+
+    # --- OCR ---
+    def prefetch_ocr(self, indices: Iterable[int]) -> None:
+        """Fehlende Seiten OCR'en – bei mehr als einer Seite parallel im Pool. Wirft nicht."""
+        todo = [i for i in indices if i not in self._ocr]
+        if not todo:
+            return
+        t0 = time.perf_counter()
+        with stage("ocr", self.timings):
+            pool = get_pool()
+            if pool is None or len(todo) == 1:
+                doc = self._fitz()
+                for i in todo:
+                    try:
+                        if doc is None:
+                            raise self._open_error
+                        self._ocr[i] = _ocr_fitz_page(doc[i], f"{self.path} p{i + 1}")
+                    except Exception as exc:
+                        self._ocr_failed(i, exc)
+            else:
+                try:
+                    self._ocr.update(ocr_pages(self.path, todo, self.ocr_errors))
+                except Exception as exc:
+                    for i in todo:
+                        if i not in self._ocr:
+                            self._ocr_failed(i, exc)
+        failed = sum(1 for i in todo if i in self.ocr_errors)
+        if failed:
+            log.warning(f"OCR failed on {failed} of {len(todo)} pages of {self.path}")
+        OCR_PAGES.inc(len(todo) - failed)
+        OCR_SECONDS.inc(time.perf_counter() - t0)
+
+    def _ocr_failed(self, index: int, exc: BaseException) -> None:
+        # nur die Meldung aufheben – der Traceback hielte Seiten/Pixmaps am Leben
+        self.ocr_errors[index] = str(exc)[:500] or exc.__class__.__name__
+        self._ocr[index] = WordTable()
+
+    def ocr_words(self, index: int) -> WordTable:
+        """OCR-Wörter einer Seite (0-basiert)."""
+        self.prefetch_ocr([index])
+        return self._ocr[index]
+
+    def ocr_text(self, index: int) -> str:
+        """OCR-Rohtext einer Seite (0-basiert)."""
+        return words_to_text(self.ocr_words(index))
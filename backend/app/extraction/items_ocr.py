@@ -1,11 +1,10 @@
 from __future__ import annotations
-import os
 import re
 from typing import List, Dict, Any, Optional
 
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
+from .document import Document
+from .rules import _alternation
+from .words import WordTable
 
 # --- Regex/Heuristiken ---
 NUM_RE = re.compile(r"-?\d{1,3}(?:[.,]\d{3})*(?:[.,]\d+)?")
@@ -26,12 +25,6 @@ NOISE_TOKENS = {
 }
 
 
-def _set_tesseract_cmd_from_env():
-    cmd = os.getenv("TESSERACT_CMD")
-    if cmd and os.path.exists(cmd):
-        pytesseract.pytesseract.tesseract_cmd = cmd
-
-
 def _normalize_number(s: str) -> Optional[float]:
     if not s:
         return None
@@ -53,127 +46,110 @@ def _normalize_number(s: str) -> Optional[float]:
         return None
 
 
-def _render_page_to_image(page: fitz.Page, zoom: float = 3.0) -> Image.Image:
-    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
-    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-    return img
+def _page_words(doc: Document) -> List[WordTable]:
+    """
+    Pro Seite: Textlayer-Wörter, falls brauchbar – sonst OCR (nur diese Seite).
+    Gleiches Kriterium wie extract_text_from_pdf (Document.needs_ocr), damit beide dieselben
+    Seiten OCR'en und sich das Ergebnis teilen. Liefert OCR nichts (Fehler), bleibt der Textlayer.
+    """
+    count = doc.page_count
+    native = [doc.words(i) for i in range(count)]
+    ocr = [doc.needs_ocr(i) for i in range(count)]
+    # alle OCR-Seiten auf einmal anstoßen → parallel im Prozess-Pool
+    doc.prefetch_ocr(i for i, need in enumerate(ocr) if need)
+    return [(doc.ocr_words(i) or words) if need else words for i, (words, need) in enumerate(zip(native, ocr))]
 
 
-def _tsv_words(img: Image.Image) -> List[Dict[str, Any]]:
-    cfg = "--psm 6"
-    data = pytesseract.image_to_data(img, lang="deu+eng", output_type=pytesseract.Output.DICT, config=cfg)
-    words = []
-    n = len(data["text"])
-    for i in range(n):
-        txt = (data["text"][i] or "").strip()
-        if not txt:
-            continue
-        try:
-            conf = float(data["conf"][i])
-        except Exception:
-            conf = -1.0
-        x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
-        words.append({
-            "text": txt, "conf": conf,
-            "x": int(x), "y": int(y), "w": int(w), "h": int(h),
-            "cx": x + w/2.0, "cy": y + h/2.0,
-            "right": x + w, "bottom": y + h,
-        })
-    return words
-
-
-def _cluster_rows(words: List[Dict[str, Any]], y_tol: int = 7) -> List[List[Dict[str, Any]]]:
-    if not words:
+_NOISE_RE = _alternation(NOISE_TOKENS)
+
+
+class _Numbers:
+    """
+    Spalten je Wort einer Seite – einmal pro Seite statt pro Zeile/Token:
+    Zahl-Interpretation (val, is_num, has_curr) und Rausch-Markierung (noise).
+    Rausch-Tokens enthalten kein Leerzeichen, ein Treffer in der Zeile liegt also immer
+    in einem Wort – "Zeile ist Rauschen" = irgendein Wort der Zeile ist es.
+    """
+    __slots__ = ("val", "is_num", "has_curr", "noise")
+
+    def __init__(self, words: WordTable):
+        texts = words.text
+        # reine Buchstabenwörter (die meisten) enthalten keine Zahl – Regex sparen
+        self.val: List[Optional[float]] = [None if t.isalpha() else _normalize_number(t) for t in texts]
+        self.is_num: List[bool] = [v is not None and not PCT_RE.search(t) for v, t in zip(self.val, texts)]
+        self.has_curr: List[bool] = [bool(CURR_RE.search(t)) for t in texts]
+        self.noise: List[bool] = [bool(_NOISE_RE.search(t)) for t in words.lower()]
+
+
+def _cluster_rows(words: WordTable, y_tol: int = 7) -> List[List[int]]:
+    """Zeilen als Index-Listen in die WordTable, je Zeile nach x sortiert."""
+    n = len(words)
+    if not n:
         return []
-    words = sorted(words, key=lambda w: (w["cy"], w["x"]))
-    rows: List[List[Dict[str, Any]]] = []
-    current: List[Dict[str, Any]] = []
-    last_cy = None
-    for w in words:
-        if last_cy is None:
-            current = [w]
-            last_cy = w["cy"]
-            continue
-        if abs(w["cy"] - last_cy) <= y_tol:
-            current.append(w)
-            last_cy = (last_cy + w["cy"]) / 2.0
+    cy = words.cy()
+    xs = words.x
+    # nur nach cy – gleiche cy landen ohnehin in derselben Zeile, die danach nach x sortiert wird
+    order = sorted(range(n), key=cy.__getitem__)
+    rows: List[List[int]] = []
+    current: List[int] = [order[0]]
+    last_cy = cy[order[0]]
+    for i in order[1:]:
+        c = cy[i]
+        if abs(c - last_cy) <= y_tol:
+            current.append(i)
+            last_cy = (last_cy + c) / 2.0
         else:
-            if current:
-                rows.append(sorted(current, key=lambda t: t["x"]))
-            current = [w]
-            last_cy = w["cy"]
-    if current:
-        rows.append(sorted(current, key=lambda t: t["x"]))
+            rows.append(sorted(current, key=xs.__getitem__))
+            current = [i]
+            last_cy = c
+    rows.append(sorted(current, key=xs.__getitem__))
     return rows
 
 
-def _is_header_row(row: List[Dict[str, Any]]) -> bool:
-    text = " ".join((t["text"] or "").lower() for t in row)
+def _is_header_row(words: WordTable, row: List[int]) -> bool:
+    text = words.joined_lower(row)
     hits = sum(1 for k in HEADER_TOKENS if k in text)
     return hits >= 2
 
 
-def _is_noise_row(row: List[Dict[str, Any]]) -> bool:
-    text = " ".join((t["text"] or "").lower() for t in row)
-    return any(k in text for k in NOISE_TOKENS)
-
-
-def _classify_line(row: List[Dict[str, Any]]) -> Dict[str, Any]:
+def _classify_line(words: WordTable, nums_col: _Numbers, row: List[int]) -> Dict[str, Any]:
     if not row:
         return {}
 
-    tokens = []
-    for t in row:
-        raw = t["text"]
-        val = _normalize_number(raw)
-        tokens.append({
-            "t": t, "text": raw, "x": t["x"],
-            "val": val,
-            "is_num": (val is not None) and (not PCT_RE.search(raw)),
-            "has_curr": bool(CURR_RE.search(raw)),
-        })
-
-    nums = [k for k in tokens if k["is_num"]]
+    xs, val, is_num, has_curr = words.x, nums_col.val, nums_col.is_num, nums_col.has_curr
+    nums = [i for i in row if is_num[i]]
     if len(nums) < 2:
         return {}
 
     # line_total: rechts + ggf. mit Währung, sonst größte rechts
-    with_curr = [n for n in nums if n["has_curr"]]
-    if with_curr:
-        line_total_token = max(with_curr, key=lambda k: (k["x"], k["val"]))
-    else:
-        line_total_token = max(nums, key=lambda k: (k["x"], k["val"]))
-    line_total = line_total_token["val"]
+    with_curr = [i for i in nums if has_curr[i]]
+    line_total_idx = max(with_curr or nums, key=lambda i: (xs[i], val[i]))
+    line_total = val[line_total_idx]
+    right_border = xs[line_total_idx]
 
-    left_nums = [n for n in nums if n["x"] < line_total_token["x"] and n["val"] and n["val"] > 0]
+    left_nums = [i for i in nums if xs[i] < right_border and val[i] and val[i] > 0]
 
     unit_price = None
     if left_nums:
-        plausible = [n for n in left_nums if n["val"] <= line_total] or left_nums
-        unit_price = max(plausible, key=lambda k: k["val"])["val"]
+        plausible = [i for i in left_nums if val[i] <= line_total] or left_nums
+        unit_price = val[max(plausible, key=val.__getitem__)]
 
     quantity = None
-    qty_candidates = [n for n in left_nums if (unit_price is None or n["val"] != unit_price)]
+    qty_candidates = [i for i in left_nums if (unit_price is None or val[i] != unit_price)]
     if qty_candidates:
-        qty_candidates.sort(key=lambda k: (k["x"], k["val"]))
-        for c in qty_candidates:
-            v = c["val"]
+        qty_candidates.sort(key=lambda i: (xs[i], val[i]))
+        for i in qty_candidates:
+            v = val[i]
             if v is not None and 0 < v <= 10000:
                 quantity = v
                 break
 
     # Beschreibung: Text links von total, der nicht reine Zahl ist
-    right_border = line_total_token["x"]
-    desc_parts: List[str] = []
-    for k in tokens:
-        if k["x"] >= right_border:
-            continue
-        if k["is_num"] and not k["has_curr"]:
-            continue
-        txt = k["text"].strip()
-        if not txt:
-            continue
-        desc_parts.append(txt)
+    texts = words.text
+    desc_parts = [
+        texts[i] for i in row
+        if xs[i] < right_border and not (is_num[i] and not has_curr[i])
+    ]
     description = " ".join(desc_parts).strip() or None
 
     return {
@@ -187,17 +163,21 @@ def _classify_line(row: List[Dict[str, Any]]) -> Dict[str, Any]:
     }
 
 
-def _extract_rows(rows: List[List[Dict[str, Any]]], require_header: bool) -> List[Dict[str, Any]]:
+def _extract_rows(words: WordTable, rows: List[List[int]], require_header: bool,
+                  nums_col: Optional[_Numbers] = None) -> List[Dict[str, Any]]:
+    if nums_col is None:
+        nums_col = _Numbers(words)
     items: List[Dict[str, Any]] = []
     started = not require_header
+    noise = nums_col.noise
     for row in rows:
-        if _is_noise_row(row):
+        if any(noise[i] for i in row):
             continue
         if require_header and not started:
-            if _is_header_row(row):
+            if _is_header_row(words, row):
                 started = True
             continue
-        line = _classify_line(row)
+        line = _classify_line(words, nums_col, row)
         have = sum(1 for k in ("quantity", "unit_price", "line_total") if line.get(k) is not None)
         if have >= 2 or (line.get("description") and line.get("line_total") is not None):
             line["line_index"] = len(items) + 1
@@ -205,29 +185,31 @@ def _extract_rows(rows: List[List[Dict[str, Any]]], require_header: bool) -> Lis
     return items
 
 
-def extract_items_from_pdf(path: str) -> List[Dict[str, Any]]:
+def extract_items_from_pdf(path: str, doc: Optional[Document] = None) -> List[Dict[str, Any]]:
     """
-    Robuste Positions-Extraktion für GESCANNTE PDFs (OCR), v3:
-    - Höherer Render-Zoom (3.0) für klareres OCR.
+    Robuste Positions-Extraktion, v4:
+    - Born-digital: Wortboxen direkt aus dem Textlayer (PyMuPDF), kein OCR.
+    - Gescannt: Render-Zoom nach Scan-Auflösung (bis 3.0), Graustufen – nur Seiten ohne Textlayer.
     - Header-Erkennung (Menge/Einzelpreis/Gesamt...), aber Fallback ohne Header.
     - Rauschen (Adresse/IBAN/USt) wird gefiltert.
+    - `doc`: bereits geöffnetes Dokument wiederverwenden (kein zweites Parsen, kein zweiter Tesseract-Lauf).
     """
-    _set_tesseract_cmd_from_env()
+    if doc is None:
+        with Document(path) as own:
+            return extract_items_from_pdf(path, doc=own)
     all_items: List[Dict[str, Any]] = []
 
-    with fitz.open(path) as doc:
-        for page in doc:
-            img = _render_page_to_image(page, zoom=3.0)
-            words = _tsv_words(img)
-            rows = _cluster_rows(words, y_tol=7)
+    for words in _page_words(doc):
+        rows = _cluster_rows(words, y_tol=7)
+        nums_col = _Numbers(words)
 
-            # 1) Normal: erst ab Header sammeln
-            items = _extract_rows(rows, require_header=True)
-            # 2) Fallback: kein Header gefunden → trotzdem versuchen
-            if not items:
-                items = _extract_rows(rows, require_header=False)
+        # 1) Normal: erst ab Header sammeln
+        items = _extract_rows(words, rows, require_header=True, nums_col=nums_col)
+        # 2) Fallback: kein Header gefunden → trotzdem versuchen
+        if not items:
+            items = _extract_rows(words, rows, require_header=False, nums_col=nums_col)
 
-            all_items.extend(items)
+        all_items.extend(items)
 
     # Filter: Offensichtliche Summen-/MwSt-Zeilen raus
     cleaned: List[Dict[str, Any]] = []
@@ -0,0 +1,302 @@
+from __future__ import annotations
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import fitz  # PyMuPDF
+
+from .words import WordTable
+from .ocr_engine import get_engine, OcrTimeout
+
+# Ein Render-/OCR-Durchlauf pro Seite, gemeinsam für Rohtext und Positionen.
+# zoom 3.0 (~216 dpi) – die Positions-Extraktion braucht die höhere Auflösung.
+# Wortkoordinaten liegen immer in OCR_ZOOM-Pixeln, egal mit welchem Zoom tatsächlich gerendert wurde.
+OCR_ZOOM = 3.0
+
+# Adaptiver Zoom: Scans werden höchstens in ihrer nativen Auflösung gerendert (Hochrechnen bringt
+# Tesseract keine Information), aber nie unter OCR_MIN_ZOOM und nie über OCR_ZOOM.
+OCR_MIN_ZOOM = float(os.getenv("OCR_MIN_ZOOM", "2.0"))
+# Optional: erst die ganze Seite grob (OCR_PREVIEW_ZOOM), dann nur den Tabellenbereich
+# (ab der Kopfzeile Menge/Einzelpreis/...) in voller Auflösung
+OCR_TABLE_CROP = os.getenv("OCR_TABLE_CROP", "0").lower() in ("1", "true", "yes")
+OCR_PREVIEW_ZOOM = float(os.getenv("OCR_PREVIEW_ZOOM", "1.5"))
+# Anteil der Seitenfläche, ab dem ein eingebettetes Bild als Scan gilt (kleiner = Logo o.ä.)
+SCAN_MIN_COVERAGE = 0.5
+
+# Parallel-OCR über Prozesse (Seitenreihenfolge bleibt erhalten).
+# OCR_WORKERS: Anzahl Prozesse (0 = alle Kerne, 1 = kein Pool, alles im aufrufenden Thread)
+# OCR_THREADS: OMP_THREAD_LIMIT je Tesseract-Prozess (1 = kein Überbuchen der Kerne)
+# OCR_PAGE_TIMEOUT: Sekunden je Seite, danach wird Tesseract abgebrochen und die Seite leer gelassen
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or (os.cpu_count() or 1)
+OCR_THREADS = os.getenv("OCR_THREADS", "1")
+OCR_PAGE_TIMEOUT = float(os.getenv("OCR_PAGE_TIMEOUT", "120"))
+# OCR_POOL_TIMEOUT: Sekunden je Seite, die auf einen Pool-Auftrag gewartet wird (Rendern + OCR).
+#   Hängt ein Worker darüber hinaus, bleiben seine Seiten leer; neue Aufträge gehen an einen neuen
+#   Pool, der alte wird samt Worker beendet, sobald die Aufträge anderer Jobs darauf fertig sind.
+OCR_POOL_TIMEOUT = float(os.getenv("OCR_POOL_TIMEOUT", "0")) or OCR_PAGE_TIMEOUT + 60
+# gilt für alle Tesseract-Aufrufe dieses Prozesses (und für Pool-Prozesse, die die Umgebung erben)
+os.environ.setdefault("OMP_THREAD_LIMIT", OCR_THREADS)
+
+log = logging.getLogger("invoice.ocr")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# laufende bzw. als hängend aufgegebene Aufträge je Pool (alle Jobs), siehe _retire_pool
+_inflight: Dict[ProcessPoolExecutor, Set[Future]] = {}
+_hung: Dict[ProcessPoolExecutor, Set[Future]] = {}
+
+
+def _native_zoom(page: fitz.Page) -> Optional[float]:
+    """Auflösung des Scans auf der Seite als Zoom (Pixel pro PDF-Punkt); None ohne seitenfüllendes Bild."""
+    page_area = abs(page.rect)
+    best: Optional[float] = None
+    best_area = 0.0
+    for info in page.get_images(full=True):
+        xref, width, height = info[0], info[2], info[3]
+        for rect in page.get_image_rects(xref):
+            area = abs(rect)
+            if area <= best_area or area < SCAN_MIN_COVERAGE * page_area:
+                continue
+            # Flächenverhältnis statt Breite – unabhängig von Drehung/Verzerrung
+            best = ((width * height) / area) ** 0.5
+            best_area = area
+    return best
+
+
+def _choose_zoom(page: fitz.Page) -> float:
+    native = _native_zoom(page)
+    if native is None:
+        return OCR_ZOOM  # Vektor-Seite ohne Textlayer o.ä.: Standard
+    return max(OCR_MIN_ZOOM, min(OCR_ZOOM, native))
+
+
+def _render_page(page: fitz.Page, zoom: float = OCR_ZOOM, clip: Optional[fitz.Rect] = None) -> fitz.Pixmap:
+    # Graustufen: Tesseract binarisiert ohnehin, RGB wäre nur die dreifache Datenmenge
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False, clip=clip)
+
+
+def _ocr_pixmap(pix: fitz.Pixmap, label: str) -> WordTable:
+    try:
+        return get_engine().words(pix, timeout=OCR_PAGE_TIMEOUT)
+    except OcrTimeout:
+        # Seite überspringen statt Job abbrechen
+        log.warning(f"OCR timeout after {OCR_PAGE_TIMEOUT}s on {label}, page skipped")
+        return WordTable()
+
+
+def _ocr_region(page: fitz.Page, zoom: float, label: str, clip: Optional[fitz.Rect] = None) -> WordTable:
+    """Seite (oder Ausschnitt) rendern + OCR, Koordinaten in OCR_ZOOM-Pixeln der ganzen Seite."""
+    words = _ocr_pixmap(_render_page(page, zoom=zoom, clip=clip), label)
+    factor = OCR_ZOOM / zoom
+    if clip is None:
+        return words.rescale(factor)
+    return words.rescale(factor, dx=clip.x0 * OCR_ZOOM, dy=clip.y0 * OCR_ZOOM)
+
+
+def _table_top(words: WordTable) -> Optional[float]:
+    """Oberkante der Positions-Kopfzeile (OCR_ZOOM-Pixel) oder None."""
+    # Import hier: items_ocr importiert dieses Modul
+    from .items_ocr import _cluster_rows, _is_header_row
+    for row in _cluster_rows(words, y_tol=7):
+        if _is_header_row(words, row):
+            return float(min(words.y[i] for i in row))
+    return None
+
+
+def _ocr_fitz_page(page: fitz.Page, label: str) -> WordTable:
+    """
+    Eine Seite OCR'en:
+    - Zoom aus der Scan-Auflösung (_choose_zoom), Graustufen
+    - OCR_TABLE_CROP: Vorschau mit OCR_PREVIEW_ZOOM; wird dort eine Positions-Kopfzeile gefunden,
+      wird nur der Bereich ab dieser Zeile in voller Auflösung erneut erkannt. Der Rest der Seite
+      (Kopf mit Lieferant/Nummer/Datum) stammt aus der Vorschau.
+    """
+    zoom = _choose_zoom(page)
+    if not OCR_TABLE_CROP or OCR_PREVIEW_ZOOM >= zoom:
+        return _ocr_region(page, zoom, label)
+
+    preview = _ocr_region(page, OCR_PREVIEW_ZOOM, f"{label} (preview)")
+    top = _table_top(preview)
+    if top is None:
+        return _ocr_region(page, zoom, label)
+
+    # etwas Rand über der Kopfzeile, damit sie selbst vollständig im Ausschnitt liegt
+    margin = 10.0  # PDF-Punkte
+    rect = page.rect
+    clip = fitz.Rect(rect.x0, max(rect.y0, top / OCR_ZOOM - margin), rect.x1, rect.y1)
+    table = _ocr_region(page, zoom, f"{label} (table)", clip=clip)
+
+    cut = clip.y0 * OCR_ZOOM
+    merged = preview.take(i for i in range(len(preview)) if preview.y[i] + preview.h[i] <= cut)
+    merged.extend(table, block_offset=max(merged.block, default=0) + 1)
+    return merged
+
+
+def _init_worker() -> None:
+    # Engine (Sprachdaten) einmal je Pool-Prozess laden, nicht je Seite
+    get_engine()
+
+
+def ocr_page_batch(path: str, indices: List[int]) -> List[Tuple[int, Optional[WordTable], Optional[str]]]:
+    """
+    Worker-Funktion (Prozess-Pool): mehrere Seiten eines PDFs – einmal öffnen, je Seite
+    rendern + OCR. Je Seite (Index, Wörter, None) oder (Index, None, Fehlermeldung).
+    """
+    out: List[Tuple[int, Optional[WordTable], Optional[str]]] = []
+    with fitz.open(path) as doc:
+        for i in indices:
+            try:
+                out.append((i, _ocr_fitz_page(doc[i], f"{path} p{i + 1}"), None))
+            except Exception as exc:
+                out.append((i, None, str(exc)[:500] or exc.__class__.__name__))
+    return out
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Gemeinsamer OCR-Prozess-Pool (lazy). None, wenn OCR_WORKERS <= 1."""
+    global _pool
+    if OCR_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn statt fork: der API-Prozess hat Threads (Jobqueue, uvicorn)
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            log.info(f"OCR process pool started with {OCR_WORKERS} workers")
+        return _pool
+
+
+def _submit(pool: ProcessPoolExecutor, fn, *args) -> Future:
+    fut = pool.submit(fn, *args)
+    with _pool_lock:
+        _inflight.setdefault(pool, set()).add(fut)
+    fut.add_done_callback(lambda f: _untrack(pool, f))
+    return fut
+
+
+def _untrack(pool: ProcessPoolExecutor, fut: Future) -> None:
+    with _pool_lock:
+        _inflight.get(pool, set()).discard(fut)
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Kaputten Pool verwerfen (samt Workern); der nächste get_pool() startet einen neuen."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        _inflight.pop(pool, None)
+        _hung.pop(pool, None)
+    # shutdown() beendet keine hängenden Worker – die blieben sonst für immer liegen; die Liste
+    # vorher holen, shutdown() vergisst sie
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in procs:
+        if proc.is_alive():
+            proc.terminate()
+
+
+def _retire_pool(pool: ProcessPoolExecutor, hung: Iterable[Future]) -> None:
+    """
+    Pool mit hängenden Aufträgen ausmustern, ohne andere Jobs zu treffen: neue Aufträge gehen an
+    einen neuen Pool, nur die eigenen (noch nicht laufenden) Aufträge werden abgebrochen.
+    Ein Hintergrund-Thread beendet den alten Pool samt hängender Worker, sobald alle übrigen
+    Aufträge darauf fertig sind.
+    """
+    global _pool
+    hung = list(hung)
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        marked = _hung.setdefault(pool, set())
+        first = not marked
+        marked.update(hung)
+    for fut in hung:
+        fut.cancel()
+    if first:
+        threading.Thread(target=_reap, args=(pool,), name="ocr-pool-reaper", daemon=True).start()
+
+
+def _reap(pool: ProcessPoolExecutor) -> None:
+    while True:
+        with _pool_lock:
+            others = _inflight.get(pool, set()) - _hung.get(pool, set())
+        if not others:
+            break
+        wait(others, timeout=1.0)
+    log.info("Retired OCR process pool shut down")
+    _discard_pool(pool)
+
+
+def ocr_pages(path: str, indices: Iterable[int], errors: Optional[Dict[int, str]] = None) -> Dict[int, WordTable]:
+    """
+    Seiten im Prozess-Pool OCR'en (Aufrufer hat geprüft, dass es einen Pool gibt).
+    Je Worker ein Auftrag mit mehreren Seiten (jede k-te) – das PDF wird je Auftrag einmal geöffnet.
+    - Fehler einer Seite (z.B. Tesseract-Fehler) → Seite leer, Meldung in `errors`.
+    - Worker gestorben (Tesseract-Segfault, OOM-Kill) → BrokenProcessPool: Pool neu starten,
+      offene Seiten einmal wiederholen; stirbt er wieder, geht der Fehler an den Aufrufer.
+    - Aufträge hängen länger als OCR_POOL_TIMEOUT je Seite (des größten Auftrags) → deren
+      Seiten leer lassen, Pool ausmustern (_retire_pool – Aufträge anderer Jobs laufen zu Ende).
+    """
+    results: Dict[int, WordTable] = {}
+
+    def failed(pages: List[int], message: str) -> None:
+        for i in pages:
+            results[i] = WordTable()
+            if errors is not None:
+                errors[i] = message
+
+    todo = list(indices)
+    retried = False
+    while todo:
+        pool = get_pool()
+        n = min(OCR_WORKERS, len(todo))
+        chunks = [todo[k::n] for k in range(n)]
+        try:
+            futures = {_submit(pool, ocr_page_batch, path, chunk): chunk for chunk in chunks}
+            budget = OCR_POOL_TIMEOUT * len(chunks[0])
+            done, hung = wait(futures, timeout=budget)
+            for fut in done:
+                chunk = futures[fut]
+                try:
+                    for i, words, error in fut.result():
+                        if error is None:
+                            results[i] = words
+                        else:
+                            log.warning(f"OCR failed on {path} p{i + 1}: {error}")
+                            failed([i], error)
+                except BrokenProcessPool:
+                    raise
+                except Exception as exc:
+                    # z.B. PDF im Worker nicht lesbar – betrifft den ganzen Auftrag
+                    log.warning(f"OCR failed on {path} pages {[i + 1 for i in chunk]}: {exc}")
+                    failed(chunk, str(exc)[:500] or exc.__class__.__name__)
+            if hung:
+                pages = sorted(i for fut in hung for i in futures[fut])
+                log.warning(f"OCR worker hung on {path} pages {[i + 1 for i in pages]}, "
+                            f"pages skipped, retiring pool")
+                failed(pages, f"OCR worker timed out after {budget:g}s")
+                _retire_pool(pool, hung)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            if retried:
+                raise
+            retried = True
+            log.warning(f"OCR process pool broken while processing {path}, restarting and retrying once")
+        todo = [i for i in todo if i not in results]
+    return results
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
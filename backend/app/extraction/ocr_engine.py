@@ -0,0 +1,194 @@
+from __future__ import annotations
+import os
+import re
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+from PIL import Image
+import pytesseract
+
+from .words import WordTable
+
+OCR_LANG = "deu+eng"
+OCR_CONFIG = "--psm 6"
+
+# OCR-Engine:
+#   tesserocr   – Tesseract in-process (ein geladenes TessBaseAPI je Thread/Prozess, Pixmap direkt)
+#   pytesseract – ein tesseract-Prozess pro Seite (Bild als Temp-Datei, Sprachdaten jedes Mal neu)
+#   auto        – tesserocr, wenn installiert und initialisierbar, sonst pytesseract
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower()
+
+log = logging.getLogger("invoice.ocr")
+
+_TSV_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                "left", "top", "width", "height", "conf", "text")
+
+
+class OcrTimeout(Exception):
+    pass
+
+
+def _set_tesseract_cmd_from_env():
+    cmd = os.getenv("TESSERACT_CMD")
+    if cmd and os.path.exists(cmd):
+        pytesseract.pytesseract.tesseract_cmd = cmd
+
+
+def pixmap_image(pix: fitz.Pixmap) -> Image.Image:
+    """
+    PIL-Bild direkt auf dem Speicher der Pixmap (frombuffer auf samples_mv, keine Kopie).
+    Das Bild ist nur gültig, solange die Pixmap lebt.
+    """
+    mode = "L" if pix.n == 1 else "RGB"
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    # pytesseract schreibt das Bild als Temp-Datei: unkomprimiert (PGM/PPM) statt PNG spart die Kodierung
+    img.format = "PPM"
+    return img
+
+
+def drop_tracebacks(exc: BaseException) -> BaseException:
+    """Traceback (samt verketteter Exceptions) verwerfen – hält keine Frames/Locals mehr fest."""
+    seen = set()
+    cur: Optional[BaseException] = exc
+    while cur is not None and id(cur) not in seen:
+        seen.add(id(cur))
+        cur.__traceback__ = None
+        if cur.__cause__ is not None:
+            drop_tracebacks(cur.__cause__)
+        cur = cur.__context__
+    return exc
+
+
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def __init__(self) -> None:
+        _set_tesseract_cmd_from_env()
+
+    def words(self, pix: fitz.Pixmap, timeout: float = 0) -> WordTable:
+        img = pixmap_image(pix)
+        error: Optional[BaseException] = None
+        try:
+            data = pytesseract.image_to_data(
+                img, lang=OCR_LANG, output_type=pytesseract.Output.DICT, config=OCR_CONFIG, timeout=timeout
+            )
+        except Exception as exc:
+            error = exc
+        finally:
+            # Bild vor der Pixmap freigeben – es hält einen Export auf deren Speicher. close() gibt
+            # den Export auch dann frei, wenn noch jemand das Bild referenziert (Frames im
+            # Traceback, ein mitlaufender Profiler)
+            img.close()
+            del img
+        if error is not None:
+            # Frames im Traceback (pytesseract) halten das Bild noch – wer die Exception aufhebt,
+            # hielte sonst den Pixmap-Speicher fest (BufferError beim Freigeben der Pixmap)
+            drop_tracebacks(error)
+            # pytesseract meldet Timeouts als RuntimeError
+            if isinstance(error, RuntimeError) and "timeout" in str(error).lower():
+                raise OcrTimeout() from error
+            raise error
+        return WordTable.from_tesseract(data)
+
+
+def _tessdata_path() -> Optional[str]:
+    prefix = os.getenv("TESSDATA_PREFIX")
+    if not prefix:
+        # Windows-Installation: tessdata liegt neben tesseract.exe
+        cmd = os.getenv("TESSERACT_CMD")
+        if cmd and os.path.isdir(os.path.join(os.path.dirname(cmd), "tessdata")):
+            prefix = os.path.join(os.path.dirname(cmd), "tessdata")
+    return os.path.join(prefix, "") if prefix else None  # tesserocr erwartet den Separator am Ende
+
+
+def _parse_tsv(tsv: str) -> Dict[str, List[Any]]:
+    """GetTSVText() → dieselbe Struktur wie pytesseract.image_to_data(..., DICT)."""
+    data: Dict[str, List[Any]] = {k: [] for k in _TSV_COLUMNS}
+    for line in tsv.splitlines():
+        parts = line.split("\t", len(_TSV_COLUMNS) - 1)
+        if len(parts) < len(_TSV_COLUMNS) - 1 or not parts[0].isdigit():
+            continue
+        if len(parts) < len(_TSV_COLUMNS):
+            parts.append("")
+        for key, value in zip(_TSV_COLUMNS, parts):
+            data[key].append(value)
+    return data
+
+
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self) -> None:
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+        m = re.search(r"--psm\s+(\d+)", OCR_CONFIG)
+        self._psm = int(m.group(1)) if m else tesserocr.PSM.AUTO
+        self._api()  # sofort initialisieren: fehlende Sprachdaten fallen hier auf, nicht bei der ersten Seite
+
+    def _api(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            kwargs = {"lang": OCR_LANG, "psm": self._psm}
+            path = _tessdata_path()
+            if path:
+                kwargs["path"] = path
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+        return api
+
+    def words(self, pix: fitz.Pixmap, timeout: float = 0) -> WordTable:
+        api = self._api()
+        # SetImageBytes nimmt nur bytes (kein memoryview) – eine Kopie, dank Graustufen 1 Byte/Pixel
+        api.SetImageBytes(pix.samples, pix.width, pix.height, pix.n, pix.stride)
+        try:
+            if not api.Recognize(timeout=int(timeout * 1000)):
+                if timeout:
+                    raise OcrTimeout()
+                raise RuntimeError("Tesseract recognition failed")
+            return WordTable.from_tesseract(_parse_tsv(api.GetTSVText(0)))
+        finally:
+            api.Clear()
+
+
+_engine: Optional[Any] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """OCR-Engine dieses Prozesses (lazy, je Prozess einmal gewählt)."""
+    global _engine
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            if OCR_BACKEND == "pytesseract":
+                _engine = PytesseractEngine()
+            elif OCR_BACKEND == "tesserocr":
+                _engine = TesserocrEngine()
+            else:
+                try:
+                    _engine = TesserocrEngine()
+                except (ImportError, RuntimeError) as exc:
+                    log.info(f"tesserocr not available ({exc}), using pytesseract")
+                    _engine = PytesseractEngine()
+                except ValueError as exc:
+                    # tesserocr (cysignals) lässt sich nur im Hauptthread importieren
+                    log.warning(f"tesserocr imported off the main thread ({exc}), using pytesseract – "
+                                f"call init_engine() at startup")
+                    _engine = PytesseractEngine()
+            log.info(f"OCR engine: {_engine.name}")
+        return _engine
+
+
+def init_engine():
+    """
+    Engine beim Start im Hauptthread wählen (API-lifespan, Hot-Folder; reprocess.py als
+    initializer seiner Worker-Prozesse, dort läuft die OCR).
+    tesserocr lässt sich nur im Hauptthread importieren; ohne diesen Aufruf fände der
+    erste Import im Job-Thread statt (OCR ohne Pool bzw. einzelne Seite) und es bliebe
+    bei pytesseract. Die TessBaseAPI je Thread entsteht danach trotzdem lazy.
+    """
+    return get_engine()
@@ -1,6 +1,7 @@
 import re
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Tuple, Dict, List
+from typing import Any, Optional, Tuple, Dict, List
 
 # --------- Pre-Cleaning (hilft bei OCR) ---------
 GER_MONTHS = {
@@ -208,6 +209,137 @@ def guess_supplier(text: str) -> Optional[str]:
     return None
 
 
+# --------- Alle Kopffelder in einem Durchlauf ---------
+def _alternation(words: List[str]) -> "re.Pattern[str]":
+    # längste zuerst, damit die Alternation nicht an kurzen Präfixen hängen bleibt
+    return re.compile("|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)))
+
+_TOTAL_HINT_RE = _alternation(TOTAL_HINTS)
+_INVOICE_HINT_RE = _alternation(INVOICE_HINTS)
+_SUPPLIER_KW_RE = _alternation(SUPPLIER_KEYWORDS)
+_SUPPLIER_BAD_RE = _alternation(["rechnung", "invoice", "kundennummer", "customer"])
+_SUPPLIER_BAD_FALLBACK_RE = _alternation(["rechnung", "invoice", "kundennummer"])
+_INVOICE_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9\-\/]{2,}", re.IGNORECASE)
+_INVOICE_TOKEN_BAD_RE = _alternation(["rechnung", "invoice", "nummer", "nr"])
+_INVOICE_FALLBACK_RE = re.compile(r"\b([A-Z0-9]{3,}[\/\-][A-Z0-9\-]{2,})\b", re.IGNORECASE)
+_SUPPLIER_TITLE_RE = re.compile(r"^[A-ZÄÖÜẞ][\w&\-\.\s]{3,}$")
+
+
+@dataclass
+class HeaderFields:
+    supplier_name: Optional[str] = None
+    invoice_date: Optional[datetime.date] = None
+    invoice_number: Optional[str] = None
+    total_amount: Optional[float] = None
+    currency: Optional[str] = None
+    # Zeilennummer (0-basiert, in normalize_text(raw_text)) des jeweiligen Treffers
+    positions: Dict[str, Optional[int]] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Format wie bisher im Upload: total_amount/currency nur, wenn ein Betrag gefunden wurde."""
+        parsed: Dict[str, Any] = {
+            "supplier_name": self.supplier_name,
+            "invoice_date": self.invoice_date,
+            "invoice_number": self.invoice_number,
+        }
+        if self.total_amount is not None:
+            parsed["total_amount"], parsed["currency"] = self.total_amount, self.currency
+        return parsed
+
+
+def _line_of(text: str, offset: int) -> Optional[int]:
+    return text.count("\n", 0, offset) if offset >= 0 else None
+
+
+def parse_header(raw_text: str) -> HeaderFields:
+    """
+    Alle Kopf-/Summenfelder in einem Durchlauf – gleiche Ergebnisse wie
+    guess_supplier / parse_date / parse_invoice_number / parse_amount, aber:
+    - normalize_text und Zeilen-Split nur einmal
+    - jede Zeile nur einmal lowercased
+    - Hinweiswörter per vorkompilierter Alternation statt any(h in ln for h in HINTS)
+    """
+    out = HeaderFields()
+    t = normalize_text(raw_text)
+    low_t = t.lower()
+
+    # (Zeilennummer, gestrippte Zeile, lowercase) – nur nicht-leere Zeilen
+    lines: List[Tuple[int, str, str]] = []
+    for no, ln in enumerate(t.splitlines()):
+        st = ln.strip()
+        if st:
+            lines.append((no, st, st.lower()))
+
+    # --- Lieferant (erste 12 Zeilen) ---
+    head = lines[:12]
+    for no, ln, low in head:
+        if _SUPPLIER_KW_RE.search(low) and not _SUPPLIER_BAD_RE.search(low):
+            out.supplier_name, out.positions["supplier_name"] = ln[:255], no
+            break
+    else:
+        for no, ln, low in head:
+            if _SUPPLIER_TITLE_RE.match(ln) and not _SUPPLIER_BAD_FALLBACK_RE.search(low):
+                out.supplier_name, out.positions["supplier_name"] = ln[:255], no
+                break
+
+    # --- Datum (wie parse_date: Muster in fester Reihenfolge über den ganzen Text) ---
+    for rx, order in ((DATE_DOT, "dmy"), (DATE_DASH, "dmy"), (DATE_ISO, "ymd")):
+        m = rx.search(t)
+        if m:
+            a, b, c = m.group(1), m.group(2), m.group(3)
+            if order == "dmy":
+                out.invoice_date = _safe_date(int(a), int(b), int(_four_year(c)))
+            else:
+                out.invoice_date = _safe_date(int(c), int(b), int(a))
+            out.positions["invoice_date"] = _line_of(t, m.start())
+            break
+    else:
+        m = DATE_WORD.search(low_t)
+        if m:
+            mth = GER_MONTHS.get(m.group(2).replace(".", ""), None)
+            if mth:
+                out.invoice_date = _safe_date(int(m.group(1)), mth, int(m.group(3)))
+                out.positions["invoice_date"] = _line_of(low_t, m.start())
+
+    # --- Rechnungsnummer + Summenzeilen in einem Zeilendurchlauf ---
+    best: Optional[Tuple[float, int]] = None
+    for no, ln, low in lines:
+        if out.invoice_number is None and _INVOICE_HINT_RE.search(low):
+            tokens = [tok for tok in _INVOICE_TOKEN_RE.findall(low) if not _INVOICE_TOKEN_BAD_RE.search(tok)]
+            if tokens:
+                tokens.sort(key=len, reverse=True)
+                out.invoice_number, out.positions["invoice_number"] = tokens[0][:100], no
+        if _TOTAL_HINT_RE.search(low):
+            for m in AMOUNT_RE.findall(ln):
+                try:
+                    v = _de_to_float(m)
+                except Exception:
+                    continue
+                if best is None or v > best[0]:
+                    best = (v, no)
+
+    if out.invoice_number is None:
+        m = _INVOICE_FALLBACK_RE.search(raw_text)
+        if m:
+            out.invoice_number = m.group(1)[:100]
+            out.positions["invoice_number"] = _line_of(t, t.find(m.group(1)))
+
+    # --- Betrag: Summenzeilen, sonst global größter Betrag ---
+    if best is None:
+        for m in AMOUNT_RE.finditer(t):
+            try:
+                v = _de_to_float(m.group(0))
+            except Exception:
+                continue
+            if best is None or v > best[0]:
+                best = (v, _line_of(t, m.start()))
+    if best is not None:
+        out.total_amount, out.positions["total_amount"] = best
+        out.currency = _find_currency(t)
+
+    return out
+
+
 # --------- Confidence ---------
 def compute_confidence(parsed: Dict) -> float:
     score = 0
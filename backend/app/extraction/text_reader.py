@@ -1,74 +1,38 @@
-from typing import List
-import os
+from typing import Optional
 
-import pdfplumber
+from .document import Document
 
-# Fallback: PyPDF (manchmal erkennt es Text besser als pdfplumber)
-def _pypdf_text(path: str) -> str:
-    try:
-        from pypdf import PdfReader
-    except Exception:
-        return ""
-    parts: List[str] = []
-    try:
-        reader = PdfReader(path)
-        for page in reader.pages:
-            txt = page.extract_text() or ""
-            parts.append(txt)
-    except Exception:
-        return ""
-    return "\n".join(parts).strip()
-
-# OCR mit PyMuPDF (fitz) + Tesseract
-def _ocr_text(path: str) -> str:
-    import fitz  # PyMuPDF
-    import pytesseract
-    from PIL import Image
-    # optional: tesseract.exe Pfad aus .env übernehmen
-    tcmd = os.getenv("TESSERACT_CMD")
-    if tcmd and os.path.exists(tcmd):
-        pytesseract.pytesseract.tesseract_cmd = tcmd
 
-    parts: List[str] = []
-    # Rendering-Qualität: zoom ~2.0 (ca. 144 dpi) ist ein guter Start
-    zoom = 2.0
-    try:
-        with fitz.open(path) as doc:
-            for page in doc:
-                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                # deutsch + englisch ist oft sinnvoll
-                txt = pytesseract.image_to_string(img, lang="deu+eng", config="--psm 6")
-                parts.append(txt or "")
-    except Exception:
-        return ""
-    return "\n".join(parts).strip()
-
-def extract_text_from_pdf(path: str) -> str:
+def extract_text_from_pdf(path: str, doc: Optional[Document] = None) -> str:
     """
-    Pipeline:
-      1) pdfplumber Text
-      2) pypdf Text
-      3) OCR (PyMuPDF + Tesseract)
+    Pro Seite die erste brauchbare Quelle (Document.needs_ocr):
+      1) Textlayer (PyMuPDF; pdfplumber/pypdf nur als Fallback, siehe Document.text)
+      2) OCR (PyMuPDF + Tesseract) – nur für diese Seiten, über `doc`, damit items_ocr
+         das Ergebnis wiederverwenden kann
+    Ergebnis in Seitenreihenfolge. Rein digitale PDFs kommen nie bei Tesseract an (auch
+    nicht mit kurzen Seiten), gemischte (Deckblatt + Scans) OCR'en nur die Scan-Seiten.
+    Scheitert OCR für eine Seite, fehlt nur deren Text (doc.ocr_errors).
     """
-    # 1) pdfplumber
+    if doc is None:
+        with Document(path) as own:
+            return extract_text_from_pdf(path, doc=own)
+
     try:
-        pl_parts: List[str] = []
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                txt = page.extract_text() or ""
-                pl_parts.append(txt)
-        txt = "\n".join(pl_parts).strip()
-        if txt:
-            return txt
+        count = doc.page_count
     except Exception:
-        pass
+        return ""
+    pages = [doc.text(i) for i in range(count)]
 
-    # 2) pypdf
-    txt = _pypdf_text(path)
-    if txt:
-        return txt
+    # OCR für den Rest – alle Seiten auf einmal anstoßen (parallel im Prozess-Pool)
+    failing = [i for i in range(count) if doc.needs_ocr(i)]
+    if failing:
+        doc.prefetch_ocr(failing)
+        for i in failing:
+            ocr_text = doc.ocr_text(i)
+            if ocr_text:
+                pages[i] = ocr_text
+                doc.sources[i] = "ocr"
+            else:
+                doc.sources[i] = "none"  # Textlayer behalten, so dürftig er ist
 
-    # 3) OCR
-    txt = _ocr_text(path)
-    return txt or ""
+    return "\n".join(pages).strip()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class WordTable:
+    """
+    Wörter einer Seite, spaltenweise (parallele Arrays statt ein Dict pro Wort).
+    Quelle: Tesseract (image_to_data DICT) oder der PDF-Textlayer (pdfplumber).
+    Koordinaten in OCR-Pixeln; abgeleitete Werte (cx, cy, right, bottom) werden
+    nicht gespeichert, sondern bei Bedarf spaltenweise berechnet.
+    """
+
+    __slots__ = ("text", "conf", "x", "y", "w", "h", "block", "par", "line")
+
+    def __init__(self) -> None:
+        self.text: List[str] = []
+        self.conf = array("f")
+        self.x = array("i")
+        self.y = array("i")
+        self.w = array("i")
+        self.h = array("i")
+        # Tesseract-Layout (Block/Absatz/Zeile) – für die Rohtext-Rekonstruktion
+        self.block = array("i")
+        self.par = array("i")
+        self.line = array("i")
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def append(self, text: str, conf: float, x: int, y: int, w: int, h: int,
+               block: int = 0, par: int = 0, line: int = 0) -> None:
+        self.text.append(text)
+        self.conf.append(conf)
+        self.x.append(x)
+        self.y.append(y)
+        self.w.append(w)
+        self.h.append(h)
+        self.block.append(block)
+        self.par.append(par)
+        self.line.append(line)
+
+    @classmethod
+    def _from_columns(cls, text: List[str], conf: Iterable[float], x: Iterable[int], y: Iterable[int],
+                      w: Iterable[int], h: Iterable[int], block: Optional[Iterable[int]] = None,
+                      par: Optional[Iterable[int]] = None, line: Optional[Iterable[int]] = None) -> "WordTable":
+        """Ganze Spalten auf einmal übernehmen (statt append je Wort)."""
+        table = cls()
+        table.text = text
+        table.conf = array("f", conf)
+        table.x, table.y, table.w, table.h = array("i", x), array("i", y), array("i", w), array("i", h)
+        zeros = [0] * len(text)
+        table.block = array("i", zeros if block is None else block)
+        table.par = array("i", zeros if par is None else par)
+        table.line = array("i", zeros if line is None else line)
+        return table
+
+    @classmethod
+    def from_tesseract(cls, data: Dict[str, List[Any]]) -> "WordTable":
+        """Direkt aus pytesseract.image_to_data(..., output_type=DICT)."""
+        texts = [(raw or "").strip() for raw in data["text"]]
+        keep = [i for i, txt in enumerate(texts) if txt]
+
+        def col(key: str) -> List[int]:
+            values = data[key]
+            return [int(values[i]) for i in keep]
+
+        return cls._from_columns(
+            [texts[i] for i in keep], [_conf(data["conf"][i]) for i in keep],
+            col("left"), col("top"), col("width"), col("height"),
+            col("block_num"), col("par_num"), col("line_num"),
+        )
+
+    @classmethod
+    def from_pdf_words(cls, words: Iterable[Dict[str, Any]], scale: float) -> "WordTable":
+        """Aus pdfplumber extract_words() (PDF-Punkte), auf OCR-Pixel skaliert."""
+        kept = [(txt, w) for w in words for txt in ((w.get("text") or "").strip(),) if txt]
+        xs = [int(w["x0"] * scale) for _, w in kept]
+        ys = [int(w["top"] * scale) for _, w in kept]
+        return cls._from_columns(
+            [txt for txt, _ in kept], [100.0] * len(kept), xs, ys,
+            [int(w["x1"] * scale - w["x0"] * scale) for _, w in kept],
+            [int(w["bottom"] * scale - w["top"] * scale) for _, w in kept],
+        )
+
+    @classmethod
+    def from_fitz_words(cls, words: Iterable[tuple], scale: float) -> "WordTable":
+        """Aus PyMuPDF page.get_text("words") (PDF-Punkte), auf OCR-Pixel skaliert."""
+        kept = [(txt, w) for w in words for txt in (w[4].strip(),) if txt]
+        return cls._from_columns(
+            [txt for txt, _ in kept], [100.0] * len(kept),
+            [int(w[0] * scale) for _, w in kept], [int(w[1] * scale) for _, w in kept],
+            [int(w[2] * scale - w[0] * scale) for _, w in kept],
+            [int(w[3] * scale - w[1] * scale) for _, w in kept],
+            [w[5] for _, w in kept], None, [w[6] for _, w in kept],
+        )
+
+    def rescale(self, factor: float, dx: float = 0.0, dy: float = 0.0) -> "WordTable":
+        """Koordinaten in-place umrechnen: Render-Pixel (anderer Zoom/Ausschnitt) → OCR_ZOOM-Pixel."""
+        if factor != 1.0 or dx or dy:
+            self.x = array("i", (int(round(v * factor + dx)) for v in self.x))
+            self.y = array("i", (int(round(v * factor + dy)) for v in self.y))
+            self.w = array("i", (int(round(v * factor)) for v in self.w))
+            self.h = array("i", (int(round(v * factor)) for v in self.h))
+        return self
+
+    def take(self, indices: Iterable[int]) -> "WordTable":
+        """Teilmenge der Wörter als neue WordTable."""
+        idx = list(indices)
+        return WordTable._from_columns(
+            [self.text[i] for i in idx], [self.conf[i] for i in idx],
+            [self.x[i] for i in idx], [self.y[i] for i in idx], [self.w[i] for i in idx],
+            [self.h[i] for i in idx], [self.block[i] for i in idx], [self.par[i] for i in idx],
+            [self.line[i] for i in idx],
+        )
+
+    def extend(self, other: "WordTable", block_offset: int = 0) -> None:
+        """Wörter anhängen; block_offset hält Tesseract-Blöcke beider Teile getrennt."""
+        self.text.extend(other.text)
+        self.conf.extend(other.conf)
+        self.x.extend(other.x)
+        self.y.extend(other.y)
+        self.w.extend(other.w)
+        self.h.extend(other.h)
+        self.block.extend(b + block_offset for b in other.block)
+        self.par.extend(other.par)
+        self.line.extend(other.line)
+
+    def cy(self) -> List[float]:
+        return [y + h / 2.0 for y, h in zip(self.y, self.h)]
+
+    def lower(self) -> List[str]:
+        return [t.lower() for t in self.text]
+
+    def joined_lower(self, indices: List[int]) -> str:
+        text = self.text
+        return " ".join(text[i].lower() for i in indices)
+
+
+def _conf(value: Any) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return -1.0
+
+
+def words_to_text(words: WordTable) -> str:
+    """
+    Rohtext aus TSV-Wörtern rekonstruieren (wie image_to_string):
+    Wörter einer Tesseract-Zeile mit Leerzeichen, Absätze durch Leerzeile getrennt.
+    """
+    lines: List[str] = []
+    current: List[str] = []
+    last_line: Optional[tuple] = None
+    last_par: Optional[tuple] = None
+    for txt, b, p, l in zip(words.text, words.block, words.par, words.line):
+        line_key = (b, p, l)
+        if line_key != last_line:
+            if current:
+                lines.append(" ".join(current))
+            par_key = (b, p)
+            if last_par is not None and par_key != last_par:
+                lines.append("")
+            current = []
+            last_line = line_key
+            last_par = par_key
+        current.append(txt)
+    if current:
+        lines.append(" ".join(current))
+    return "\n".join(lines)
+
+
+def layout_text(words: WordTable, y_tol: float) -> str:
+    """
+    Rohtext aus Textlayer-Wörtern wie pdfplumber extract_text(): Wörter mit ähnlicher
+    Oberkante (y_tol) bilden eine Zeile, innerhalb der Zeile nach x sortiert.
+    """
+    n = len(words)
+    if not n:
+        return ""
+    ys, xs, text = words.y, words.x, words.text
+    order = sorted(range(n), key=ys.__getitem__)
+    lines: List[List[int]] = [[order[0]]]
+    last_y = ys[order[0]]
+    for i in order[1:]:
+        if ys[i] - last_y > y_tol:
+            lines.append([])
+        lines[-1].append(i)
+        last_y = ys[i]
+    return "\n".join(" ".join(text[i] for i in sorted(line, key=xs.__getitem__)) for line in lines)
@@ -0,0 +1,227 @@
+"""
+Hot-Folder-Import: Scanner/Mail-Abholer legen PDFs in einen Ordner, dieser Prozess
+importiert sie über dieselbe Pipeline wie POST /upload – ganz ohne HTTP.
+
+    python -m app.ingest --watch D:/scans/inbox [--workers 4] [--settle 2]
+
+Verarbeitete Dateien landen in <DIR>/done, fehlerhafte in <DIR>/error.
+"""
+import os
+import time
+import shutil
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler, FileSystemEvent
+
+from .db import SessionLocal, engine
+from .models import Invoice
+from .schema import ensure_schema
+from .storage import save_upload, remove_file, storage_path, UploadTooLarge, NotAPdf
+from .cache import DEDUP_MODE, find_duplicate
+from .pipeline import process_invoice, STATUS_PENDING, STATUS_FAILED
+from app.extraction.ocr import shutdown_pool
+from app.extraction.ocr_engine import init_engine
+
+log = logging.getLogger("invoice.ingest")
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.getenv("EXTRACT_WORKERS", "2")))
+# so lange muss eine Datei unverändert (Größe + mtime) sein, bevor sie als fertig geschrieben gilt
+INGEST_SETTLE_SECONDS = float(os.getenv("INGEST_SETTLE_SECONDS", "2"))
+POLL_INTERVAL = 0.5
+
+
+def _is_candidate(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.lower().endswith(".pdf") and not name.startswith(".")
+
+
+def _move(path: str, target_dir: str) -> str:
+    """Datei nach target_dir verschieben, ohne Vorhandenes zu überschreiben."""
+    os.makedirs(target_dir, exist_ok=True)
+    base, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(target_dir, base + ext)
+    n = 1
+    while os.path.exists(target):
+        target = os.path.join(target_dir, f"{base}-{n}{ext}")
+        n += 1
+    shutil.move(path, target)
+    return target
+
+
+def ingest_file(path: str) -> Tuple[bool, str]:
+    """
+    Eine Datei importieren (gleiche Schritte wie upload_invoice, Extraktion synchron).
+    Rückgabe: (erfolgreich, Meldung)
+    """
+    try:
+        with open(path, "rb") as src:
+            uid, content_hash = save_upload(src)
+    except NotAPdf:
+        return False, "not a PDF"
+    except UploadTooLarge:
+        return False, "file too large"
+
+    with SessionLocal() as db:
+        if DEDUP_MODE != "off":
+            dup = find_duplicate(db, content_hash)
+            if dup is not None:
+                # wie beim Batch-Upload: Duplikate nicht erneut importieren
+                remove_file(uid)
+                return True, f"duplicate of invoice {dup.id}"
+
+        inv = Invoice(source_file=uid, content_hash=content_hash, status=STATUS_PENDING, needs_review=1)
+        db.add(inv)
+        db.commit()
+        invoice_id = inv.id
+
+        process_invoice(db, invoice_id, storage_path(uid))
+        inv = db.get(Invoice, invoice_id)
+        if inv is not None and inv.status == STATUS_FAILED:
+            return False, f"invoice {invoice_id}: {inv.extraction_error}"
+        return True, f"invoice {invoice_id}"
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, watcher: "HotFolder"):
+        self.watcher = watcher
+
+    def on_created(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self.watcher.touch(event.dest_path)
+
+
+class HotFolder:
+    """
+    Beobachtet einen Ordner (watchdog) und übergibt fertig geschriebene PDFs an einen Worker-Pool.
+    Debounce: eine Datei wird erst verarbeitet, wenn Größe und mtime INGEST_SETTLE_SECONDS
+    lang stabil sind und sie sich zum Lesen öffnen lässt.
+    """
+
+    def __init__(self, directory: str, workers: int = INGEST_WORKERS, settle: float = INGEST_SETTLE_SECONDS):
+        self.directory = os.path.abspath(directory)
+        self.done_dir = os.path.join(self.directory, "done")
+        self.error_dir = os.path.join(self.directory, "error")
+        self.settle = settle
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        # Pfad → (Größe, mtime, Zeitpunkt der letzten Änderung)
+        self._pending: Dict[str, Tuple[int, float, float]] = {}
+        self._active: Set[str] = set()
+        self._stop = threading.Event()
+
+    def touch(self, path: str) -> None:
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.directory or not _is_candidate(path):
+            return
+        with self._lock:
+            if path not in self._active:
+                self._pending[path] = (-1, 0.0, time.monotonic())
+
+    def _stat(self, path: str) -> Optional[Tuple[int, float]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def _ready(self) -> list:
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (size, mtime, since) in list(self._pending.items()):
+                st = self._stat(path)
+                if st is None:
+                    del self._pending[path]
+                    continue
+                if st != (size, mtime):
+                    self._pending[path] = (st[0], st[1], now)
+                    continue
+                if now - since >= self.settle and _readable(path):
+                    del self._pending[path]
+                    self._active.add(path)
+                    ready.append(path)
+        return ready
+
+    def _process(self, path: str) -> None:
+        try:
+            ok, msg = ingest_file(path)
+        except Exception as exc:
+            log.exception(f"Ingest failed for {path}")
+            ok, msg = False, str(exc)
+        try:
+            target = _move(path, self.done_dir if ok else self.error_dir)
+            log.info(f"{'OK' if ok else 'ERROR'} {os.path.basename(path)} → {target} ({msg})")
+        except OSError as exc:
+            log.error(f"Could not move {path}: {exc}")
+        finally:
+            with self._lock:
+                self._active.discard(path)
+
+    def run(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # schon vorhandene Dateien mitnehmen
+        for name in os.listdir(self.directory):
+            self.touch(os.path.join(self.directory, name))
+
+        observer = Observer()
+        observer.schedule(_Handler(self), self.directory, recursive=False)
+        observer.start()
+        log.info(f"Watching {self.directory} (done → {self.done_dir}, error → {self.error_dir})")
+        try:
+            while not self._stop.is_set():
+                for path in self._ready():
+                    self.pool.submit(self._process, path)
+                self._stop.wait(POLL_INTERVAL)
+        finally:
+            observer.stop()
+            observer.join()
+            self.pool.shutdown(wait=True)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _readable(path: str) -> bool:
+    # unter Windows ist eine Datei, die noch geschrieben wird, meist exklusiv gesperrt
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Hot-Folder-Import für Rechnungs-PDFs")
+    parser.add_argument("--watch", required=True, help="Eingangsordner")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="parallele Importe")
+    parser.add_argument("--settle", type=float, default=INGEST_SETTLE_SECONDS,
+                        help="Sekunden ohne Änderung, bevor eine Datei importiert wird")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    ensure_schema(engine)
+    init_engine()  # Hauptthread – vor den Import-Threads
+    watcher = HotFolder(args.watch, workers=args.workers, settle=args.settle)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
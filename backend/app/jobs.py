@@ -0,0 +1,137 @@
+import os
+import queue
+import logging
+import threading
+from typing import List, Optional
+
+from sqlalchemy import update
+
+from .db import SessionLocal
+from .models import Invoice
+from .storage import storage_path
+from .pipeline import process_invoice, STATUS_PENDING, STATUS_PROCESSING
+
+log = logging.getLogger("invoice.jobs")
+
+# Anzahl paralleler Extraktionen und max. Warteschlangenlänge (Backpressure)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+EXTRACT_QUEUE_SIZE = int(os.getenv("EXTRACT_QUEUE_SIZE", "100"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Kleine In-Process-Jobqueue für die Extraktion:
+    - begrenzte Warteschlange (put_nowait → QueueFull = Backpressure)
+    - feste Anzahl Worker-Threads
+    - Zustand liegt in der DB (Invoice.status), daher nach Neustart wiederherstellbar
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, maxsize: int = EXTRACT_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self._q: "queue.Queue[Optional[int]]" = queue.Queue(maxsize=maxsize)
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"extract-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        log.info(f"Job queue started with {self.workers} workers")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Worker nach dem laufenden Job beenden – blockiert nicht, auch wenn die Queue voll ist.
+        Nicht abgearbeitete Jobs bleiben pending in der DB (recover beim nächsten Start).
+        """
+        self._stopping.set()
+        for _ in self._threads:
+            try:
+                self._q.put_nowait(None)  # weckt wartende Worker sofort
+            except queue.Full:
+                break  # volle Queue: Worker holen ohnehin gleich den nächsten Eintrag
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads.clear()
+
+    def submit(self, invoice_id: int) -> None:
+        try:
+            self._q.put_nowait(invoice_id)
+        except queue.Full:
+            raise QueueFull()
+
+    def depth(self) -> int:
+        return self._q.qsize()
+
+    def submit_all(self, invoice_ids: List[int], name: str = "extract-feed") -> None:
+        """
+        Viele Jobs auf einmal (Batch-Upload): blockierend im Hintergrund einreihen, statt bei
+        voller Queue abzulehnen – die Invoices stehen schon als pending in der DB.
+        """
+        def _feed():
+            for invoice_id in invoice_ids:
+                if not self._put(invoice_id):
+                    return
+
+        if invoice_ids:
+            threading.Thread(target=_feed, name=name, daemon=True).start()
+
+    def recover(self) -> None:
+        """Nach Neustart: offene Jobs (pending/processing) wieder einreihen (blockierend, im Hintergrund)."""
+        def _feed():
+            with SessionLocal() as db:
+                # 'processing' beim Start = abgebrochener Lauf → zurück auf pending
+                db.execute(
+                    update(Invoice)
+                    .where(Invoice.status == STATUS_PROCESSING)
+                    .values(status=STATUS_PENDING)
+                )
+                db.commit()
+                ids = [i for (i,) in db.query(Invoice.id)
+                       .filter(Invoice.status == STATUS_PENDING)
+                       .order_by(Invoice.id.asc())]
+            if ids:
+                log.info(f"Recovering {len(ids)} pending extraction jobs")
+            for invoice_id in ids:
+                if not self._put(invoice_id):
+                    return
+
+        threading.Thread(target=_feed, name="extract-recover", daemon=True).start()
+
+    def _put(self, invoice_id: int) -> bool:
+        """Blockierend einreihen (Feeder-Threads), bis Platz ist oder die Queue gestoppt wird."""
+        while not self._stopping.is_set():
+            try:
+                self._q.put(invoice_id, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            invoice_id = self._q.get()
+            try:
+                if invoice_id is None or self._stopping.is_set():
+                    return
+                self._run(invoice_id)
+            except Exception:
+                log.exception(f"Job {invoice_id} crashed")
+            finally:
+                self._q.task_done()
+
+    @staticmethod
+    def _run(invoice_id: int) -> None:
+        with SessionLocal() as db:
+            inv = db.get(Invoice, invoice_id)
+            if inv is None or not inv.source_file:
+                return
+            process_invoice(db, invoice_id, storage_path(inv.source_file))
+
+
+job_queue = JobQueue()
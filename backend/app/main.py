@@ -1,23 +1,32 @@
 import os
-import uuid
+import json
 import logging
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Query, Path, Body, status
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Query, Path, Body, Header, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy.orm import Session
-
-from .db import Base, engine, get_db
-from .models import Invoice, InvoiceRawText, InvoiceItem
-from app.extraction.text_reader import extract_text_from_pdf
-from app.extraction.items_ocr import extract_items_from_pdf
-from app.extraction.rules import (
-    parse_date, parse_amount, parse_invoice_number,
-    guess_supplier, compute_confidence
-)
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from .db import engine, async_engine, get_db, get_async_db, pool_status
+from .models import Invoice, InvoiceItem, InvoiceRawText
+from .schema import ensure_schema
+from .storage import STORAGE_DIR, UPLOAD_MAX_MB, save_upload, remove_file, UploadTooLarge, NotAPdf
+from .jobs import job_queue, QueueFull
+from .pipeline import STATUS_PENDING, STATUS_DONE, apply_extraction, manual_fields_of
+from .cache import DEDUP_MODE, find_duplicate, get_cached
+from .batch import ingest_batch, TooManyFiles, BATCH_MAX_FILES
+from .search import search_invoices
+from .profiling import check_token, request_profile, cancel_profile, list_profiles, profile_path
+from .metrics import EXTRACTIONS, RequestMetricsMiddleware, render as render_metrics
+from app.extraction.ocr import shutdown_pool
+from app.extraction.ocr_engine import init_engine
 
 # -------- Env & Logging --------
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
@@ -25,7 +34,17 @@ logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("invoice")
 
 # -------- App & CORS --------
-app = FastAPI(title="Invoice Scanner", version="0.2.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engine()  # Hauptthread – vor den Job-Threads
+    job_queue.start()
+    job_queue.recover()
+    yield
+    job_queue.stop()
+    shutdown_pool()
+    await async_engine.dispose()
+
+app = FastAPI(title="Invoice Scanner", version="0.2.0", lifespan=lifespan)
 
 FRONTENDS = ["http://127.0.0.1:5173", "http://localhost:5173"]
 app.add_middleware(
@@ -34,15 +53,19 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-After-Id"],
 )
+# Latenz je Endpunkt für /metrics
+app.add_middleware(RequestMetricsMiddleware)
+
+# max. Rechnungs-IDs für GET /items?invoice_ids= (eine IN-Liste)
+BULK_ITEMS_MAX_IDS = 1000
 
 # -------- Storage & Static --------
-STORAGE_DIR = os.path.join(os.path.dirname(__file__), "..", "storage")
-os.makedirs(STORAGE_DIR, exist_ok=True)
 app.mount("/files", StaticFiles(directory=STORAGE_DIR), name="files")
 
 # -------- DB-Tabellen --------
-Base.metadata.create_all(bind=engine)
+ensure_schema(engine)
 
 # -------- Schemas --------
 class InvoiceOut(BaseModel):
@@ -56,6 +79,7 @@ class InvoiceOut(BaseModel):
     extraction_confidence: Optional[float] = None
     needs_review: Optional[int] = None
     source_file: Optional[str] = None
+    status: Optional[str] = None
 
 class InvoiceUpdate(BaseModel):
     supplier_name: Optional[str] = None
@@ -78,132 +102,384 @@ class InvoiceItemOut(BaseModel):
     vat_amount: Optional[float] = None
     line_total: Optional[float] = None
 
+class InvoiceWithItemsOut(InvoiceOut):
+    # nur mit ?include=items gesetzt – sonst fehlt das Feld in der Antwort
+    items: List[InvoiceItemOut] = []
+
+class BatchItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    filename: str
+    status: str  # created | duplicate | failed
+    invoice_id: Optional[int] = None
+    reason: Optional[str] = None
+    job_status: Optional[str] = None  # created: pending (Jobqueue) | done (Cache-Treffer)
+
+class SearchHitOut(BaseModel):
+    invoice_id: int
+    supplier_name: Optional[str] = None
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[str] = None
+    total_amount: Optional[float] = None
+    currency: Optional[str] = None
+    score: float
+    snippet: Optional[str] = None
+
+class JobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    status: Optional[str] = None
+    error: Optional[str] = None
+    queue_depth: Optional[int] = None
+    timings: Optional[Dict[str, Any]] = None
+
 # -------- Health --------
+# Lese-/PATCH-/DELETE-Endpunkte sind async (AsyncSession) und belegen keinen Threadpool-Platz;
+# Uploads bleiben sync: Datei-I/O, Hashing und die (mit Jobqueue/Ingest geteilte) sync Pipeline
+# laufen damit im Threadpool, die Extraktion selbst in der Jobqueue.
 @app.get("/")
-def root():
+async def root():
     return {"status": "ok", "app": "invoice-scanner"}
 
-# -------- List (optional filtern) --------
-@app.get("/invoices", response_model=List[InvoiceOut])
-def list_invoices(
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus-Textformat: Stufenzeiten, Textquellen, OCR, DB-Pool, Jobqueue, Request-Latenz."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/db/pool")
+async def db_pool():
+    """Verbindungs-Pools (sync/async): Belegung, Checkouts, Wartezeiten, Timeouts – zum Dimensionieren."""
+    return pool_status()
+
+# -------- List (Keyset-Pagination + Filter) --------
+@app.get("/invoices", response_model=List[InvoiceWithItemsOut], response_model_exclude_unset=True)
+async def list_invoices(
+    response: Response,
+    include: Optional[str] = Query(None, description="items = Positionen je Rechnung mitliefern"),
     needs_review: Optional[int] = Query(None, description="Optional: 0 oder 1"),
-    db: Session = Depends(get_db)
+    after_id: Optional[int] = Query(None, gt=0, description="Cursor: nur IDs kleiner als diese (Sortierung id desc)"),
+    limit: int = Query(100, ge=1, le=1000),
+    with_total: bool = Query(False, description="Gesamtanzahl (mit Filtern) im Header X-Total-Count"),
+    supplier: Optional[str] = Query(None, description="Lieferant beginnt mit …"),
+    date_from: Optional[str] = Query(None, description="invoice_date >= YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, description="invoice_date <= YYYY-MM-DD"),
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    currency: Optional[str] = None,
+    confidence_min: Optional[float] = None,
+    confidence_max: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    q = db.query(Invoice).order_by(Invoice.id.desc())
+    """
+    Seitenweise Liste, neueste zuerst. Nächste Seite: ?after_id=<X-Next-After-Id>.
+    Keyset statt OFFSET → gleiche Antwortzeit auf Seite 1 und Seite 2000.
+    """
+    conds = []
     if needs_review in (0, 1):
-        q = q.filter(Invoice.needs_review == needs_review)
-    return q.all()
+        conds.append(Invoice.needs_review == needs_review)
+    if supplier:
+        conds.append(Invoice.supplier_name.like(f"{_escape_like(supplier)}%", escape="\\"))
+    if date_from:
+        conds.append(Invoice.invoice_date >= date_from)
+    if date_to:
+        conds.append(Invoice.invoice_date <= date_to)
+    if amount_min is not None:
+        conds.append(Invoice.total_amount >= amount_min)
+    if amount_max is not None:
+        conds.append(Invoice.total_amount <= amount_max)
+    if currency:
+        conds.append(Invoice.currency == currency.upper())
+    if confidence_min is not None:
+        conds.append(Invoice.extraction_confidence >= confidence_min)
+    if confidence_max is not None:
+        conds.append(Invoice.extraction_confidence <= confidence_max)
+
+    if with_total:
+        total = await db.scalar(select(func.count(Invoice.id)).where(*conds))
+        response.headers["X-Total-Count"] = str(total)
+
+    with_items = _include_items(include)
+    if after_id:
+        conds.append(Invoice.id < after_id)
+    stmt = select(Invoice).where(*conds).order_by(Invoice.id.desc()).limit(limit)
+    if with_items:
+        # eine Zusatzabfrage (IN über die IDs der Seite) statt einer je Rechnung
+        stmt = stmt.options(selectinload(Invoice.items))
+    rows = (await db.scalars(stmt)).all()
+    if len(rows) == limit:
+        response.headers["X-Next-After-Id"] = str(rows[-1].id)
+    return [_invoice_out(inv, with_items) for inv in rows]
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _include_items(include: Optional[str]) -> bool:
+    parts = {p.strip() for p in (include or "").split(",") if p.strip()}
+    if parts - {"items"}:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(parts - {'items'}))}")
+    return "items" in parts
+
+def _invoice_out(inv: Invoice, with_items: bool) -> Dict[str, Any]:
+    # als Dict: ohne include=items wird inv.items nie angefasst (Lazy-Load im Async-Kontext verboten)
+    data = InvoiceOut.model_validate(inv).model_dump()
+    if with_items:
+        data["items"] = [
+            InvoiceItemOut.model_validate(it).model_dump() for it in sorted(inv.items, key=lambda it: it.id)
+        ]
+    return data
+
+# -------- Volltextsuche (vor /invoices/{invoice_id} registrieren) --------
+@app.get("/invoices/search", response_model=List[SearchHitOut])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Suchbegriffe (alle müssen vorkommen)"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    with_total: bool = Query(False, description="Trefferanzahl im Header X-Total-Count"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Rechnungen über den gespeicherten Rohtext finden, beste Treffer zuerst, mit Textausschnitt.
+    Index: MySQL FULLTEXT bzw. SQLite FTS5 (search.py), wird beim Schreiben der Rohtexte mitgepflegt.
+    """
+    hits, total = await search_invoices(db, q, limit=limit, offset=offset, with_total=with_total)
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    return hits
 
 # -------- Detail --------
-@app.get("/invoices/{invoice_id}", response_model=InvoiceOut)
-def get_invoice(invoice_id: int = Path(..., gt=0), db: Session = Depends(get_db)):
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+@app.get("/invoices/{invoice_id}", response_model=InvoiceWithItemsOut, response_model_exclude_unset=True)
+async def get_invoice(
+    invoice_id: int = Path(..., gt=0),
+    include: Optional[str] = Query(None, description="items = Positionen mitliefern"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    with_items = _include_items(include)
+    options = [selectinload(Invoice.items)] if with_items else []
+    inv = await db.get(Invoice, invoice_id, options=options)
     if not inv:
         raise HTTPException(status_code=404, detail="Not found")
-    return inv
+    return _invoice_out(inv, with_items)
 
 # -------- Items-API --------
 @app.get("/invoices/{invoice_id}/items", response_model=List[InvoiceItemOut])
-def list_items(invoice_id: int, db: Session = Depends(get_db)):
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
-    if not inv:
+async def list_items(invoice_id: int, db: AsyncSession = Depends(get_async_db)):
+    # kein inv.items: Lazy-Load ist im Async-Kontext nicht erlaubt
+    items = (await db.scalars(
+        select(InvoiceItem).where(InvoiceItem.invoice_id == invoice_id).order_by(InvoiceItem.id)
+    )).all()
+    # Existenz nur prüfen, wenn es keine Positionen gibt (404 vs. leere Liste)
+    if not items and await db.get(Invoice, invoice_id) is None:
         raise HTTPException(status_code=404, detail="Not found")
-    return inv.items
+    return items
+
+@app.get("/items", response_model=List[InvoiceItemOut])
+async def list_items_bulk(
+    invoice_ids: str = Query(..., description="kommagetrennte Rechnungs-IDs, z.B. 3,7,12"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Positionen mehrerer Rechnungen in einer Abfrage (sortiert nach invoice_id, id)."""
+    try:
+        ids = sorted({int(p) for p in invoice_ids.split(",") if p.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invoice_ids must be comma-separated integers")
+    if not ids:
+        return []
+    if len(ids) > BULK_ITEMS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_ITEMS_MAX_IDS} invoice_ids")
+    return (await db.scalars(
+        select(InvoiceItem).where(InvoiceItem.invoice_id.in_(ids)).order_by(InvoiceItem.invoice_id, InvoiceItem.id)
+    )).all()
 
 # -------- Update --------
 @app.patch("/invoices/{invoice_id}", response_model=InvoiceOut)
-def update_invoice(
+async def update_invoice(
     invoice_id: int,
     payload: InvoiceUpdate = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    inv = await db.get(Invoice, invoice_id)
     if not inv:
         raise HTTPException(status_code=404, detail="Not found")
 
-    for k, v in payload.model_dump(exclude_unset=True).items():
+    changes = payload.model_dump(exclude_unset=True)
+    for k, v in changes.items():
         setattr(inv, k, v)
+    # merken, was manuell korrigiert wurde → Re-Extraktion überschreibt es nicht
+    inv.manual_fields = ",".join(sorted(manual_fields_of(inv) | set(changes))) or None
 
-    db.commit()
-    db.refresh(inv)
+    await db.commit()
     return inv
 
 # -------- Upload & Extraktion --------
-@app.post("/upload", response_model=InvoiceOut)
-def upload_invoice(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    if not file.filename.lower().endswith(".pdf"):
+@app.post("/upload", response_model=InvoiceOut, status_code=status.HTTP_202_ACCEPTED)
+def upload_invoice(
+    response: Response,
+    file: UploadFile = File(...),
+    profile: bool = Query(False, description="Extraktion profilieren (nur mit X-Admin-Token)"),
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Speichert das PDF und legt eine Invoice mit status=pending an.
+    Die Extraktion läuft im Hintergrund (app.jobs) – Status über GET /jobs/{id}.
+    ?profile=1 / X-Profile: 1 (+ X-Admin-Token = PROFILE_TOKEN): Profil der Extraktion in PROFILE_DIR.
+    Antwort-Header X-Profile: "requested" (Profil folgt mit der Extraktion) oder "skipped; cache-hit"
+    (Ergebnis aus dem Extraktions-Cache, es wird nichts extrahiert und kein Profil geschrieben).
+    """
+    want_profile = profile or x_profile in ("1", "true", "yes")
+    if want_profile:
+        _require_admin(x_admin_token)
+
+    try:
+        uid, content_hash = save_upload(file.file)
+    except NotAPdf:
         raise HTTPException(status_code=400, detail="Only PDF allowed")
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File larger than {UPLOAD_MAX_MB:g} MB",
+        )
+    log.info(f"Saved upload to {uid} (name={file.filename}, sha256={content_hash})")
 
-    uid = f"{uuid.uuid4()}.pdf"
-    out_path = os.path.join(STORAGE_DIR, uid)
-    with open(out_path, "wb") as f:
-        f.write(file.file.read())
-    log.info(f"Saved upload to {out_path} (uid={uid}, name={file.filename})")
-
-    # 1) Rohtext
-    raw_text = extract_text_from_pdf(out_path)
-    log.info(f"Extracted text length: {len(raw_text)}")
-
-    # 2) Kopf-/Summenfelder
-    parsed = {
-        "supplier_name": guess_supplier(raw_text),
-        "invoice_date": parse_date(raw_text),
-        "invoice_number": parse_invoice_number(raw_text),
-    }
-    amt = parse_amount(raw_text)
-    if amt:
-        parsed["total_amount"], parsed["currency"] = amt[0], amt[1]
-
-    confidence = compute_confidence(parsed)
-    needs_review = 1 if (confidence or 0) < 75.0 else 0
-
-    inv = Invoice(
-        supplier_name=parsed.get("supplier_name"),
-        invoice_number=parsed.get("invoice_number"),
-        invoice_date=parsed.get("invoice_date"),
-        total_amount=parsed.get("total_amount"),
-        currency=parsed.get("currency") or "EUR",
-        source_file=uid,
-        extraction_confidence=confidence,
-        needs_review=needs_review,
-    )
-    db.add(inv)
-    db.flush()  # ID erhalten
+    # Dedup: gleicher Inhalt schon vorhanden?
+    dup = find_duplicate(db, content_hash) if DEDUP_MODE != "off" else None
+    if dup is not None:
+        remove_file(uid)
+        if DEDUP_MODE == "reject":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Duplicate upload", "invoice_id": dup.id},
+            )
+        uid = dup.source_file  # gespeicherte Datei wiederverwenden
+        log.info(f"Duplicate of invoice {dup.id}, reusing {uid}")
 
-    db.add(InvoiceRawText(invoice_id=inv.id, raw_text=raw_text))
+    inv = Invoice(source_file=uid, content_hash=content_hash, status=STATUS_PENDING, needs_review=1)
+    db.add(inv)
+    db.flush()
 
-    # 3) Positionen (OCR-Heuristik)
-    try:
-        item_rows = extract_items_from_pdf(out_path)
-        kept = 0
-        for row in item_rows:
-            # simple Plausibilitätsfilter: mind. Beschreibung ODER (unit_price/line_total)
-            if not any([row.get("description"), row.get("unit_price"), row.get("line_total")]):
-                continue
-            db.add(InvoiceItem(invoice_id=inv.id, **row))
-            kept += 1
-        log.info(f"Items extracted: {kept}")
-    except Exception as exc:
-        log.warning(f"Item extraction failed: {exc}")
+    # Cache-Treffer: sofort fertig, keine Queue
+    cached = get_cached(db, content_hash)
+    if cached is not None:
+        apply_extraction(db, inv, cached)
+        inv.status = STATUS_DONE
+        db.commit()
+        EXTRACTIONS.inc(result="cached")
+        db.refresh(inv)
+        if want_profile:
+            response.headers["X-Profile"] = "skipped; cache-hit"
+        return inv
 
     db.commit()
     db.refresh(inv)
+
+    if want_profile:
+        request_profile(inv.id)
+        response.headers["X-Profile"] = "requested"
+    try:
+        job_queue.submit(inv.id)
+    except QueueFull:
+        # Backpressure: nichts halb Angelegtes liegen lassen
+        if want_profile:
+            cancel_profile(inv.id)
+        db.delete(inv)
+        db.commit()
+        if dup is None:
+            remove_file(uid)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Extraction queue full, retry later",
+            headers={"Retry-After": "30"},
+        )
     return inv
 
+# -------- Batch-Upload --------
+@app.post("/upload/batch", response_model=List[BatchItemOut])
+def upload_batch(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+    """
+    Viele PDFs oder ZIP-Archive auf einmal. Antwortet nach dem Speichern; die Extraktion
+    läuft in der Jobqueue. Ergebnis je Datei: created / duplicate / failed, bei created mit
+    invoice_id und job_status – Extraktionsergebnis/-fehler je Datei über GET /jobs?ids=...
+    """
+    try:
+        return ingest_batch(db, [(f.filename or "upload.pdf", f.file) for f in files])
+    except TooManyFiles:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"More than {BATCH_MAX_FILES} files in batch",
+        )
+
+# -------- Job-Status --------
+def _job_out(inv: Invoice) -> JobOut:
+    return JobOut(
+        id=inv.id,
+        status=inv.status or "done",
+        error=inv.extraction_error,
+        queue_depth=job_queue.depth() if inv.status == STATUS_PENDING else None,
+        timings=json.loads(inv.extraction_timings) if inv.extraction_timings else None,
+    )
+
+@app.get("/jobs", response_model=List[JobOut])
+async def get_jobs(
+    ids: str = Query(..., description="Kommagetrennte Invoice-IDs, z.B. aus POST /upload/batch"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Status mehrerer Jobs auf einmal (Batch-Upload); unbekannte IDs fehlen in der Antwort."""
+    try:
+        wanted = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+    if len(wanted) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_FILES} ids")
+    invoices = await db.scalars(select(Invoice).where(Invoice.id.in_(wanted)).order_by(Invoice.id))
+    return [_job_out(inv) for inv in invoices]
+
+@app.get("/jobs/{invoice_id}", response_model=JobOut)
+async def get_job(invoice_id: int = Path(..., gt=0), db: AsyncSession = Depends(get_async_db)):
+    inv = await db.get(Invoice, invoice_id)
+    if not inv:
+        raise HTTPException(status_code=404, detail="Not found")
+    return _job_out(inv)
+
+# -------- Profile (Admin) --------
+def _require_admin(token: Optional[str]) -> None:
+    if not check_token(token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+@app.get("/profiles", response_model=List[str])
+async def get_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Gespeicherte Extraktions-Profile (speedscope-JSON), neueste zuerst."""
+    _require_admin(x_admin_token)
+    return list_profiles()
+
+@app.get("/profiles/{name}")
+async def get_profile(name: str, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, media_type="application/json", filename=name)
+
 # -------- Delete --------
 @app.delete("/invoices/{invoice_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_invoice(invoice_id: int, db: Session = Depends(get_db)):
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+async def delete_invoice(invoice_id: int, db: AsyncSession = Depends(get_async_db)):
+    inv = await db.get(Invoice, invoice_id)
     if not inv:
         raise HTTPException(status_code=404, detail="Invoice not found")
-    # raw_text & items gehen über cascade mit weg
-    if inv.source_file:
+    # Datei nur löschen, wenn keine andere Invoice (Dedup) sie noch nutzt
+    shared = inv.source_file and await db.scalar(
+        select(Invoice.id).where(Invoice.source_file == inv.source_file, Invoice.id != inv.id).limit(1)
+    )
+    if inv.source_file and not shared:
         path = os.path.join(STORAGE_DIR, inv.source_file)
         if os.path.exists(path):
             try:
                 os.remove(path)
             except Exception as exc:
                 log.warning(f"Could not remove file {path}: {exc}")
-    db.delete(inv)
-    db.commit()
+    # raw_text & items explizit statt über die ORM-cascade (die müsste die Collections erst laden)
+    await db.execute(delete(InvoiceItem).where(InvoiceItem.invoice_id == invoice_id))
+    await db.execute(delete(InvoiceRawText).where(InvoiceRawText.invoice_id == invoice_id))
+    await db.execute(delete(Invoice).where(Invoice.id == invoice_id))
+    await db.commit()
     return None
@@ -0,0 +1,232 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+log = logging.getLogger("invoice.metrics")
+
+# Prometheus-Textformat (0.0.4) ohne Fremdpaket: GET /metrics in main.py.
+# Gilt je Prozess – Hot-Folder-Import und reprocess.py zählen in ihrem eigenen Prozess.
+# EXTRACTION_TIMINGS=1: zusätzlich je Extraktion Stufenzeiten/Seiten als JSON an der Invoice
+# (Spalte extraction_timings, auch in GET /jobs/{id}) – z.B. um langsame Lieferanten zu finden
+EXTRACTION_TIMINGS = os.getenv("EXTRACTION_TIMINGS", "0").lower() in ("1", "true", "yes")
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+Labels = Tuple[str, ...]
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def lines(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = [f"# HELP {self.name} {_escape(self.doc)}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(head + list(self.lines()))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def lines(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_value(v)}"
+
+
+class Gauge(_Metric):
+    """Wert wird erst beim Abruf gelesen (collect → [(Label-Werte, Wert)])."""
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[Labels, float]]]] = None):
+        super().__init__(name, doc, labels)
+        self._collect = collect
+
+    def lines(self) -> Iterable[str]:
+        try:
+            samples = list(self._collect()) if self._collect else []
+        except Exception as exc:
+            log.warning(f"Collecting {self.name} failed: {exc}")
+            samples = []
+        for key, v in samples:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_value(v)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # je Label-Satz: [Zähler je Bucket (nicht kumuliert) + +Inf, Summe]
+        self._data: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._data.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[i] += 1
+            total[0] += value
+
+    def lines(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((k, (list(c), t[0])) for k, (c, t) in self._data.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(names, key + (_value(bound),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_value(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+# -------- Extraktion --------
+STAGE_SECONDS = Histogram(
+    "invoice_extraction_stage_seconds",
+    "Dauer je Extraktionsstufe (open, fallback, ocr, text, items, header, extract, cache_lookup, db_write)",
+    ["stage"],
+)
+TEXT_SOURCE_PAGES = Counter(
+    "invoice_text_source_pages_total",
+    "Seiten je Rohtext-Quelle in extract_text_from_pdf (text_layer, pdfplumber, pypdf, ocr, none)",
+    ["source"],
+)
+DOCUMENT_PAGES = Histogram("invoice_document_pages", "Seiten je extrahiertem PDF", buckets=PAGE_BUCKETS)
+OCR_PAGES = Counter("invoice_ocr_pages_total", "OCR'te Seiten")
+OCR_SECONDS = Counter(
+    "invoice_ocr_seconds_total", "Wandzeit der OCR-Läufe (Seiten/s = rate(pages_total) / rate(seconds_total))"
+)
+EXTRACTIONS = Counter("invoice_extractions_total", "Extraktions-Jobs nach Ergebnis (done, cached, failed)", ["result"])
+
+# -------- DB / HTTP --------
+DB_CONNECTION_SECONDS = Histogram(
+    "invoice_db_connection_seconds",
+    "Haltedauer einer Pool-Verbindung (Checkout bis Checkin, ~ Dauer einer Session)",
+    ["engine"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "invoice_http_request_seconds",
+    "Antwortzeit je Endpunkt (Routen-Muster, nicht konkreter Pfad)",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def _pool_samples(field: str) -> Iterator[Tuple[Labels, float]]:
+    from .db import pool_status
+    for name, stats in pool_status().items():
+        if field in stats:
+            yield (name,), stats[field]
+
+
+def _queue_samples() -> Iterator[Tuple[Labels, float]]:
+    from .jobs import job_queue
+    yield (), job_queue.depth()
+
+
+for _field, _doc in (
+    ("size", "Pool-Größe"),
+    ("checked_out", "belegte Verbindungen"),
+    ("checked_in", "freie Verbindungen im Pool"),
+    ("overflow", "Verbindungen über pool_size hinaus (negativ = noch nicht geöffnet)"),
+    ("checkouts", "Checkouts seit Start"),
+    ("peak_checked_out", "höchste gleichzeitige Belegung seit Start (= size + max_overflow → Checkouts warteten)"),
+    ("hold_max_ms", "längste Haltedauer einer Verbindung (ms)"),
+):
+    Gauge(f"invoice_db_pool_{_field}", _doc, ["engine"], collect=lambda f=_field: _pool_samples(f))
+Gauge("invoice_job_queue_depth", "Wartende Extraktions-Jobs", collect=_queue_samples)
+
+
+@contextmanager
+def stage(name: str, record: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Stufe messen → Histogramm; optional zusätzlich in `record` (ms, aufsummiert)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if record is not None:
+            record[name] = round(record.get(name, 0.0) + 1000 * seconds, 3)
+
+
+class RequestMetricsMiddleware:
+    """ASGI-Middleware: Latenz je Methode/Route/Status (Route erst nach dem Routing bekannt)."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500
+
+        async def _send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - t0, method=scope["method"], route=route, status=status
+            )
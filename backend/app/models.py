@@ -1,18 +1,27 @@
-from sqlalchemy import Column, Integer, Float, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 from .db import Base  # <-- WICHTIG: Base aus app.db importieren, KEIN declarative_base() hier!
 
 class Invoice(Base):
     __tablename__ = "invoices"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    supplier_name = Column(String(255), nullable=True)
+    supplier_name = Column(String(255), nullable=True, index=True)
     invoice_number = Column(String(255), nullable=True)
-    invoice_date = Column(String(32), nullable=True)
+    invoice_date = Column(String(32), nullable=True, index=True)
     total_amount = Column(Float, nullable=True)
     currency = Column(String(8), nullable=True)
     source_file = Column(String(512), nullable=True)
     extraction_confidence = Column(Float, nullable=True)
-    needs_review = Column(Integer, nullable=True, default=1)
+    needs_review = Column(Integer, nullable=True, default=1, index=True)
+    # Extraktions-Status: pending | processing | done | failed (NULL = Altbestand, fertig)
+    status = Column(String(16), nullable=True, index=True)
+    extraction_error = Column(Text, nullable=True)
+    # SHA-256 des PDFs (Dedup / Extraktions-Cache)
+    content_hash = Column(String(64), nullable=True, index=True)
+    # per PATCH manuell korrigierte Felder (kommagetrennt) – Re-Extraktion lässt sie in Ruhe
+    manual_fields = Column(String(255), nullable=True)
+    # Stufenzeiten/Seiten der letzten Extraktion als JSON (nur mit EXTRACTION_TIMINGS=1)
+    extraction_timings = Column(Text, nullable=True)
 
     raw_texts = relationship("InvoiceRawText", back_populates="invoice", cascade="all, delete-orphan")
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
@@ -37,3 +46,14 @@ class InvoiceItem(Base):
     vat_amount = Column(Float, nullable=True)
     line_total = Column(Float, nullable=True)
     invoice = relationship("Invoice", back_populates="items")
+
+class ExtractionCache(Base):
+    """Extraktionsergebnis je PDF-Inhalt (SHA-256) – für erneute Uploads derselben Datei."""
+    __tablename__ = "extraction_cache"
+    content_hash = Column(String(64), primary_key=True)
+    raw_text = Column(Text, nullable=True)
+    parsed_json = Column(Text, nullable=True)
+    items_json = Column(Text, nullable=True)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    last_used_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
@@ -0,0 +1,228 @@
+import json
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from .models import Invoice, InvoiceRawText, InvoiceItem
+from .cache import get_cached, put_cached
+from .profiling import profile_extraction
+from .metrics import (
+    DOCUMENT_PAGES, EXTRACTIONS, EXTRACTION_TIMINGS, TEXT_SOURCE_PAGES, stage,
+)
+from app.extraction.text_reader import extract_text_from_pdf
+from app.extraction.items_ocr import extract_items_from_pdf
+from app.extraction.document import Document
+from app.extraction.rules import parse_header, compute_confidence
+
+log = logging.getLogger("invoice.pipeline")
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def run_extraction(path: str) -> Dict[str, Any]:
+    """
+    Reine Extraktion (ohne DB): Rohtext, Kopf-/Summenfelder, Positionen.
+    CPU-lastig (OCR) – läuft in Worker-Threads, nicht im Request.
+    """
+    # PDF einmal öffnen; Textlayer und OCR (falls nötig) je Seite einmal, geteilt von Rohtext und Positionen
+    with Document(path) as doc:
+        with stage("extract", doc.timings):
+            result = _run_extraction(path, doc)
+        result["timings"] = _timing_record(doc)
+        if doc.ocr_errors:
+            # Seiten (1-basiert), deren OCR fehlgeschlagen ist – Ergebnis unvollständig, nicht cachen
+            result["ocr_errors"] = {i + 1: msg for i, msg in sorted(doc.ocr_errors.items())}
+        return result
+
+
+def partial_error(result: Dict[str, Any]) -> Optional[str]:
+    """Hinweis für Invoice.extraction_error, wenn OCR für einzelne Seiten fehlgeschlagen ist."""
+    errors = result.get("ocr_errors")
+    if not errors:
+        return None
+    pages = ", ".join(str(p) for p in errors)
+    return f"OCR failed on page(s) {pages}: {next(iter(errors.values()))}"[:2000]
+
+
+def _run_extraction(path: str, doc: Document) -> Dict[str, Any]:
+    # 1) Rohtext
+    with stage("text", doc.timings):
+        raw_text = extract_text_from_pdf(path, doc=doc)
+    log.info(f"Extracted text length: {len(raw_text)}")
+
+    # 2) Kopf-/Summenfelder
+    with stage("header", doc.timings):
+        parsed = parse_header_fields(raw_text)
+
+    # 3) Positionen (OCR-Heuristik)
+    items: List[Dict[str, Any]] = []
+    try:
+        with stage("items", doc.timings):
+            for row in extract_items_from_pdf(path, doc=doc):
+                # simple Plausibilitätsfilter: mind. Beschreibung ODER (unit_price/line_total)
+                if not any([row.get("description"), row.get("unit_price"), row.get("line_total")]):
+                    continue
+                items.append(row)
+        log.info(f"Items extracted: {len(items)}")
+    except Exception as exc:
+        log.warning(f"Item extraction failed: {exc}")
+
+    return {"raw_text": raw_text, "parsed": parsed, "items": items}
+
+
+def _timing_record(doc: Document) -> Dict[str, Any]:
+    """Seiten/Quellen in die Metriken; Stufenzeiten + Seiten als Datensatz für Invoice.extraction_timings."""
+    sources = Counter(doc.sources.values())
+    for source, pages in sources.items():
+        TEXT_SOURCE_PAGES.inc(pages, source=source)
+    DOCUMENT_PAGES.observe(len(doc.sources))
+    return {"stages_ms": dict(doc.timings), "pages": len(doc.sources), "sources": dict(sources)}
+
+
+def manual_fields_of(inv: Invoice) -> Set[str]:
+    return {f for f in (inv.manual_fields or "").split(",") if f}
+
+
+def parse_header_fields(raw_text: str) -> Dict[str, Any]:
+    """Kopf-/Summenfelder aus dem Rohtext (rules.parse_header, ein Durchlauf)."""
+    return parse_header(raw_text).as_dict()
+
+
+def _apply_header(inv: Invoice, parsed: Dict[str, Any], keep: Set[str] = frozenset()) -> None:
+    """Felder setzen – außer denen in `keep` (manuell korrigiert)."""
+    confidence = compute_confidence(parsed)
+    values = {
+        "supplier_name": parsed.get("supplier_name"),
+        "invoice_number": parsed.get("invoice_number"),
+        "invoice_date": parsed.get("invoice_date"),
+        "total_amount": parsed.get("total_amount"),
+        "currency": parsed.get("currency") or "EUR",
+        "needs_review": 1 if (confidence or 0) < 75.0 else 0,
+    }
+    for k, v in values.items():
+        if k not in keep:
+            setattr(inv, k, v)
+    inv.extraction_confidence = confidence
+
+
+def _apply_timings(inv: Invoice, result: Dict[str, Any]) -> None:
+    # Cache-Treffer haben keine Zeiten – dann bleibt der Datensatz leer
+    if EXTRACTION_TIMINGS:
+        timings = result.get("timings")
+        inv.extraction_timings = json.dumps(timings) if timings else None
+
+
+def insert_extraction_rows(db: Session, entries: Sequence[Tuple[Invoice, Dict[str, Any]]]) -> None:
+    """
+    Rohtexte und Positionen zu Invoices mit ID schreiben – je ein executemany-INSERT statt
+    einem ORM-Objekt und INSERT pro Zeile (Lieferscheine mit 500+ Positionen).
+    Gemeinsamer Schreibpfad für Einzel-Upload/Jobqueue, Batch-Upload und Re-Extraktion.
+    """
+    raw_rows = [{"invoice_id": inv.id, "raw_text": result["raw_text"]} for inv, result in entries]
+    item_rows = [
+        {"invoice_id": inv.id, **row}
+        for inv, result in entries
+        for row in result["items"]
+    ]
+    if raw_rows:
+        db.execute(insert(InvoiceRawText), raw_rows)
+    if item_rows:
+        db.execute(insert(InvoiceItem), item_rows)
+
+
+def apply_extraction(db: Session, inv: Invoice, result: Dict[str, Any]) -> None:
+    """Ergebnis von run_extraction auf eine (bereits existierende) Invoice schreiben."""
+    apply_extractions(db, [(inv, result)])
+
+
+def apply_extractions(db: Session, entries: Sequence[Tuple[Invoice, Dict[str, Any]]]) -> None:
+    """apply_extraction für viele Invoices (Batch-Upload) – ein executemany je Tabelle."""
+    for inv, result in entries:
+        _apply_header(inv, result["parsed"])
+        _apply_timings(inv, result)
+        inv.extraction_error = partial_error(result)
+        if inv.extraction_error:
+            inv.needs_review = 1
+    if any(inv.id is None for inv, _ in entries):
+        db.flush()
+    insert_extraction_rows(db, entries)
+
+
+def bulk_update_extractions(
+    db: Session, entries: Sequence[Tuple[Invoice, Dict[str, Any]]], header_only: bool = False
+) -> None:
+    """
+    Re-Extraktion bestehender Invoices (scripts/reprocess.py), batchweise:
+    Kopf-/Summenfelder neu setzen (manuell korrigierte Felder bleiben), bei voller
+    Extraktion außerdem Rohtext und Positionen ersetzen – je ein DELETE und ein executemany-INSERT.
+    """
+    for inv, result in entries:
+        _apply_header(inv, result["parsed"], keep=manual_fields_of(inv))
+        if not header_only:
+            _apply_timings(inv, result)
+        inv.status = STATUS_DONE
+        if not header_only:
+            inv.extraction_error = partial_error(result)
+            if inv.extraction_error and "needs_review" not in manual_fields_of(inv):
+                inv.needs_review = 1
+    if header_only or not entries:
+        return
+
+    ids = [inv.id for inv, _ in entries]
+    db.execute(delete(InvoiceItem).where(InvoiceItem.invoice_id.in_(ids)))
+    db.execute(delete(InvoiceRawText).where(InvoiceRawText.invoice_id.in_(ids)))
+    insert_extraction_rows(db, entries)
+
+
+def claim_invoice(db: Session, invoice_id: int) -> bool:
+    """pending → processing, atomar. False, wenn jemand anderes schneller war."""
+    res = db.execute(
+        update(Invoice)
+        .where(Invoice.id == invoice_id, Invoice.status == STATUS_PENDING)
+        .values(status=STATUS_PROCESSING)
+    )
+    db.commit()
+    return res.rowcount == 1
+
+
+def process_invoice(db: Session, invoice_id: int, path: str) -> None:
+    """Job-Handler: pending-Invoice extrahieren und Status setzen."""
+    if not claim_invoice(db, invoice_id):
+        log.info(f"Invoice {invoice_id} already claimed, skipping")
+        return
+
+    inv = db.get(Invoice, invoice_id)
+    if inv is None:
+        return
+    try:
+        # optional: Profil langsamer/angeforderter Extraktionen (app.profiling)
+        with profile_extraction(invoice_id, inv.source_file):
+            with stage("cache_lookup"):
+                result = get_cached(db, inv.content_hash)
+            if result is None:
+                result = run_extraction(path)
+                put_cached(db, inv.content_hash, result)
+                outcome = "done"
+            else:
+                log.info(f"Invoice {invoice_id}: extraction cache hit")
+                outcome = "cached"
+            with stage("db_write"):
+                apply_extraction(db, inv, result)
+                inv.status = STATUS_DONE
+                db.commit()
+            EXTRACTIONS.inc(result=outcome)
+    except Exception as exc:
+        EXTRACTIONS.inc(result="failed")
+        db.rollback()
+        log.exception(f"Extraction failed for invoice {invoice_id}")
+        inv = db.get(Invoice, invoice_id)
+        if inv is not None:
+            inv.status = STATUS_FAILED
+            inv.extraction_error = str(exc)[:2000]
+            db.commit()
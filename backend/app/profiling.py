@@ -0,0 +1,162 @@
+import os
+import re
+import hmac
+import json
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Set
+
+log = logging.getLogger("invoice.profiling")
+
+# Sampling-Profiler (pyinstrument, optional: pip install pyinstrument) für die Extraktion einer Invoice.
+# PROFILE_TOKEN: Admin-Token für Profiling auf Anfrage (POST /upload mit X-Profile: 1 oder ?profile=1
+#   und X-Admin-Token); leer = nur automatisches Profiling
+# PROFILE_SLOW_SECONDS: > 0 = Stichprobe der Extraktionen mitschneiden (PROFILE_SLOW_RATE), Profil
+#   nur behalten, wenn sie länger gedauert hat; 0 = aus
+# PROFILE_SLOW_RATE: Anteil der Extraktionen in dieser Stichprobe (0.1 = jede zehnte). Der Profiler
+#   hängt an jedem Funktionsaufruf und kostet die mitgeschnittene Extraktion ~10 % (1 ms: ~25 %),
+#   unabhängig davon, ob ihr Profil behalten wird
+# PROFILE_INTERVAL: Sampling-Intervall in Sekunden für angeforderte Profile
+# PROFILE_SLOW_INTERVAL: dasselbe für die Stichprobe (gröber – langsame Läufe haben genug Samples)
+# PROFILE_DIR / PROFILE_MAX_FILES / PROFILE_MAX_AGE_DAYS: Ablage (speedscope-JSON) und Aufbewahrung
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SLOW_SECONDS = float(os.getenv("PROFILE_SLOW_SECONDS", "0"))
+PROFILE_SLOW_RATE = min(1.0, max(0.0, float(os.getenv("PROFILE_SLOW_RATE", "0.1"))))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+PROFILE_SLOW_INTERVAL = float(os.getenv("PROFILE_SLOW_INTERVAL", "0.01"))
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(os.path.dirname(__file__), "..", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_MAX_AGE_DAYS = float(os.getenv("PROFILE_MAX_AGE_DAYS", "7"))
+
+PROFILE_SUFFIX = ".speedscope.json"
+_SAFE_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+_requested: Set[int] = set()
+_lock = threading.Lock()
+_missing_logged = False
+
+
+def check_token(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def request_profile(invoice_id: int) -> None:
+    """Nächste Extraktion dieser Invoice mitschneiden (egal wie lange sie dauert)."""
+    with _lock:
+        _requested.add(invoice_id)
+
+
+def cancel_profile(invoice_id: int) -> None:
+    """Angefordertes Profil verwerfen (Job wurde gar nicht eingereiht)."""
+    _take_request(invoice_id)
+
+
+def _take_request(invoice_id: int) -> bool:
+    with _lock:
+        if invoice_id in _requested:
+            _requested.discard(invoice_id)
+            return True
+        return False
+
+
+def _sampled() -> bool:
+    return PROFILE_SLOW_SECONDS > 0 and random.random() < PROFILE_SLOW_RATE
+
+
+def _profiler(interval: float):
+    global _missing_logged
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        if not _missing_logged:
+            _missing_logged = True
+            log.warning("Profiling requested but pyinstrument is not installed (pip install pyinstrument)")
+        return None
+    # async_mode="disabled": profiliert den aufrufenden (Job-)Thread, ohne Event-Loop-Bezug
+    return Profiler(interval=interval, async_mode="disabled")
+
+
+@contextmanager
+def profile_extraction(invoice_id: int, source_file: Optional[str]) -> Iterator[None]:
+    """
+    Extraktion einer Invoice mitschneiden, wenn angefordert (request_profile) oder wenn
+    PROFILE_SLOW_SECONDS gesetzt ist und sie in die Stichprobe fällt (PROFILE_SLOW_RATE).
+    Angeforderte Profile und die langsamer Läufe landen als speedscope-JSON
+    in PROFILE_DIR (https://www.speedscope.app), benannt und getaggt mit ID und source_file.
+    OCR im Prozess-Pool erscheint als Warten auf die Worker (ocr_pages).
+    """
+    forced = _take_request(invoice_id)
+    if forced:
+        profiler = _profiler(PROFILE_INTERVAL)
+    else:
+        profiler = _profiler(PROFILE_SLOW_INTERVAL) if _sampled() else None
+    if profiler is None:
+        yield
+        return
+
+    profiler.start()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        session = profiler.stop()
+        if forced or seconds >= PROFILE_SLOW_SECONDS:
+            try:
+                path = _write(session, invoice_id, source_file, seconds)
+                log.info(f"Profile for invoice {invoice_id} ({seconds:.1f}s) written to {path}")
+            except Exception as exc:
+                log.warning(f"Writing profile for invoice {invoice_id} failed: {exc}")
+
+
+def _write(session, invoice_id: int, source_file: Optional[str], seconds: float) -> str:
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    data = json.loads(SpeedscopeRenderer().render(session))
+    title = f"invoice {invoice_id} {source_file or '-'} {seconds:.2f}s"
+    data["name"] = title
+    for prof in data.get("profiles", []):
+        prof["name"] = title
+    stem = os.path.splitext(os.path.basename(source_file or "nofile"))[0]
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-inv{invoice_id}-{_SAFE_RE.sub('_', stem)[:60]}{PROFILE_SUFFIX}"
+    path = os.path.join(PROFILE_DIR, name)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+    _prune()
+    return path
+
+
+def list_profiles() -> List[str]:
+    """Dateinamen in PROFILE_DIR, neueste zuerst."""
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(PROFILE_SUFFIX)]
+    except FileNotFoundError:
+        return []
+    return sorted(names, reverse=True)
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Pfad zu einem Profil – nur Dateinamen aus PROFILE_DIR (kein Pfad-Traversal)."""
+    if name != os.path.basename(name) or not name.endswith(PROFILE_SUFFIX):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def _prune() -> None:
+    """Aufbewahrung: älter als PROFILE_MAX_AGE_DAYS und über PROFILE_MAX_FILES hinaus löschen."""
+    names = list_profiles()
+    cutoff = time.time() - PROFILE_MAX_AGE_DAYS * 86400
+    for i, name in enumerate(names):
+        path = os.path.join(PROFILE_DIR, name)
+        try:
+            if i >= PROFILE_MAX_FILES or os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,41 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from .db import Base
+from . import models  # noqa: F401  (Tabellen registrieren)
+from .search import ensure_search_index
+
+log = logging.getLogger("invoice.schema")
+
+
+def ensure_schema(engine: Engine) -> None:
+    """
+    create_all + kleine Nachrüstung für bestehende Datenbanken:
+    - neue Tabellen werden angelegt (wie bisher)
+    - fehlende (nullable) Spalten werden per ALTER TABLE ergänzt
+    - fehlende Indizes werden angelegt
+    - Volltextindex über den Rohtext (MySQL FULLTEXT / SQLite FTS5, siehe search.py)
+    Keine Migrationen im eigentlichen Sinn – nur additive Änderungen.
+    """
+    Base.metadata.create_all(bind=engine)
+
+    insp = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        missing = [c for c in table.columns if c.name not in existing]
+        if missing:
+            with engine.begin() as conn:
+                for col in missing:
+                    col_type = col.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+                    log.info(f"Added column {table.name}.{col.name} ({col_type})")
+
+        existing_idx = {i["name"] for i in insp.get_indexes(table.name)}
+        for idx in table.indexes:
+            if idx.name not in existing_idx:
+                idx.create(bind=engine, checkfirst=True)
+                log.info(f"Created index {idx.name}")
+
+    ensure_search_index(engine)
@@ -0,0 +1,203 @@
+import re
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Invoice, InvoiceRawText
+
+log = logging.getLogger("invoice.search")
+
+# Volltextindex über invoice_raw_text.raw_text:
+#   MySQL  – FULLTEXT-Index (InnoDB pflegt ihn selbst bei INSERT/UPDATE/DELETE)
+#   SQLite – FTS5-Tabelle mit external content, per Trigger synchron gehalten
+#   sonst  – kein Index, LIKE über den Rohtext (nur für kleine Bestände)
+MYSQL_FT_INDEX = "ft_invoice_raw_text"
+SQLITE_FTS_TABLE = "invoice_raw_text_fts"
+MAX_TERMS = 16
+SNIPPET_BEFORE = 60
+SNIPPET_AFTER = 120
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+        raw_text, content='invoice_raw_text', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON invoice_raw_text BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, raw_text) VALUES (new.id, new.raw_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON invoice_raw_text BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, raw_text) VALUES ('delete', old.id, old.raw_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE ON invoice_raw_text BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, raw_text) VALUES ('delete', old.id, old.raw_text);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, raw_text) VALUES (new.id, new.raw_text);
+    END""",
+]
+
+# welcher Index in diesem Prozess benutzbar ist (von ensure_search_index gesetzt)
+_backend = "like"
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Volltextindex anlegen, falls er fehlt (aus ensure_schema, nach create_all)."""
+    global _backend
+    dialect = engine.dialect.name
+    if dialect == "mysql":
+        existing = {i["name"] for i in inspect(engine).get_indexes(InvoiceRawText.__tablename__)}
+        if MYSQL_FT_INDEX not in existing:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {InvoiceRawText.__tablename__} ADD FULLTEXT INDEX {MYSQL_FT_INDEX} (raw_text)"
+                ))
+            log.info(f"Created fulltext index {MYSQL_FT_INDEX}")
+        _backend = "mysql"
+    elif dialect == "sqlite":
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": SQLITE_FTS_TABLE},
+                ).first()
+                for ddl in _SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if not exists:
+                    # Altbestand einmalig indizieren
+                    conn.execute(text(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"))
+                    log.info(f"Created fulltext table {SQLITE_FTS_TABLE}")
+        except OperationalError as exc:
+            log.warning(f"SQLite without FTS5 ({exc}), search falls back to LIKE")
+            _backend = "like"
+            return
+        _backend = "sqlite"
+    else:
+        log.warning(f"No fulltext index for {dialect}, search falls back to LIKE")
+        _backend = "like"
+
+
+def query_terms(q: str) -> List[str]:
+    """Suchbegriffe: Wörter/Zahlen, Operatoren und Sonderzeichen fallen weg."""
+    return _TOKEN_RE.findall(q)[:MAX_TERMS]
+
+
+def _mysql_query(terms: List[str]) -> str:
+    # alle Begriffe müssen vorkommen, der letzte auch als Präfix (Eingabe während des Tippens)
+    return " ".join(f"+{t}*" if i == len(terms) - 1 else f"+{t}" for i, t in enumerate(terms))
+
+
+def _fts5_query(terms: List[str]) -> str:
+    # in Anführungszeichen: AND/OR/NOT/NEAR im Suchtext sind normale Wörter
+    return " ".join(f'"{t}"*' if i == len(terms) - 1 else f'"{t}"' for i, t in enumerate(terms))
+
+
+def _ranked_sql(backend: str) -> Tuple[str, str]:
+    """(Treffer-SQL, Anzahl-SQL) – Score je Rechnung = bester Score ihrer Rohtexte."""
+    if backend == "mysql":
+        match = "MATCH(raw_text) AGAINST (:q IN BOOLEAN MODE)"
+        hits = (
+            f"SELECT invoice_id, MAX({match}) AS score FROM invoice_raw_text WHERE {match} "
+            "GROUP BY invoice_id ORDER BY score DESC, invoice_id DESC LIMIT :limit OFFSET :offset"
+        )
+        count = f"SELECT COUNT(DISTINCT invoice_id) FROM invoice_raw_text WHERE {match}"
+        return hits, count
+    # FTS5: rank (= bm25, kleiner ist besser) nur direkt in der MATCH-Abfrage erlaubt –
+    # "LIMIT -1" verhindert, dass SQLite die Unterabfrage in das GROUP BY hineinzieht
+    fts = SQLITE_FTS_TABLE
+    matched = f"SELECT rowid, -rank AS score FROM {fts} WHERE {fts} MATCH :q LIMIT -1"
+    hits = (
+        f"SELECT r.invoice_id, MAX(m.score) AS score FROM ({matched}) m "
+        "JOIN invoice_raw_text r ON r.id = m.rowid "
+        "GROUP BY r.invoice_id ORDER BY score DESC, r.invoice_id DESC LIMIT :limit OFFSET :offset"
+    )
+    count = (
+        f"SELECT COUNT(DISTINCT r.invoice_id) FROM {fts} "
+        f"JOIN invoice_raw_text r ON r.id = {fts}.rowid WHERE {fts} MATCH :q"
+    )
+    return hits, count
+
+
+def _like_conds(terms: List[str]) -> List[Any]:
+    # Begriffe sind reine \w-Folgen – nur "_" muss für LIKE escaped werden
+    return [InvoiceRawText.raw_text.like(f"%{t.replace('_', '!_')}%", escape="!") for t in terms]
+
+
+def make_snippet(raw_text: Optional[str], terms: List[str]) -> Optional[str]:
+    """Textausschnitt um den ersten Treffer, Whitespace zusammengezogen."""
+    if not raw_text:
+        return None
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in terms) + r")", re.IGNORECASE)
+    m = pattern.search(raw_text)
+    pos = m.start() if m else 0
+    start = max(0, pos - SNIPPET_BEFORE)
+    end = min(len(raw_text), pos + SNIPPET_AFTER)
+    snippet = " ".join(raw_text[start:end].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(raw_text) else "")
+
+
+async def search_invoices(
+    db: AsyncSession, q: str, limit: int, offset: int, with_total: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Rechnungen, deren Rohtext alle Suchbegriffe enthält – nach Relevanz sortiert.
+    Liefert (Treffer, Gesamtanzahl oder None); Treffer mit Kopfdaten und Snippet.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return [], (0 if with_total else None)
+
+    total: Optional[int] = None
+    if _backend == "like":
+        conds = _like_conds(terms)
+        ranked = [
+            (row[0], 0.0) for row in await db.execute(
+                select(InvoiceRawText.invoice_id).where(and_(*conds)).distinct()
+                .order_by(InvoiceRawText.invoice_id.desc()).limit(limit).offset(offset)
+            )
+        ]
+        if with_total:
+            total = await db.scalar(select(func.count(func.distinct(InvoiceRawText.invoice_id))).where(and_(*conds)))
+    else:
+        hits_sql, count_sql = _ranked_sql(_backend)
+        match = _mysql_query(terms) if _backend == "mysql" else _fts5_query(terms)
+        ranked = [
+            (row[0], float(row[1] or 0.0))
+            for row in await db.execute(text(hits_sql), {"q": match, "limit": limit, "offset": offset})
+        ]
+        if with_total:
+            total = await db.scalar(text(count_sql), {"q": match})
+
+    if not ranked:
+        return [], total
+
+    ids = [invoice_id for invoice_id, _ in ranked]
+    invoices = {inv.id: inv for inv in await db.scalars(select(Invoice).where(Invoice.id.in_(ids)))}
+    snippets: Dict[int, str] = {}
+    for invoice_id, raw_text in await db.execute(
+        select(InvoiceRawText.invoice_id, InvoiceRawText.raw_text)
+        .where(InvoiceRawText.invoice_id.in_(ids)).order_by(InvoiceRawText.id)
+    ):
+        if invoice_id not in snippets:
+            snippet = make_snippet(raw_text, terms)
+            if snippet:
+                snippets[invoice_id] = snippet
+
+    hits = []
+    for invoice_id, score in ranked:
+        inv = invoices.get(invoice_id)
+        if inv is None:
+            continue  # zwischen den Abfragen gelöscht
+        hits.append({
+            "invoice_id": inv.id,
+            "supplier_name": inv.supplier_name,
+            "invoice_number": inv.invoice_number,
+            "invoice_date": inv.invoice_date,
+            "total_amount": inv.total_amount,
+            "currency": inv.currency,
+            "score": score,
+            "snippet": snippets.get(invoice_id),
+        })
+    return hits, total
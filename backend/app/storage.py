@@ -0,0 +1,81 @@
+import os
+import uuid
+import hashlib
+import tempfile
+from typing import BinaryIO, Tuple
+
+STORAGE_DIR = os.path.join(os.path.dirname(__file__), "..", "storage")
+os.makedirs(STORAGE_DIR, exist_ok=True)
+# Temp-Dateien laufender Uploads: nicht in STORAGE_DIR (per /files ausgeliefert), aber auf
+# demselben Dateisystem, damit os.replace atomar umbenennen kann. Leer = neben STORAGE_DIR
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", "")
+
+CHUNK_SIZE = 1024 * 1024
+# max. Uploadgröße, wird während des Kopierens geprüft (nicht erst danach)
+UPLOAD_MAX_MB = float(os.getenv("UPLOAD_MAX_MB", "250"))
+# laut PDF-Spezifikation darf der Header irgendwo in den ersten 1024 Bytes stehen
+PDF_MAGIC = b"%PDF-"
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class NotAPdf(Exception):
+    pass
+
+
+def storage_path(name: str) -> str:
+    return os.path.join(STORAGE_DIR, name)
+
+
+def upload_tmp_dir() -> str:
+    path = UPLOAD_TMP_DIR or os.path.join(os.path.dirname(os.path.abspath(STORAGE_DIR)), ".upload-tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_upload(src: BinaryIO, max_bytes: int = int(UPLOAD_MAX_MB * 1024 * 1024)) -> Tuple[str, str]:
+    """
+    Upload nach STORAGE_DIR kopieren – in festen Blöcken, speicherbegrenzt:
+    - erster Block: PDF-Magic prüfen (statt der Dateiendung zu trauen)
+    - Größenlimit während des Kopierens (UploadTooLarge)
+    - SHA-256 im selben Durchlauf
+    - erst in eine Temp-Datei außerhalb von STORAGE_DIR schreiben (halbe Uploads sind nicht
+      über /files abrufbar), dann atomar umbenennen
+    Rückgabe: (Dateiname in STORAGE_DIR, Hex-Hash)
+    """
+    uid = f"{uuid.uuid4()}.pdf"
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=upload_tmp_dir(), prefix="upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            first = True
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if first:
+                    if PDF_MAGIC not in chunk[:1024]:
+                        raise NotAPdf()
+                    first = False
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                sha.update(chunk)
+                f.write(chunk)
+            if first:
+                raise NotAPdf()  # leere Datei
+        os.replace(tmp_path, storage_path(uid))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return uid, sha.hexdigest()
+
+
+def remove_file(name: str) -> None:
+    path = storage_path(name)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,63 @@
+"""
+Zwei Läufe von bench.suite vergleichen: Zeit je Stufe (neu/alt) und Genauigkeit (neu − alt).
+Genauigkeitsverluste werden markiert – ein schnellerer Lauf, der Felder verliert, fällt auf.
+
+    python -m bench.compare ALT.json NEU.json [--stages extract,upload]
+"""
+import sys
+import json
+import pathlib
+import argparse
+from typing import Any, Dict, List, Optional
+
+ACCURACY_KEYS = ["header", "item_precision", "item_recall"]
+
+
+def _load(path: str) -> Dict[str, Any]:
+    return json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
+
+
+def _ratio(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "     -"
+    if old <= 0:
+        return "     -" if new <= 0 else "   new"
+    return f"{new / old:6.2f}"
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], stages: List[str]) -> int:
+    """Tabelle ausgeben; Rückgabe = Anzahl Dokumente mit Genauigkeitsverlust."""
+    print(f"old: {old['meta'].get('git')} {old['meta'].get('timestamp')}  "
+          f"new: {new['meta'].get('git')} {new['meta'].get('timestamp')}")
+    if (old["meta"].get("profile"), old["meta"].get("seed")) != (new["meta"].get("profile"), new["meta"].get("seed")):
+        print("warning: different profile/seed – only documents present in both runs are compared")
+
+    old_docs = {d["name"]: d for d in old["docs"]}
+    print(f"{'document':24} " + " ".join(f"{s:>10}" for s in stages) + "  " +
+          " ".join(f"{'Δ' + k:>15}" for k in ACCURACY_KEYS))
+    worse = 0
+    for doc in new["docs"]:
+        base = old_docs.get(doc["name"])
+        if base is None:
+            continue
+        cols = " ".join(f"{_ratio(base['stages_ms'].get(s), doc['stages_ms'].get(s)):>10}" for s in stages)
+        deltas = [doc["accuracy"][k] - base["accuracy"][k] for k in ACCURACY_KEYS]
+        flag = "  ← accuracy lost" if any(d < 0 for d in deltas) else ""
+        worse += bool(flag)
+        print(f"{doc['name']:24} {cols}  " + " ".join(f"{d:+15.4f}" for d in deltas) + flag)
+    print("(Zeiten: neu/alt, < 1 = schneller)")
+    return worse
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Zwei bench.suite-Ergebnisse vergleichen")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--stages", default="open,text_layer,render,ocr,rows,items,header,db_write,extract,upload")
+    args = parser.parse_args(argv)
+    worse = compare(_load(args.old), _load(args.new), args.stages.split(","))
+    sys.exit(1 if worse else 0)
+
+
+if __name__ == "__main__":
+    main()
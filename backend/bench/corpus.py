@@ -0,0 +1,204 @@
+"""
+Synthetischer, deterministischer Rechnungs-Korpus mit Ground Truth.
+
+Je Fall ein born-digital PDF (echter Textlayer) und optional eine gerasterte "Scan"-Fassung
+derselben Seiten (Graustufen, JPEG, ohne Textlayer). Gleicher Seed → byte-gleiche PDFs,
+d.h. Läufe auf verschiedenen Commits messen dieselben Dokumente.
+
+Ground Truth (<name>.json): Kopf-/Summenfelder wie rules.parse_header sie liefern soll und
+alle Positionen (Beschreibung, Menge, Einzelpreis, Zeilensumme).
+
+    python -m bench.corpus [--profile standard] [--seed 1] [--out DIR]
+"""
+import io
+import os
+import sys
+import json
+import random
+import pathlib
+import argparse
+import datetime
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+# (Positionen, Seiten) je Fall; jeder Fall digital + Scan
+PROFILES: Dict[str, List[Tuple[int, int]]] = {
+    "quick": [(5, 1), (40, 2)],
+    "standard": [(5, 1), (25, 1), (80, 3), (200, 8), (500, 20)],
+    "full": [(5, 1), (25, 1), (80, 3), (200, 8), (500, 20), (120, 50), (500, 50)],
+}
+SCAN_DPI = 200
+SCAN_JPEG_QUALITY = 75
+
+SUPPLIERS = [
+    "Nordlicht Werkzeuge GmbH", "Becker & Sohn KG", "Hansen Bau AG", "Weber Elektro OHG",
+    "Krause Metallbau GmbH", "Vogel Sanitär e.K.", "Brandt Holzhandel KG", "Lorenz Technik UG",
+]
+ARTICLES = [
+    "Schraube", "Mutter", "Scheibe", "Dübel", "Winkel", "Edelstahl", "Holz", "Kupfer", "Rohr",
+    "Flansch", "Dichtung", "Kabel", "Klemme", "Bohrer", "Zange", "Hammer", "Feile", "Nagel",
+]
+SIZES = ["M4", "M6", "M8", "M10", "8mm", "12mm", "20mm", "1m", "2,5m", "DN50"]
+
+PAGE_W, PAGE_H = 595.28, 841.89  # A4 in pt
+FONT_SIZE = 9
+LEFT, RIGHT = 50, 545
+TOP, BOTTOM = 60, 790
+ROW_H = 13
+
+
+def default_dir(seed: int) -> str:
+    return os.path.join(tempfile.gettempdir(), f"invoice-bench-corpus-{seed}")
+
+
+def _de(v: float) -> str:
+    """1234.5 → '1.234,50'"""
+    return f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def ground_truth(n_items: int, seed: int) -> Dict[str, Any]:
+    rnd = random.Random(seed)
+    date = datetime.date(2024, 1, 1) + datetime.timedelta(days=rnd.randint(0, 700))
+    items = []
+    for _ in range(n_items):
+        qty = rnd.choice([1, 2, 3, 4, 5, 10, 12, 20, 25, 50, 100, 250])
+        price = rnd.randint(5, 250000) / 100.0
+        desc = " ".join(rnd.sample(ARTICLES, rnd.randint(1, 3)) + [rnd.choice(SIZES)])
+        items.append({
+            "description": desc,
+            "quantity": float(qty),
+            "unit_price": price,
+            "line_total": round(qty * price, 2),
+        })
+    return {
+        "supplier_name": rnd.choice(SUPPLIERS),
+        "invoice_number": f"RE-{date.year}-{rnd.randint(1, 99999):05d}",
+        "invoice_date": date.isoformat(),
+        "total_amount": round(sum(it["line_total"] for it in items), 2),
+        "currency": "EUR",
+        "with_pos_column": rnd.random() < 0.5,
+        "items": items,
+    }
+
+
+def _text(page: fitz.Page, x: float, y: float, s: str, right: bool = False, bold: bool = False) -> None:
+    font = "hebo" if bold else "helv"
+    if right:
+        x -= fitz.get_text_length(s, fontname=font, fontsize=FONT_SIZE)
+    page.insert_text((x, y), s, fontname=font, fontsize=FONT_SIZE)
+
+
+def _table_header(page: fitz.Page, y: float, pos: bool) -> float:
+    if pos:
+        _text(page, LEFT, y, "Pos", bold=True)
+    _text(page, LEFT + (30 if pos else 0), y, "Artikel", bold=True)
+    _text(page, 360, y, "Menge", right=True, bold=True)
+    _text(page, 450, y, "Einzelpreis", right=True, bold=True)
+    _text(page, RIGHT, y, "Gesamt", right=True, bold=True)
+    page.draw_line((LEFT, y + 4), (RIGHT, y + 4), width=0.5)
+    return y + ROW_H + 4
+
+
+def digital_pdf(truth: Dict[str, Any], pages: int) -> bytes:
+    """Born-digital PDF: Kopf auf Seite 1, Positionen gleichmäßig über `pages` Seiten, Summe am Ende."""
+    doc = fitz.open()
+    items = truth["items"]
+    pos = truth["with_pos_column"]
+    per_page = -(-len(items) // pages)
+    d = datetime.date.fromisoformat(truth["invoice_date"])
+    for p in range(pages):
+        page = doc.new_page(width=PAGE_W, height=PAGE_H)
+        y = TOP
+        if p == 0:
+            _text(page, LEFT, y, truth["supplier_name"], bold=True)
+            _text(page, LEFT, y + ROW_H, "Industriestraße 12, 20095 Hamburg")
+            _text(page, LEFT, y + 4 * ROW_H, "Kunde: Muster Handwerk, Am Markt 3, 28195 Bremen")
+            _text(page, 360, y + 4 * ROW_H, f"Rechnungsnummer: {truth['invoice_number']}")
+            _text(page, 360, y + 5 * ROW_H, f"Datum: {d.day:02d}.{d.month:02d}.{d.year}")
+            y += 8 * ROW_H
+        y = _table_header(page, y, pos)
+        chunk = items[p * per_page:(p + 1) * per_page]
+        for k, it in enumerate(chunk):
+            if pos:
+                _text(page, LEFT, y, str(p * per_page + k + 1))
+            _text(page, LEFT + (30 if pos else 0), y, it["description"])
+            _text(page, 360, y, f"{int(it['quantity'])}", right=True)
+            _text(page, 450, y, _de(it["unit_price"]), right=True)
+            _text(page, RIGHT, y, _de(it["line_total"]), right=True)
+            y += ROW_H
+        _text(page, RIGHT, BOTTOM + 20, f"Seite {p + 1} von {pages}", right=True)
+        if p == pages - 1:
+            page.draw_line((360, y), (RIGHT, y), width=0.5)
+            _text(page, 360, y + ROW_H, "Gesamtbetrag", bold=True)
+            _text(page, RIGHT, y + ROW_H, f"{_de(truth['total_amount'])} EUR", right=True, bold=True)
+    # ohne Zeitstempel/ID → gleiche Eingabe, gleiche Bytes
+    doc.set_metadata({})
+    return doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+
+
+def scanned_pdf(digital: bytes, dpi: int = SCAN_DPI) -> bytes:
+    """Jede Seite als Graustufen-JPEG (wie ein Büroscanner) – kein Textlayer."""
+    src = fitz.open(stream=digital, filetype="pdf")
+    out = fitz.open()
+    zoom = dpi / 72.0
+    for page in src:
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+        img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=SCAN_JPEG_QUALITY)
+        dst = out.new_page(width=page.rect.width, height=page.rect.height)
+        dst.insert_image(dst.rect, stream=buf.getvalue())
+    out.set_metadata({})
+    return out.tobytes(garbage=3, deflate=True, no_new_id=True)
+
+
+def build(profile: str = "standard", seed: int = 1, out_dir: Optional[str] = None,
+          scans: bool = True) -> List[Dict[str, Any]]:
+    """
+    Korpus erzeugen (bereits vorhandene Dateien werden wiederverwendet).
+    Rückgabe: je Dokument {name, kind, pages, items, pdf, truth}.
+    """
+    out = pathlib.Path(out_dir or default_dir(seed))
+    out.mkdir(parents=True, exist_ok=True)
+    cases: List[Dict[str, Any]] = []
+    for n, (n_items, pages) in enumerate(PROFILES[profile]):
+        stem = f"inv{n_items:03d}x{pages:02d}"
+        truth_path = out / f"{stem}.json"
+        digital_path = out / f"{stem}-digital.pdf"
+        scan_path = out / f"{stem}-scan.pdf"
+        truth = ground_truth(n_items, seed * 1000 + n)
+        if not truth_path.exists():
+            truth_path.write_text(json.dumps(truth, ensure_ascii=False, indent=1), encoding="utf-8")
+        if not digital_path.exists():
+            digital_path.write_bytes(digital_pdf(truth, pages))
+        kinds = [("digital", digital_path)]
+        if scans:
+            if not scan_path.exists():
+                scan_path.write_bytes(scanned_pdf(digital_path.read_bytes()))
+            kinds.append(("scan", scan_path))
+        for kind, path in kinds:
+            cases.append({
+                "name": f"{stem}-{kind}", "kind": kind, "pages": pages, "items": n_items,
+                "pdf": str(path), "truth": truth,
+            })
+    return cases
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Synthetischen Rechnungs-Korpus erzeugen")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="standard")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Zielordner (Standard: Temp-Ordner je Seed)")
+    parser.add_argument("--no-scans", action="store_true")
+    args = parser.parse_args(argv)
+    for case in build(args.profile, args.seed, args.out, scans=not args.no_scans):
+        print(f"{case['name']:24} {case['pages']:3d} p {case['items']:4d} items  {case['pdf']}")
+
+
+if __name__ == "__main__":
+    main()
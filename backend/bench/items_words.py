@@ -0,0 +1,270 @@
+"""
+Micro-Benchmark: Wortdarstellung der Positions-Extraktion.
+
+Vergleicht die frühere Darstellung (ein Dict pro OCR-Wort, Dict-Wrapper je Token in
+_classify_line) mit der spaltenweisen WordTable – Laufzeit und Speicher pro Seite,
+auf einer synthetischen, dichten Tesseract-Seite. Prüft nebenbei, dass beide
+Varianten dieselben Positionen liefern. Laufzeit wird abwechselnd gemessen und als
+Minimum über --repeat Läufe verglichen (der Median schwankt hier stark). Bei 400 Zeilen
+lag der Gewinn über 8 Aufrufe bei x1.29–x1.55 Laufzeit und x2.38 Spitzen-Speicher.
+
+    python -m bench.items_words [--rows 400] [--repeat 20]
+"""
+import sys
+import time
+import random
+import argparse
+import pathlib
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from app.extraction.words import WordTable
+from app.extraction.items_ocr import (
+    _normalize_number, _cluster_rows, _extract_rows, _Numbers,
+    HEADER_TOKENS, NOISE_TOKENS, PCT_RE, CURR_RE,
+)
+
+
+# --- synthetische Seite im Format von pytesseract.image_to_data(..., DICT) ---
+def synthetic_page(rows: int, seed: int = 42) -> Dict[str, List[Any]]:
+    rnd = random.Random(seed)
+    data: Dict[str, List[Any]] = {k: [] for k in (
+        "text", "conf", "left", "top", "width", "height", "block_num", "par_num", "line_num")}
+
+    def add(line_no: int, y: int, words: List[str], xs: List[int]) -> None:
+        for w, x in zip(words, xs):
+            data["text"].append(w)
+            data["conf"].append(str(rnd.randint(60, 96)))
+            data["left"].append(x + rnd.randint(-2, 2))
+            data["top"].append(y + rnd.randint(-2, 2))
+            data["width"].append(12 * len(w))
+            data["height"].append(28)
+            data["block_num"].append(1)
+            data["par_num"].append(1)
+            data["line_num"].append(line_no)
+        # Tesseract liefert auch leere Einträge (Block-/Zeilenebene)
+        for k in data:
+            data[k].append("" if k == "text" else ("-1" if k == "conf" else 0))
+
+    y = 120
+    add(1, y, ["Muster", "GmbH", "Musterstraße", "5"], [150, 300, 420, 700]); y += 45
+    add(2, y, ["IBAN", "DE12", "3456", "7890"], [150, 260, 360, 460]); y += 90
+    add(3, y, ["Pos", "Artikel", "Menge", "Einzelpreis", "Gesamt"], [150, 260, 1100, 1350, 1600]); y += 45
+    words = ["Schraube", "M8", "verzinkt", "Mutter", "Scheibe", "Dübel", "Winkel", "Edelstahl", "Set", "Holz"]
+    for i in range(rows):
+        qty = rnd.randint(1, 500)
+        price = rnd.randint(10, 99999) / 100.0
+        desc = rnd.sample(words, rnd.randint(1, 4))
+        fmt = lambda v: f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        line = [str(i + 1)] + desc + [str(qty), fmt(price), fmt(qty * price)]
+        xs = [150] + [260 + 150 * k for k in range(len(desc))] + [1100, 1350, 1600]
+        add(4 + i, y, line, xs)
+        y += 45
+    add(4 + rows, y + 40, ["Gesamtbetrag", "EUR"], [1100, 1600])
+    return data
+
+
+# --- Baseline: frühere Dict-pro-Wort-Implementierung (zum Vergleich) ---
+def _legacy_tsv_words(data: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    words = []
+    n = len(data["text"])
+    for i in range(n):
+        txt = (data["text"][i] or "").strip()
+        if not txt:
+            continue
+        try:
+            conf = float(data["conf"][i])
+        except Exception:
+            conf = -1.0
+        x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
+        words.append({
+            "text": txt, "conf": conf,
+            "x": int(x), "y": int(y), "w": int(w), "h": int(h),
+            "cx": x + w/2.0, "cy": y + h/2.0,
+            "right": x + w, "bottom": y + h,
+        })
+    return words
+
+
+def _legacy_cluster_rows(words: List[Dict[str, Any]], y_tol: int = 7) -> List[List[Dict[str, Any]]]:
+    if not words:
+        return []
+    words = sorted(words, key=lambda w: (w["cy"], w["x"]))
+    rows: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    last_cy = None
+    for w in words:
+        if last_cy is None:
+            current = [w]
+            last_cy = w["cy"]
+            continue
+        if abs(w["cy"] - last_cy) <= y_tol:
+            current.append(w)
+            last_cy = (last_cy + w["cy"]) / 2.0
+        else:
+            if current:
+                rows.append(sorted(current, key=lambda t: t["x"]))
+            current = [w]
+            last_cy = w["cy"]
+    if current:
+        rows.append(sorted(current, key=lambda t: t["x"]))
+    return rows
+
+
+def _legacy_is_header_row(row: List[Dict[str, Any]]) -> bool:
+    text = " ".join((t["text"] or "").lower() for t in row)
+    hits = sum(1 for k in HEADER_TOKENS if k in text)
+    return hits >= 2
+
+
+def _legacy_is_noise_row(row: List[Dict[str, Any]]) -> bool:
+    text = " ".join((t["text"] or "").lower() for t in row)
+    return any(k in text for k in NOISE_TOKENS)
+
+
+def _legacy_classify_line(row: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if not row:
+        return {}
+
+    tokens = []
+    for t in row:
+        raw = t["text"]
+        val = _normalize_number(raw)
+        tokens.append({
+            "t": t, "text": raw, "x": t["x"],
+            "val": val,
+            "is_num": (val is not None) and (not PCT_RE.search(raw)),
+            "has_curr": bool(CURR_RE.search(raw)),
+        })
+
+    nums = [k for k in tokens if k["is_num"]]
+    if len(nums) < 2:
+        return {}
+
+    # line_total: rechts + ggf. mit Währung, sonst größte rechts
+    with_curr = [n for n in nums if n["has_curr"]]
+    if with_curr:
+        line_total_token = max(with_curr, key=lambda k: (k["x"], k["val"]))
+    else:
+        line_total_token = max(nums, key=lambda k: (k["x"], k["val"]))
+    line_total = line_total_token["val"]
+
+    left_nums = [n for n in nums if n["x"] < line_total_token["x"] and n["val"] and n["val"] > 0]
+
+    unit_price = None
+    if left_nums:
+        plausible = [n for n in left_nums if n["val"] <= line_total] or left_nums
+        unit_price = max(plausible, key=lambda k: k["val"])["val"]
+
+    quantity = None
+    qty_candidates = [n for n in left_nums if (unit_price is None or n["val"] != unit_price)]
+    if qty_candidates:
+        qty_candidates.sort(key=lambda k: (k["x"], k["val"]))
+        for c in qty_candidates:
+            v = c["val"]
+            if v is not None and 0 < v <= 10000:
+                quantity = v
+                break
+
+    # Beschreibung: Text links von total, der nicht reine Zahl ist
+    right_border = line_total_token["x"]
+    desc_parts: List[str] = []
+    for k in tokens:
+        if k["x"] >= right_border:
+            continue
+        if k["is_num"] and not k["has_curr"]:
+            continue
+        txt = k["text"].strip()
+        if not txt:
+            continue
+        desc_parts.append(txt)
+    description = " ".join(desc_parts).strip() or None
+
+    return {
+        "description": description,
+        "quantity": quantity,
+        "unit": None,
+        "unit_price": unit_price,
+        "vat_rate": None,
+        "vat_amount": None,
+        "line_total": line_total,
+    }
+
+
+def _legacy_extract_rows(rows: List[List[Dict[str, Any]]], require_header: bool) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    started = not require_header
+    for row in rows:
+        if _legacy_is_noise_row(row):
+            continue
+        if require_header and not started:
+            if _legacy_is_header_row(row):
+                started = True
+            continue
+        line = _legacy_classify_line(row)
+        have = sum(1 for k in ("quantity", "unit_price", "line_total") if line.get(k) is not None)
+        if have >= 2 or (line.get("description") and line.get("line_total") is not None):
+            line["line_index"] = len(items) + 1
+            items.append(line)
+    return items
+
+
+def legacy_page(data: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    rows = _legacy_cluster_rows(_legacy_tsv_words(data), y_tol=7)
+    return _legacy_extract_rows(rows, require_header=True) or _legacy_extract_rows(rows, require_header=False)
+
+
+def table_page(data: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    words = WordTable.from_tesseract(data)
+    rows = _cluster_rows(words, y_tol=7)
+    nums_col = _Numbers(words)
+    return (_extract_rows(words, rows, require_header=True, nums_col=nums_col)
+            or _extract_rows(words, rows, require_header=False, nums_col=nums_col))
+
+
+# --- Messung ---
+def measure(fns: List[Callable], data: Dict[str, List[Any]], repeat: int) -> List[Dict[str, float]]:
+    """Varianten abwechselnd messen – Lastschwankungen der Maschine treffen alle gleich."""
+    for fn in fns:
+        fn(data)  # warm-up
+    times: List[List[float]] = [[] for _ in fns]
+    for _ in range(repeat):
+        for fn, out in zip(fns, times):
+            t0 = time.perf_counter()
+            fn(data)
+            out.append(time.perf_counter() - t0)
+    results = []
+    for fn, ts in zip(fns, times):
+        tracemalloc.start()
+        fn(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        ts.sort()
+        results.append({"median_ms": 1000 * ts[len(ts) // 2], "min_ms": 1000 * ts[0], "peak_kib": peak / 1024})
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=400, help="Positionszeilen pro Seite")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    data = synthetic_page(args.rows)
+    n_words = sum(1 for t in data["text"] if t)
+    assert legacy_page(data) == table_page(data), "Ergebnis weicht von der Baseline ab"
+
+    base, new = measure([legacy_page, table_page], data, args.repeat)
+    print(f"Seite: {args.rows} Positionen, {n_words} Wörter")
+    print(f"{'':10} {'median ms':>10} {'min ms':>10} {'peak KiB':>10}")
+    for name, r in (("dict", base), ("WordTable", new)):
+        print(f"{name:10} {r['median_ms']:10.2f} {r['min_ms']:10.2f} {r['peak_kib']:10.1f}")
+    # min-of-N: der Median schwankt zwischen Läufen stark (GC, Scheduler), das Minimum kaum
+    print(f"speed-up (min of {args.repeat}) x{base['min_ms'] / new['min_ms']:.2f}, "
+          f"memory x{base['peak_kib'] / max(new['peak_kib'], 1e-9):.2f}")
+
+
+if __name__ == "__main__":
+    main()
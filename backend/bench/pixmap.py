@@ -0,0 +1,140 @@
+"""
+Benchmark: Übergabe gerenderter Seiten an die OCR-Engine.
+
+Misst pro Seite Laufzeit und Speicher-Spitze für
+    legacy      RGB-Pixmap → samples (Kopie) → Image.frombytes (Kopie) → PNG-Temp-Datei
+    gray-copy   wie legacy, aber Graustufen
+    zero-copy   Graustufen-Pixmap → Image.frombuffer(samples_mv) → PGM-Temp-Datei (aktueller Pfad)
+    tesserocr   Graustufen-Pixmap → samples (eine Kopie) für SetImageBytes
+Jede Variante läuft in einem eigenen Prozess (Peak-RSS vergleichbar). Ohne PDF-Argument
+wird ein synthetischer A4-Scan (300 dpi) erzeugt. --ocr misst zusätzlich den vollen
+OCR-Lauf über die konfigurierte Engine (braucht eine echte Tesseract-Installation).
+
+    python -m bench.pixmap [scan.pdf] [--pages 5] [--zoom 3.0] [--ocr]
+"""
+import io
+import sys
+import time
+import pathlib
+import argparse
+import resource
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+from pytesseract.pytesseract import save as tesseract_temp_file
+
+from app.extraction.ocr_engine import pixmap_image, get_engine
+
+
+def synthetic_scan() -> bytes:
+    """Einseitiges PDF mit einem 300-dpi-RGB-Scan (Text + Tabellenlinien)."""
+    img = Image.new("RGB", (2480, 3508), "white")
+    draw = ImageDraw.Draw(img)
+    y = 200
+    while y < 3300:
+        draw.text((200, y), f"Position {y // 60}  Schraube M8 verzinkt  10  1,50  15,00", fill="black")
+        draw.line((180, y + 40, 2300, y + 40), fill=(120, 120, 120), width=2)
+        y += 60
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    doc = fitz.open()
+    page = doc.new_page(width=595.28, height=841.89)
+    page.insert_image(page.rect, stream=buf.getvalue())
+    return doc.tobytes()
+
+
+# --- Varianten: Render + Übergabe (bis zur Datei/zum Puffer, den Tesseract liest) ---
+def _legacy(page: fitz.Page, zoom: float) -> None:
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    with tesseract_temp_file(img):
+        pass
+
+
+def _gray_copy(page: fitz.Page, zoom: float) -> None:
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", [pix.width, pix.height], pix.samples)
+    with tesseract_temp_file(img):
+        pass
+
+
+def _zero_copy(page: fitz.Page, zoom: float) -> None:
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    img = pixmap_image(pix)
+    with tesseract_temp_file(img):
+        pass
+    del img
+
+
+def _tesserocr(page: fitz.Page, zoom: float) -> None:
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    buf = pix.samples  # entspricht der Übergabe an SetImageBytes
+    del buf
+
+
+def _ocr(page: fitz.Page, zoom: float) -> None:
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    get_engine().words(pix)
+
+
+VARIANTS: Dict[str, Callable[[fitz.Page, float], None]] = {
+    "legacy": _legacy,
+    "gray-copy": _gray_copy,
+    "zero-copy": _zero_copy,
+    "tesserocr": _tesserocr,
+}
+
+
+def _run_variant(name: str, pdf: bytes, pages: int, zoom: float) -> Dict[str, float]:
+    """Läuft im eigenen Prozess: Zeit je Seite, tracemalloc-Spitze, Anstieg des Peak-RSS."""
+    fn = _ocr if name == "ocr" else VARIANTS[name]
+    doc = fitz.open(stream=pdf, filetype="pdf")
+    page_list = [doc[i % doc.page_count] for i in range(pages)]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fn(page_list[0], zoom)  # warm-up (Fonts, Colorspaces, ggf. Engine)
+
+    times: List[float] = []
+    tracemalloc.start()
+    for page in page_list:
+        t0 = time.perf_counter()
+        fn(page, zoom)
+        times.append(time.perf_counter() - t0)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times.sort()
+    return {
+        "median_ms": 1000 * times[len(times) // 2],
+        "py_peak_mb": py_peak / 2**20,
+        "rss_growth_mb": (rss_after - rss_before) / 1024,  # ru_maxrss: KiB (Linux)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Pixmap → OCR Übergabe: Zeit und Speicher je Seite")
+    parser.add_argument("pdf", nargs="?", help="gescanntes PDF (Standard: synthetischer A4-Scan)")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--zoom", type=float, default=3.0)
+    parser.add_argument("--ocr", action="store_true", help="zusätzlich vollen OCR-Lauf messen")
+    args = parser.parse_args(argv)
+
+    pdf = pathlib.Path(args.pdf).read_bytes() if args.pdf else synthetic_scan()
+    names = list(VARIANTS) + (["ocr"] if args.ocr else [])
+
+    print(f"{'variant':12} {'median ms':>10} {'py peak MB':>11} {'RSS +MB':>9}")
+    ctx = multiprocessing.get_context("spawn")
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            r = pool.submit(_run_variant, name, pdf, args.pages, args.zoom).result()
+        print(f"{name:12} {r['median_ms']:10.1f} {r['py_peak_mb']:11.1f} {r['rss_growth_mb']:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
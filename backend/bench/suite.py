@@ -0,0 +1,315 @@
+"""
+Benchmark-Suite: Laufzeit je Stufe + Genauigkeit gegen die Ground Truth, auf dem
+synthetischen Korpus (bench.corpus), Ergebnis als JSON zum Vergleichen (bench.compare).
+
+Stufen je Dokument (Median über --repeat Läufe, in ms):
+    open        PDF öffnen (Document, PyMuPDF)
+    text_layer  Rohtext + Wortboxen aus dem Textlayer, OCR-Entscheidung je Seite
+    render      Seitenbilder der OCR-Seiten (adaptiver Zoom, Graustufen)
+    ocr         Tesseract auf diesen Bildern – seriell, also CPU-Zeit, nicht Pool-Wandzeit
+    rows        Zeilen-Clustering der Wortboxen (items_ocr._cluster_rows)
+    items       Positionen aus den Zeilen (_extract_rows)
+    header      Kopf-/Summenfelder (rules.parse_header)
+    db_write    Invoice + Rohtext + Positionen schreiben (apply_extraction, SQLite)
+    extract     run_extraction komplett (wie die Jobqueue, mit OCR-Pool)
+    upload      POST /upload bis GET /jobs/{id} = done, über die echte App (TestClient)
+
+Die Genauigkeit wird auf dem Ergebnis von run_extraction gemessen, also dem, was
+gespeichert würde. Die Datenbank ist immer eine frische SQLite-Datei im Temp-Ordner
+(DATABASE_URL wird überschrieben), Uploads werden am Ende wieder gelöscht.
+
+    python -m bench.suite [--profile standard] [--repeat 3] [--no-scans] [--no-upload] [--out FILE]
+"""
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import platform
+import datetime
+import tempfile
+import statistics
+import subprocess
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from bench.corpus import PROFILES, build
+
+STAGES = ["open", "text_layer", "render", "ocr", "rows", "items", "header", "db_write", "extract", "upload"]
+HEADER_FIELDS = ["supplier_name", "invoice_number", "invoice_date", "total_amount", "currency"]
+RESULTS_DIR = pathlib.Path(__file__).resolve().parent / "results"
+
+
+def _isolate_db(workdir: str) -> str:
+    """Vor dem ersten Import von app.*: eigene SQLite-DB, kein Dedup (gleiche PDFs je Wiederholung)."""
+    url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["ASYNC_DATABASE_URL"] = ""  # aus DATABASE_URL ableiten, nicht aus .env
+    os.environ["DEDUP_MODE"] = "off"
+    return url
+
+
+class _Timer:
+    def __init__(self) -> None:
+        self.ms: Dict[str, float] = {}
+
+    @contextmanager
+    def __call__(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[stage] = self.ms.get(stage, 0.0) + 1000 * (time.perf_counter() - t0)
+
+
+def _stages_once(pdf: str) -> Dict[str, float]:
+    """Eine Messung aller Stufen außer upload; Reihenfolge wie in der Pipeline."""
+    from app.db import SessionLocal
+    from app.models import Invoice
+    from app.pipeline import apply_extraction, run_extraction, parse_header_fields
+    from app.extraction.document import Document
+    from app.extraction.items_ocr import _Numbers, _cluster_rows, _extract_rows
+    from app.extraction.ocr import _choose_zoom, _ocr_pixmap, _render_page
+
+    t = _Timer()
+    with Document(pdf) as doc:
+        with t("open"):
+            count = doc.page_count
+        with t("text_layer"):
+            for i in range(count):
+                doc.text(i)
+                doc.words(i)
+            ocr_pages = [i for i in range(count) if doc.needs_ocr(i)]
+        page_words = {i: doc.words(i) for i in range(count) if i not in ocr_pages}
+        t.ms.setdefault("render", 0.0)
+        t.ms.setdefault("ocr", 0.0)
+        fz = doc._fitz()
+        for i in ocr_pages if fz is not None else []:
+            with t("render"):
+                page = fz[i]
+                pix = _render_page(page, _choose_zoom(page))
+            with t("ocr"):
+                page_words[i] = _ocr_pixmap(pix, f"{pdf} p{i + 1}")
+            del pix
+    t.ms.setdefault("rows", 0.0)
+    t.ms.setdefault("items", 0.0)
+    for i in sorted(page_words):
+        words = page_words[i]
+        with t("rows"):
+            rows = _cluster_rows(words, y_tol=7)
+        with t("items"):
+            nums = _Numbers(words)
+            _extract_rows(words, rows, require_header=True, nums_col=nums) or \
+                _extract_rows(words, rows, require_header=False, nums_col=nums)
+
+    with t("extract"):
+        result = run_extraction(pdf)
+    with t("header"):
+        parse_header_fields(result["raw_text"])
+    with SessionLocal() as db:
+        with t("db_write"):
+            inv = Invoice(source_file=os.path.basename(pdf), needs_review=1)
+            db.add(inv)
+            apply_extraction(db, inv, result)
+            db.commit()
+        db.delete(inv)
+        db.commit()
+    return t.ms
+
+
+def _upload_once(client: Any, data: bytes, name: str, timeout: float = 600) -> float:
+    t0 = time.perf_counter()
+    r = client.post("/upload", files={"file": (name, data, "application/pdf")})
+    r.raise_for_status()
+    invoice_id = r.json()["id"]
+    while True:
+        job = client.get(f"/jobs/{invoice_id}").json()
+        if job["status"] in ("done", "failed"):
+            break
+        if time.perf_counter() - t0 > timeout:
+            raise TimeoutError(f"{name}: extraction not finished after {timeout}s")
+        time.sleep(0.005)
+    ms = 1000 * (time.perf_counter() - t0)
+    client.delete(f"/invoices/{invoice_id}")
+    if job["status"] != "done":
+        raise RuntimeError(f"{name}: extraction failed: {job.get('error')}")
+    return ms
+
+
+def _num_eq(a: Any, b: Any) -> bool:
+    return a is not None and b is not None and abs(float(a) - float(b)) < 0.005
+
+
+def _norm(s: Any) -> str:
+    return " ".join(str(s or "").split()).casefold()
+
+
+def accuracy(result: Dict[str, Any], truth: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Kopf: Anteil korrekter Felder (Nummer/Lieferant ohne Groß-/Kleinschreibung, Betrag auf den Cent).
+    Positionen: Zuordnung über die Zeilensumme (in Reihenfolge, jede höchstens einmal);
+    precision/recall darauf, Feldgenauigkeit nur über die zugeordneten Positionen.
+    """
+    parsed = result["parsed"]
+    header = {}
+    for f in HEADER_FIELDS:
+        got, want = parsed.get(f), truth[f]
+        if f == "total_amount":
+            header[f] = _num_eq(got, want)
+        elif f == "invoice_date":
+            header[f] = got is not None and str(got) == want
+        else:
+            header[f] = _norm(got) == _norm(want)
+
+    by_total: Dict[int, List[int]] = {}
+    for k, it in enumerate(result["items"]):
+        if it.get("line_total") is not None:
+            by_total.setdefault(round(float(it["line_total"]) * 100), []).append(k)
+    matched = 0
+    fields = {"description": 0, "quantity": 0, "unit_price": 0}
+    for want in truth["items"]:
+        candidates = by_total.get(round(want["line_total"] * 100))
+        if not candidates:
+            continue
+        got = result["items"][candidates.pop(0)]
+        matched += 1
+        fields["description"] += _norm(got.get("description")) == _norm(want["description"])
+        fields["quantity"] += _num_eq(got.get("quantity"), want["quantity"])
+        fields["unit_price"] += _num_eq(got.get("unit_price"), want["unit_price"])
+
+    n_got, n_want = len(result["items"]), len(truth["items"])
+    return {
+        "header": round(sum(header.values()) / len(header), 4),
+        "header_fields": header,
+        "items_found": n_got,
+        "items_expected": n_want,
+        "item_precision": round(matched / n_got, 4) if n_got else 0.0,
+        "item_recall": round(matched / n_want, 4) if n_want else 1.0,
+        "item_fields": {k: round(v / matched, 4) if matched else 0.0 for k, v in fields.items()},
+    }
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        root = pathlib.Path(__file__).resolve().parents[2]
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "backend/app"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except Exception:
+        return None
+
+
+def _meta(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.extraction import ocr
+    try:
+        from app.extraction.ocr_engine import get_engine
+        engine = get_engine().name
+    except Exception as exc:
+        engine = f"unavailable ({exc})"
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "profile": args.profile,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "ocr_engine": engine,
+        "ocr_workers": ocr.OCR_WORKERS,
+        "ocr_table_crop": ocr.OCR_TABLE_CROP,
+        "ocr_min_zoom": ocr.OCR_MIN_ZOOM,
+    }
+
+
+def _summary(docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for kind in sorted({d["kind"] for d in docs}):
+        group = [d for d in docs if d["kind"] == kind]
+        out[kind] = {
+            "docs": len(group),
+            "pages": sum(d["pages"] for d in group),
+            "stages_ms": {
+                s: round(sum(d["stages_ms"][s] for d in group if s in d["stages_ms"]), 3)
+                for s in STAGES if any(s in d["stages_ms"] for d in group)
+            },
+            "header": round(statistics.mean(d["accuracy"]["header"] for d in group), 4),
+            "item_precision": round(statistics.mean(d["accuracy"]["item_precision"] for d in group), 4),
+            "item_recall": round(statistics.mean(d["accuracy"]["item_recall"] for d in group), 4),
+        }
+    return out
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="invoice-bench-")
+    _isolate_db(workdir)
+    cases = build(args.profile, args.seed, args.corpus, scans=not args.no_scans)
+
+    from app.pipeline import run_extraction
+    from app.schema import ensure_schema
+    from app.db import engine
+    ensure_schema(engine)
+
+    docs: List[Dict[str, Any]] = []
+    for case in cases:
+        runs = [_stages_once(case["pdf"]) for _ in range(args.repeat)]
+        stages = {s: round(statistics.median(r[s] for r in runs), 3) for s in runs[0]}
+        docs.append({
+            "name": case["name"], "kind": case["kind"], "pages": case["pages"], "items": case["items"],
+            "stages_ms": stages,
+            "accuracy": accuracy(run_extraction(case["pdf"]), case["truth"]),
+        })
+        print(f"{case['name']:24} extract {stages['extract']:9.1f} ms  "
+              f"header {docs[-1]['accuracy']['header']:.2f}  "
+              f"items P/R {docs[-1]['accuracy']['item_precision']:.2f}/{docs[-1]['accuracy']['item_recall']:.2f}",
+              file=sys.stderr)
+
+    if not args.no_upload:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        with TestClient(app) as client:
+            for doc, case in zip(docs, cases):
+                data = pathlib.Path(case["pdf"]).read_bytes()
+                # je Wiederholung andere Bytes (Kommentar nach %%EOF) → kein Extraktions-Cache-Treffer
+                times = [_upload_once(client, data + f"\n%bench-{r}\n".encode(), f"{case['name']}.pdf")
+                         for r in range(args.repeat)]
+                doc["stages_ms"]["upload"] = round(statistics.median(times), 3)
+
+    return {"meta": _meta(args), "docs": docs, "summary": _summary(docs)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stufen-Timings + Genauigkeit auf dem synthetischen Korpus")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="standard")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--corpus", help="Korpus-Ordner (Standard: Temp-Ordner je Seed)")
+    parser.add_argument("--no-scans", action="store_true", help="nur born-digital (ohne Tesseract)")
+    parser.add_argument("--no-upload", action="store_true", help="Ende-zu-Ende über /upload auslassen")
+    parser.add_argument("--out", help="JSON-Datei (Standard: bench/results/<Zeit>-<git>.json)")
+    args = parser.parse_args(argv)
+    args.repeat = max(1, args.repeat)
+
+    report = run(args)
+    out = pathlib.Path(args.out) if args.out else RESULTS_DIR / (
+        f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{report['meta']['git'] or 'nogit'}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=1, default=str), encoding="utf-8")
+
+    print(f"{'kind':8} {'docs':>4} {'pages':>5} " + " ".join(f"{s:>10}" for s in STAGES) +
+          f" {'header':>6} {'item P':>6} {'item R':>6}")
+    for kind, s in report["summary"].items():
+        cols = " ".join(f"{s['stages_ms'].get(st, float('nan')):10.1f}" for st in STAGES)
+        print(f"{kind:8} {s['docs']:4d} {s['pages']:5d} {cols} "
+              f"{s['header']:6.2f} {s['item_precision']:6.2f} {s['item_recall']:6.2f}")
+    print(f"→ {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,8 @@ import sys, pathlib
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
 
 from app.db import engine
-from app.models import Base
+from app.schema import ensure_schema
 
 if __name__ == "__main__":
-    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
     print("tables created")
@@ -0,0 +1,207 @@
+"""
+Re-Extraktion gespeicherter Rechnungen nach Änderungen an rules.py / items_ocr.py.
+
+    python scripts/reprocess.py                         # alles, volle Extraktion
+    python scripts/reprocess.py --mode header           # nur Kopffelder aus gespeichertem Rohtext
+    python scripts/reprocess.py --needs-review 1 --from-id 1000 --workers 8
+    python scripts/reprocess.py --resume                # nach Abbruch weitermachen
+
+Manuell korrigierte Felder (PATCH /invoices/{id}) werden nicht überschrieben.
+"""
+import os
+import sys
+import time
+import pathlib
+import argparse
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# ---> macht den Ordner "backend" zum Import-Pfad
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from app.db import SessionLocal, engine
+from app.models import Invoice, InvoiceRawText
+from app.schema import ensure_schema
+from app.storage import storage_path
+from app.cache import put_cached, update_cached_header
+from app.pipeline import run_extraction, parse_header_fields, bulk_update_extractions
+from app.extraction.ocr_engine import init_engine
+
+log = logging.getLogger("invoice.reprocess")
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), ".reprocess.checkpoint")
+
+
+# --- Worker (laufen in eigenen Prozessen) ---
+def _full(invoice_id: int, path: str) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+    try:
+        return invoice_id, run_extraction(path), None
+    except Exception as exc:
+        return invoice_id, None, str(exc)[:500]
+
+
+def _header(invoice_id: int, raw_text: str) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+    try:
+        return invoice_id, {"raw_text": raw_text, "parsed": parse_header_fields(raw_text), "items": []}, None
+    except Exception as exc:
+        return invoice_id, None, str(exc)[:500]
+
+
+# --- Auswahl ---
+def select_ids(args) -> List[int]:
+    with SessionLocal() as db:
+        q = db.query(Invoice.id).filter(Invoice.source_file.isnot(None))
+        if args.from_id:
+            q = q.filter(Invoice.id >= args.from_id)
+        if args.to_id:
+            q = q.filter(Invoice.id <= args.to_id)
+        if args.needs_review in (0, 1):
+            q = q.filter(Invoice.needs_review == args.needs_review)
+        if args.date_from:
+            q = q.filter(Invoice.invoice_date >= args.date_from)
+        if args.date_to:
+            q = q.filter(Invoice.invoice_date <= args.date_to)
+        if args.after_id:
+            q = q.filter(Invoice.id > args.after_id)
+        return [i for (i,) in q.order_by(Invoice.id.asc())]
+
+
+def _task_args(db, ids: List[int], mode: str) -> List[Tuple[int, str]]:
+    if mode == "header":
+        rows = (
+            db.query(InvoiceRawText.invoice_id, InvoiceRawText.raw_text)
+            .filter(InvoiceRawText.invoice_id.in_(ids))
+            .order_by(InvoiceRawText.id.asc())
+        )
+        texts = {iid: txt or "" for iid, txt in rows}  # bei mehreren Einträgen gewinnt der neueste
+        return [(i, texts[i]) for i in ids if i in texts]
+    rows = db.query(Invoice.id, Invoice.source_file).filter(Invoice.id.in_(ids))
+    files = dict(rows)
+    return [(i, storage_path(files[i])) for i in ids if files.get(i)]
+
+
+def _write_batch(results: List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]], mode: str) -> int:
+    """Ergebnisse einer Batch in einer Transaktion schreiben. Rückgabe: Anzahl Fehler."""
+    errors = 0
+    with SessionLocal() as db:
+        invs = {inv.id: inv for inv in db.query(Invoice).filter(Invoice.id.in_([r[0] for r in results]))}
+        entries = []
+        for invoice_id, result, err in results:
+            inv = invs.get(invoice_id)
+            if inv is None:
+                continue  # inzwischen gelöscht
+            if result is None:
+                errors += 1
+                log.warning(f"Invoice {invoice_id}: {err}")
+                continue
+            entries.append((inv, result))
+        bulk_update_extractions(db, entries, header_only=(mode == "header"))
+        for inv, result in entries:
+            if mode == "header":
+                update_cached_header(db, inv.content_hash, result["parsed"])
+            else:
+                put_cached(db, inv.content_hash, result)
+        db.commit()
+    return errors
+
+
+def run(args) -> None:
+    ids = select_ids(args)
+    total = len(ids)
+    log.info(f"{total} invoices selected (mode={args.mode}, workers={args.workers})")
+    if not total:
+        return
+
+    worker = _header if args.mode == "header" else _full
+    done = errors = 0
+    started = time.monotonic()
+    batches = [ids[i:i + args.batch_size] for i in range(0, total, args.batch_size)]
+
+    ctx = multiprocessing.get_context("spawn")
+    # OCR läuft in den Worker-Prozessen – Engine dort beim Start wählen (Hauptthread des Workers)
+    initializer = init_engine if args.mode == "full" else None
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx, initializer=initializer) as pool:
+        # Sliding Window: die nächste Batch läuft schon, während die aktuelle geschrieben wird
+        window: Deque[Tuple[List[int], List[Future]]] = deque()
+
+        def _submit(batch: List[int]) -> None:
+            with SessionLocal() as db:
+                tasks = _task_args(db, batch, args.mode)
+            window.append((batch, [pool.submit(worker, *t) for t in tasks]))
+
+        it = iter(batches)
+        for batch in it:
+            _submit(batch)
+            if len(window) >= 2:
+                break
+
+        while window:
+            batch, futures = window.popleft()
+            nxt = next(it, None)
+            if nxt is not None:
+                _submit(nxt)
+            results = [f.result() for f in futures]
+            errors += _write_batch(results, args.mode)
+            done += len(batch)
+            _save_checkpoint(args.checkpoint, batch[-1])
+
+            elapsed = time.monotonic() - started
+            rate = done / elapsed if elapsed else 0.0
+            eta = (total - done) / rate if rate else 0.0
+            log.info(f"{done}/{total} ({100.0 * done / total:.1f}%) – {rate:.1f} docs/s, "
+                     f"{errors} errors, ETA {eta:.0f}s, last id {batch[-1]}")
+
+    _save_checkpoint(args.checkpoint, None)
+    log.info(f"Finished: {done} invoices in {time.monotonic() - started:.1f}s, {errors} errors")
+
+
+# --- Checkpoint (Wiederaufnahme) ---
+def _load_checkpoint(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0) or None
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path: str, last_id: Optional[int]) -> None:
+    if last_id is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(str(last_id))
+    os.replace(tmp, path)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Gespeicherte Rechnungen neu extrahieren")
+    parser.add_argument("--mode", choices=["full", "header"], default="full",
+                        help="full = PDF neu lesen (OCR/Positionen), header = nur rules.py auf gespeichertem Rohtext")
+    parser.add_argument("--from-id", type=int)
+    parser.add_argument("--to-id", type=int)
+    parser.add_argument("--needs-review", type=int, choices=[0, 1])
+    parser.add_argument("--date-from", help="invoice_date >= YYYY-MM-DD")
+    parser.add_argument("--date-to", help="invoice_date <= YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=50, help="Invoices pro Transaktion")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true", help="nach der letzten fertigen Batch weitermachen")
+    args = parser.parse_args(argv)
+    args.after_id = _load_checkpoint(args.checkpoint) if args.resume else None
+
+    logging.basicConfig(level=logging.INFO)
+    ensure_schema(engine)
+    if args.after_id:
+        log.info(f"Resuming after invoice {args.after_id}")
+    run(args)
+
+
+if __name__ == "__main__":
+    # Parallelität kommt hier aus den Dokumenten – kein zusätzlicher OCR-Pool je Worker
+    os.environ["OCR_WORKERS"] = "1"
+    main()
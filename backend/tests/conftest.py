@@ -0,0 +1,33 @@
+import os
+import sys
+import pathlib
+import tempfile
+
+import pytest
+
+# ---> macht den Ordner "backend" zum Import-Pfad (wie scripts/)
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+# eigene SQLite-Datei statt DATABASE_URL aus .env (app.db liest sie beim Import)
+_DB_DIR = tempfile.mkdtemp(prefix="invoice-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from app.db import engine
+    from app.schema import ensure_schema
+    ensure_schema(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    """Session auf der Test-DB; danach alle Tabellen leeren."""
+    from app.db import Base, SessionLocal
+    with SessionLocal() as session:
+        yield session
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
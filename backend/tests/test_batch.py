@@ -0,0 +1,65 @@
+import hashlib
+import io
+import os
+
+import pytest
+from sqlalchemy import event
+
+from app import batch, storage
+from app.batch import CREATED, DUPLICATE, FAILED, ingest_batch
+from app.cache import put_cached
+from app.models import Invoice, InvoiceItem
+
+PDF_A = b"%PDF-1.4\n% a\n"
+PDF_B = b"%PDF-1.4\n% b\n"
+RESULT_B = {
+    "raw_text": "Muster GmbH Rechnung RE-7",
+    "parsed": {"supplier_name": "Muster GmbH", "invoice_number": "RE-7"},
+    "items": [{"description": "Beratung", "line_total": 100.0}, {"description": "Reise", "line_total": 50.0}],
+}
+
+
+@pytest.fixture
+def queued(monkeypatch, tmp_path):
+    """Dateien in tmp_path statt storage/, Jobqueue nur mitschreiben."""
+    monkeypatch.setattr(storage, "STORAGE_DIR", str(tmp_path))
+    ids = []
+    monkeypatch.setattr(batch.job_queue, "submit_all", lambda invoice_ids, name="": ids.extend(invoice_ids))
+    return ids
+
+
+def _uploads(*files):
+    return [(name, io.BytesIO(data)) for name, data in files]
+
+
+def test_batch_single_transaction(db, queued, tmp_path):
+    put_cached(db, hashlib.sha256(PDF_B).hexdigest(), RESULT_B)
+    db.commit()
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(1))
+
+    results = ingest_batch(db, _uploads(("a.pdf", PDF_A), ("b.pdf", PDF_B), ("c.txt", b"hello"), ("a2.pdf", PDF_A)))
+
+    by_name = {r.filename: r for r in results}
+    assert [r.status for r in results] == [CREATED, CREATED, FAILED, DUPLICATE]
+    assert len(commits) == 1
+    assert by_name["a.pdf"].job_status == "pending" and queued == [by_name["a.pdf"].invoice_id]
+    assert by_name["b.pdf"].job_status == "done"
+    assert by_name["a2.pdf"].invoice_id == by_name["a.pdf"].invoice_id
+    cached = db.get(Invoice, by_name["b.pdf"].invoice_id)
+    assert (cached.status, cached.supplier_name) == ("done", "Muster GmbH")
+    assert db.query(InvoiceItem).filter_by(invoice_id=cached.id).count() == 2
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_batch_db_error_fails_all_and_removes_files(db, queued, tmp_path, monkeypatch):
+    def broken(db, hashes):
+        raise RuntimeError("simulated DB error")
+
+    monkeypatch.setattr(batch, "get_cached_many", broken)
+    results = ingest_batch(db, _uploads(("a.pdf", PDF_A), ("b.pdf", PDF_B)))
+
+    assert [(r.status, r.invoice_id, r.reason) for r in results] == [(FAILED, None, "simulated DB error")] * 2
+    assert queued == []
+    assert db.query(Invoice).count() == 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,58 @@
+import threading
+
+from app import pipeline
+from app.cache import get_cached, put_cached
+from app.db import SessionLocal
+from app.models import ExtractionCache, Invoice
+from app.pipeline import STATUS_DONE, STATUS_PENDING, process_invoice
+
+HASH = "ab" * 32
+RESULT = {
+    "raw_text": "Muster GmbH\nRechnungsnummer: RE-1\nGesamtbetrag 119,00 EUR",
+    "parsed": {"supplier_name": "Muster GmbH", "invoice_number": "RE-1", "total_amount": 119.0},
+    "items": [{"description": "Beratung", "quantity": 1.0, "unit_price": 100.0, "line_total": 100.0}],
+}
+
+
+def test_put_cached_upserts(db):
+    put_cached(db, HASH, RESULT)
+    db.commit()
+    put_cached(db, HASH, {**RESULT, "raw_text": "neu"})
+    db.commit()
+    assert db.query(ExtractionCache).count() == 1
+    assert get_cached(db, HASH)["raw_text"] == "neu"
+
+
+def test_put_cached_skips_partial_results(db):
+    put_cached(db, HASH, {**RESULT, "ocr_errors": {1: "tesseract exploded"}})
+    db.commit()
+    assert get_cached(db, HASH) is None
+
+
+def test_concurrent_jobs_same_hash(db, monkeypatch):
+    # beide Jobs extrahieren, bevor einer cacht → beide schreiben denselben Hash
+    barrier = threading.Barrier(2, timeout=10)
+
+    def run_extraction(path):
+        barrier.wait()
+        return dict(RESULT)
+
+    monkeypatch.setattr(pipeline, "run_extraction", run_extraction)
+    invoices = [Invoice(source_file=f"{i}.pdf", content_hash=HASH, status=STATUS_PENDING, needs_review=1)
+                for i in range(2)]
+    db.add_all(invoices)
+    db.commit()
+    ids = [inv.id for inv in invoices]
+
+    def job(invoice_id):
+        with SessionLocal() as session:
+            process_invoice(session, invoice_id, f"/nonexistent/{invoice_id}.pdf")
+
+    threads = [threading.Thread(target=job, args=(i,)) for i in ids]
+    [t.start() for t in threads]
+    [t.join(timeout=30) for t in threads]
+
+    db.expire_all()
+    statuses = [(db.get(Invoice, i).status, db.get(Invoice, i).extraction_error) for i in ids]
+    assert statuses == [(STATUS_DONE, None), (STATUS_DONE, None)]
+    assert db.query(ExtractionCache).count() == 1
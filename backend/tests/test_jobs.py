@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from app.jobs import JobQueue, QueueFull
+
+
+@pytest.fixture
+def blocked(monkeypatch):
+    """Jobs laufen erst weiter, wenn das Event gesetzt wird; erledigte IDs landen in done."""
+    release, done = threading.Event(), []
+
+    def run(invoice_id):
+        release.wait(10)
+        done.append(invoice_id)
+
+    monkeypatch.setattr(JobQueue, "_run", staticmethod(run))
+    return release, done
+
+
+def _fill(q):
+    q.submit(1)
+    time.sleep(0.1)  # Worker hat Job 1 geholt und hängt darin
+    q.submit(2)
+    q.submit(3)
+    with pytest.raises(QueueFull):
+        q.submit(4)
+
+
+def test_stop_with_full_queue_does_not_block(blocked):
+    release, done = blocked
+    q = JobQueue(workers=1, maxsize=2)
+    q.start()
+    _fill(q)
+
+    t0 = time.perf_counter()
+    threading.Timer(0.2, release.set).start()
+    q.stop(timeout=5)
+    # laufender Job wird fertig, die wartenden bleiben liegen (pending in der DB → recover)
+    assert time.perf_counter() - t0 < 2
+    assert done == [1]
+
+
+def test_stop_returns_while_job_hangs(blocked):
+    release, _ = blocked
+    q = JobQueue(workers=2, maxsize=2)
+    q.start()
+    q.submit(1)
+    q.submit(2)
+    time.sleep(0.1)
+    q.submit(3)
+    q.submit(4)
+
+    t0 = time.perf_counter()
+    q.stop(timeout=0.2)
+    assert time.perf_counter() - t0 < 1
+    release.set()
+
+
+def test_stop_ends_feeder(blocked):
+    release, done = blocked
+    q = JobQueue(workers=1, maxsize=1)
+    q.start()
+    q.submit_all(list(range(1, 50)), name="test-feed")
+    time.sleep(0.2)
+    threading.Timer(0.2, release.set).start()
+    q.stop(timeout=5)
+    time.sleep(0.7)  # Feeder wartet höchstens einen put-Timeout lang
+    assert not [t for t in threading.enumerate() if t.name == "test-feed"]
+    assert done == [1]
@@ -0,0 +1,36 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.extraction import ocr
+
+
+def _wait_until(cond, timeout=10.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_retired_pool_lets_other_jobs_finish(monkeypatch):
+    pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+    monkeypatch.setattr(ocr, "_pool", pool)
+    procs = []
+    hung = ocr._submit(pool, time.sleep, 60)        # Job A: hängt
+    assert ocr._submit(pool, pow, 2, 10).result(timeout=30) == 1024
+    busy = ocr._submit(pool, time.sleep, 1.0)       # Job B: läuft noch, während A aufgibt
+    assert _wait_until(lambda: busy.running())
+    procs += pool._processes.values()
+
+    ocr._retire_pool(pool, [hung])
+
+    # neue Aufträge gehen an einen neuen Pool, B's laufender Auftrag wird auf dem alten fertig
+    assert ocr._pool is None
+    assert busy.result(timeout=30) is None
+    assert not busy.cancelled()
+    # danach wird der alte Pool samt hängendem Worker beendet
+    assert _wait_until(lambda: all(not p.is_alive() for p in procs))
+    assert hung.done()
+    assert pool not in ocr._inflight
@@ -0,0 +1,72 @@
+"""parse_header (ein Durchlauf) muss dieselben Felder liefern wie die einzelnen Parser."""
+import random
+
+import pytest
+
+from app.extraction.rules import (
+    parse_header, guess_supplier, parse_date, parse_invoice_number, parse_amount,
+)
+
+
+def _legacy(raw_text: str) -> dict:
+    # so hat pipeline.parse_header_fields vor parse_header gearbeitet
+    parsed = {
+        "supplier_name": guess_supplier(raw_text),
+        "invoice_date": parse_date(raw_text),
+        "invoice_number": parse_invoice_number(raw_text),
+    }
+    amt = parse_amount(raw_text)
+    if amt:
+        parsed["total_amount"], parsed["currency"] = amt[0], amt[1]
+    return parsed
+
+
+HEADERS = [
+    "",
+    "   \n\n  ",
+    "Muster GmbH\nRechnungsnummer: RE-2025-001\nDatum 31.01.2025\nGesamtbetrag 25,00 EUR",
+    "Becker & Sohn KG\nIndustriestraße 12\n\nRechnung Nr. 4711/2024\n1.2.24\nSumme 1.234,56 €\nTotal 1.300,00",
+    "ACME Corp.\nInvoice Number: INV-00042\nDate: 2024-11-05\nAmount due $ 99.95\nUSD",
+    "Weber Elektro OHG\nInvoice# 2024/77\n05-03-2024\nGesamt 10,00 CHF 12,50",
+    "Rechnung\nKundennummer 12345 GmbH\nLorenz Technik\nDatum: 3. März 2025\nBetrag 17,80",
+    "Vogel Sanitär e.K.\n\nBeleg-Nr: B-9981\n15. Dezember 2023\nNetto 100,00\nBrutto 119,00",
+    "kein Kopf hier\nnur Positionen 1,00 2,00 3,00\nAB-1234",
+    "HANSEN BAU AG\nRNR 2025-0007 rechnungsnummer\n99.99.2025\n31.02.2024\nGesamtsumme 0,00",
+    "Krause Metallbau GmbH\r\nRechnung-Nr.:\tRM-2024-15\r\nLieferdatum 12.12.12\r\nRechnungsbetrag: 2.500,00 EUR",
+    "\n".join(f"Zeile {i}" for i in range(20)) + "\nMeyer GmbH\nGesamtbetrag 5,00",
+    "Invoice no. 1\ninvoice number\nrechnungsnummer ab\nTotal: 12.000.000,01 euro",
+    "Firma Brandt Holzhandel KG / Rechnung\nBrandt Holzhandel\nDatum 7. Sept. 2025\nSumme 7,00 7,50 EUR",
+]
+
+
+@pytest.mark.parametrize("text", HEADERS)
+def test_parse_header_matches_single_parsers(text):
+    assert parse_header(text).as_dict() == _legacy(text)
+
+
+_PIECES = [
+    "Muster GmbH", "Becker & Sohn KG", "Rechnung", "Invoice", "Kundennummer 4711", "ACME Ltd",
+    "Rechnungsnummer: RE-2024-{n}", "Invoice number {n}", "rnr {n}/24", "Beleg-Nr. B{n}",
+    "Datum {d}.{m}.20{y}", "{d}-{m}-20{y}", "20{y}-{m}-{d}", "{d}. Januar 20{y}", "{d}. Okt. 20{y}",
+    "Summe {a},{c} €", "Gesamtbetrag {a}.{a},{c} EUR", "Total {a}.{c}", "Betrag {a},{c}", "CHF", "$",
+    "Schraube 10 1,50 15,00", "AB-{n}", "", "   ", "Straße 12, 20095 Hamburg",
+]
+
+
+def _random_header(rnd: random.Random) -> str:
+    lines = []
+    for _ in range(rnd.randint(1, 18)):
+        piece = rnd.choice(_PIECES)
+        lines.append(piece.format(
+            n=rnd.randint(1, 99999), d=rnd.randint(1, 35), m=rnd.randint(1, 13),
+            y=rnd.randint(10, 30), a=rnd.randint(0, 999), c=rnd.randint(0, 99),
+        ))
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_parse_header_matches_single_parsers_random(seed):
+    rnd = random.Random(seed)
+    for _ in range(100):
+        text = _random_header(rnd)
+        assert parse_header(text).as_dict() == _legacy(text), text
@@ -0,0 +1,116 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+
+from app import search
+from app.db import AsyncSessionLocal, async_engine
+from app.models import Invoice, InvoiceRawText
+from app.search import SQLITE_FTS_TABLE, ensure_search_index, search_invoices
+
+FILLER = "Vielen Dank für Ihren Auftrag. Zahlbar innerhalb von 14 Tagen ohne Abzug. " * 4
+
+
+def _search(q, limit=10, offset=0, with_total=True):
+    async def run():
+        try:
+            async with AsyncSessionLocal() as db:
+                return await search_invoices(db, q, limit=limit, offset=offset, with_total=with_total)
+        finally:
+            # jede asyncio.run-Schleife braucht frische Verbindungen
+            await async_engine.dispose()
+    return asyncio.run(run())
+
+
+def _add(db, supplier, raw_text):
+    inv = Invoice(supplier_name=supplier, status="done", needs_review=0)
+    db.add(inv)
+    db.flush()
+    db.add(InvoiceRawText(invoice_id=inv.id, raw_text=raw_text))
+    db.commit()
+    return inv.id
+
+
+def _ids(hits):
+    return [h["invoice_id"] for h in hits]
+
+
+def test_fts5_index_is_used(engine):
+    assert search._backend == "sqlite"
+
+
+def test_bm25_ranking_and_snippet(db):
+    once = _add(db, "Einmal GmbH", FILLER + "Wartung Heizungsanlage" + FILLER)
+    often = _add(db, "Oft GmbH", "Wartung Wartung Wartung der Heizung")
+    _add(db, "Andere GmbH", "Lieferung Büromaterial")
+
+    hits, total = _search("wartung")
+    assert _ids(hits) == [often, once]
+    assert total == 2
+    assert hits[0]["score"] > hits[1]["score"]
+    assert hits[0]["supplier_name"] == "Oft GmbH"
+    # Ausschnitt um den ersten Treffer, gekürzt mit "…" an beiden Enden
+    snippet = hits[1]["snippet"]
+    assert "Wartung Heizungsanlage" in snippet
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert len(snippet) <= search.SNIPPET_BEFORE + search.SNIPPET_AFTER + 2
+
+
+def test_all_terms_and_prefix_of_last(db):
+    match = _add(db, "A", "Wartung Heizungsanlage Keller")
+    _add(db, "B", "Wartung Lüftung")
+    hits, _ = _search("wartung heiz")
+    assert _ids(hits) == [match]
+    # Operatoren im Suchtext sind normale Wörter
+    assert _search("wartung OR lüftung")[0] == []
+
+
+def test_pagination_and_total(db):
+    ids = [_add(db, f"L{i}", f"Reparatur Nummer {i}") for i in range(5)]
+    seen = []
+    for offset in (0, 2, 4):
+        hits, total = _search("reparatur", limit=2, offset=offset)
+        assert total == 5
+        seen += _ids(hits)
+    assert sorted(seen) == sorted(ids)
+    assert len(_search("reparatur", limit=2, offset=4)[0]) == 1
+    assert _search("reparatur", with_total=False)[1] is None
+
+
+def test_triggers_keep_index_in_sync(db, engine):
+    invoice_id = _add(db, "T", "Kalibrierung Messgerät")
+    assert _ids(_search("kalibrierung")[0]) == [invoice_id]
+
+    row = db.query(InvoiceRawText).filter_by(invoice_id=invoice_id).one()
+    row.raw_text = "Montage Regalsystem"
+    db.commit()
+    assert _search("kalibrierung")[0] == []
+    assert _ids(_search("montage")[0]) == [invoice_id]
+
+    db.delete(row)
+    db.commit()
+    assert _search("montage")[0] == []
+    with engine.begin() as conn:
+        # FTS5 meldet Abweichungen zwischen Index und Inhaltstabelle als Fehler
+        conn.execute(text(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('integrity-check')"))
+
+
+def test_like_fallback_without_fts5(db, monkeypatch, tmp_path):
+    # SQLite ohne FTS5: das Anlegen der virtuellen Tabelle schlägt fehl
+    monkeypatch.setattr(search, "_SQLITE_DDL", [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE}_x USING fts_missing(raw_text)",
+    ])
+    monkeypatch.setattr(search, "_backend", "sqlite")
+    ensure_search_index(create_engine(f"sqlite:///{tmp_path}/nofts.db"))
+    assert search._backend == "like"
+
+    first = _add(db, "A", "Wartung Heizung")
+    second = _add(db, "B", "Heizung Wartung_Sonder")
+    _add(db, "C", "Lieferung")
+    hits, total = _search("wartung")
+    # ohne Relevanz: neueste zuerst, Score 0
+    assert _ids(hits) == [second, first]
+    assert total == 2
+    assert {h["score"] for h in hits} == {0.0}
+    assert "Wartung" in hits[0]["snippet"]
+    # "_" ist im LIKE-Muster kein Platzhalter
+    assert _ids(_search("wartung_sonder")[0]) == [second]
@@ -0,0 +1,61 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from app import storage
+from app.storage import NotAPdf, UploadTooLarge, save_upload
+
+PDF = b"%PDF-1.4\n" + b"x" * 100
+
+
+@pytest.fixture
+def dirs(monkeypatch, tmp_path):
+    files = tmp_path / "storage"
+    files.mkdir()
+    monkeypatch.setattr(storage, "STORAGE_DIR", str(files))
+    monkeypatch.setattr(storage, "UPLOAD_TMP_DIR", "")
+    return files, tmp_path / ".upload-tmp"
+
+
+class _Spy(io.BytesIO):
+    """Merkt sich beim Lesen, was gerade in STORAGE_DIR und im Temp-Ordner liegt."""
+
+    def __init__(self, data, files, tmp):
+        super().__init__(data)
+        self.files, self.tmp, self.seen = files, tmp, []
+
+    def read(self, size=-1):
+        self.seen.append((sorted(os.listdir(self.files)), sorted(os.listdir(self.tmp))))
+        return super().read(size)
+
+
+def test_partial_upload_not_in_storage_dir(dirs):
+    files, tmp = dirs
+    src = _Spy(PDF, files, tmp)
+    name, digest = save_upload(src)
+
+    assert src.seen and all(not served and len(partial) == 1 for served, partial in src.seen)
+    assert os.listdir(files) == [name]
+    assert os.listdir(tmp) == []
+    assert digest == hashlib.sha256(PDF).hexdigest()
+    assert (files / name).read_bytes() == PDF
+
+
+@pytest.mark.parametrize("data, exc", [(b"kein pdf", NotAPdf), (b"", NotAPdf), (PDF, UploadTooLarge)])
+def test_rejected_upload_leaves_nothing(dirs, data, exc):
+    files, tmp = dirs
+    with pytest.raises(exc):
+        save_upload(io.BytesIO(data), max_bytes=10)
+    assert os.listdir(files) == []
+    assert os.listdir(tmp) == []
+
+
+def test_upload_tmp_dir_from_env(dirs, monkeypatch, tmp_path):
+    files, _ = dirs
+    custom = tmp_path / "custom"
+    monkeypatch.setattr(storage, "UPLOAD_TMP_DIR", str(custom))
+    name, _ = save_upload(io.BytesIO(PDF))
+    assert custom.is_dir() and os.listdir(custom) == []
+    assert os.listdir(files) == [name]
@@ -0,0 +1,34 @@
+import io
+
+import pytest
+from fastapi import HTTPException, Response, UploadFile
+
+from app import main, profiling, storage
+from app.jobs import QueueFull
+from app.models import Invoice
+
+PDF = b"%PDF-1.4\n% upload\n"
+
+
+@pytest.fixture
+def full_queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "STORAGE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "geheim")
+
+    def submit(invoice_id):
+        raise QueueFull()
+
+    monkeypatch.setattr(main.job_queue, "submit", submit)
+    return tmp_path
+
+
+def test_queue_full_drops_profile_request(db, full_queue):
+    with pytest.raises(HTTPException) as exc:
+        main.upload_invoice(
+            Response(), file=UploadFile(io.BytesIO(PDF), filename="a.pdf"),
+            profile=True, x_profile=None, x_admin_token="geheim", db=db,
+        )
+    assert exc.value.status_code == 503
+    assert profiling._requested == set()
+    assert db.query(Invoice).count() == 0
+    assert list(full_queue.iterdir()) == []
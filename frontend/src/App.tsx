@@ -5,12 +5,17 @@ import EditModal from "./components/EditModal";
 import Toast from "./components/Toast";
 import PreviewDrawer from "./components/PreviewDrawer";
 
+const PAGE_SIZE = 100;
+const REFRESH_MAX = 1000; // = max. limit von GET /invoices
+
 type SortKey = "id" | "supplier_name" | "invoice_date" | "total_amount" | "extraction_confidence";
 
 export default function App() {
   const [invoices, setInvoices] = useState<Invoice[]>([]);
+  const [nextAfterId, setNextAfterId] = useState<number | null>(null);
+  const [totalCount, setTotalCount] = useState<number | null>(null);
   const [needs, setNeeds] = useState<"" | "0" | "1">("");
-  const [file, setFile] = useState<File | null>(null);
+  const [files, setFiles] = useState<File[]>([]);
   const [loading, setLoading] = useState(false);
   const [toast, setToast] = useState<{kind: "success"|"error"|"info"; text: string} | null>(null);
   const [editing, setEditing] = useState<Invoice | null>(null);
@@ -30,27 +35,71 @@ export default function App() {
 
   const load = useCallback(async () => {
     const n = needs === "" ? undefined : (Number(needs) as 0 | 1);
-    const data = await fetchInvoices(n);
-    setInvoices(data);
+    const page = await fetchInvoices(n, undefined, PAGE_SIZE);
+    setInvoices(page.items);
+    setNextAfterId(page.nextAfterId);
+    setTotalCount(page.total);
     setLastLoadedAt(new Date());
   }, [needs]);
 
+  const loadMore = useCallback(async () => {
+    if (nextAfterId == null) return;
+    const n = needs === "" ? undefined : (Number(needs) as 0 | 1);
+    const page = await fetchInvoices(n, nextAfterId, PAGE_SIZE);
+    setInvoices(prev => [...prev, ...page.items]);
+    setNextAfterId(page.nextAfterId);
+  }, [needs, nextAfterId]);
+
   useEffect(() => { load(); }, [load]);
 
+  // Polling: alle bisher geladenen Seiten in einem Request auffrischen – "Mehr laden" bleibt erhalten.
+  // Mehr als REFRESH_MAX Zeilen: der Rest bleibt wie geladen (offene Jobs stehen ohnehin oben).
+  const refresh = useCallback(async () => {
+    const n = needs === "" ? undefined : (Number(needs) as 0 | 1);
+    const page = await fetchInvoices(n, undefined, Math.min(REFRESH_MAX, Math.max(PAGE_SIZE, invoices.length)));
+    const last = page.items.length ? page.items[page.items.length - 1].id : null;
+    const rest = last == null ? [] : invoices.filter(i => i.id < last);
+    setInvoices([...page.items, ...rest]);
+    if (!rest.length) setNextAfterId(page.nextAfterId);
+    setTotalCount(page.total);
+    setLastLoadedAt(new Date());
+  }, [needs, invoices]);
+
+  // Extraktion läuft im Hintergrund → solange etwas offen ist, periodisch nachladen
+  const hasOpenJobs = useMemo(
+    () => invoices.some(i => i.status === "pending" || i.status === "processing"),
+    [invoices]
+  );
+  useEffect(() => {
+    if (!hasOpenJobs) return;
+    const t = setTimeout(() => { refresh(); }, 2000);
+    return () => clearTimeout(t);
+  }, [hasOpenJobs, refresh]);
+
   const onUpload = async (e: React.FormEvent) => {
     e.preventDefault();
-    if (!file) { setToast({kind:"info", text:"Bitte PDF auswählen"}); return; }
+    if (!files.length) { setToast({kind:"info", text:"Bitte PDF auswählen"}); return; }
     try {
       setLoading(true);
       const fd = new FormData();
-      fd.append("file", file);
-      const res = await api.post("/upload", fd);
-      console.log("Upload response:", res.data);
-      setToast({kind:"success", text:"Upload erfolgreich"});
-      setFile(null);
+      if (files.length === 1 && !files[0].name.toLowerCase().endsWith(".zip")) {
+        fd.append("file", files[0]);
+        const res = await api.post("/upload", fd);
+        console.log("Upload response:", res.data);
+        setToast({kind:"success", text:"Upload angenommen – Extraktion läuft"});
+      } else {
+        // mehrere Dateien → ein Batch-Request, Ergebnis je Datei
+        files.forEach(f => fd.append("files", f));
+        const res = await api.post<{filename: string; status: string}[]>("/upload/batch", fd);
+        const created = res.data.filter(r => r.status === "created").length;
+        const failed = res.data.filter(r => r.status === "failed").length;
+        setToast({
+          kind: failed ? "info" : "success",
+          text: `${created} angelegt (Extraktion läuft), ${res.data.length - created - failed} Duplikate, ${failed} fehlgeschlagen`,
+        });
+      }
+      setFiles([]);
       await load();
-      // kurze Refresh-Schleife, falls DB-Commit minimal verzögert sichtbar wird
-      setTimeout(() => { load(); }, 300);
     } catch (err) {
       console.error("Upload fehlgeschlagen", err);
       setToast({kind:"error", text:"Upload fehlgeschlagen"});
@@ -127,13 +176,13 @@ export default function App() {
   }, [invoices, q, sortBy, sortDir]);
 
   const stats = useMemo(() => {
-    const total = invoices.length;
+    const total = totalCount ?? invoices.length;
     const review = invoices.filter(i => i.needs_review === 1).length;
     const avgConf = invoices.length
       ? Math.round((invoices.map(i => i.extraction_confidence ?? 0).reduce((x,y)=>x+y,0) / invoices.length) * 10) / 10
       : 0;
     return { total, review, avgConf };
-  }, [invoices]);
+  }, [invoices, totalCount]);
 
   const lastUpdatedLabel = useMemo(() => {
     if (!lastLoadedAt) return "";
@@ -172,7 +221,7 @@ export default function App() {
               <option value="0">Nur OK</option>
             </select>
             <form onSubmit={onUpload} className="flex items-center gap-2">
-              <input type="file" accept="application/pdf" onChange={(e)=>setFile(e.target.files?.[0] ?? null)} />
+              <input type="file" multiple accept="application/pdf,application/zip" onChange={(e)=>setFiles(Array.from(e.target.files ?? []))} />
               <button disabled={loading} className="btn-primary">{loading ? "Lädt..." : "Hochladen"}</button>
             </form>
           </div>
@@ -235,7 +284,13 @@ export default function App() {
                     }>
                       {inv.extraction_confidence ?? "-"}
                     </td>
-                    <td>{inv.needs_review ? <span className="badge-review">Review</span> : <span className="badge-ok">OK</span>}</td>
+                    <td>
+                      {inv.status === "pending" || inv.status === "processing"
+                        ? <span className="badge-review">In Arbeit</span>
+                        : inv.status === "failed"
+                          ? <span className="badge-review">Fehler</span>
+                          : inv.needs_review ? <span className="badge-review">Review</span> : <span className="badge-ok">OK</span>}
+                    </td>
                     <td>
                       {inv.source_file ? (
                         <div className="flex gap-2">
@@ -266,6 +321,11 @@ export default function App() {
               </tbody>
             </table>
           </div>
+          {nextAfterId != null && (
+            <div className="mt-3 text-center">
+              <button className="btn-secondary" onClick={loadMore}>Mehr laden</button>
+            </div>
+          )}
         </div>
       </div>
 
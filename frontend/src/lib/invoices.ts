@@ -10,13 +10,28 @@ export type Invoice = {
   extraction_confidence?: number | null;
   needs_review?: number | null;
   source_file?: string | null; // <— NEU
+  status?: "pending" | "processing" | "done" | "failed" | null;
 };
 
 
-export async function fetchInvoices(needs?: 0 | 1) {
-  const url = needs === 0 || needs === 1 ? `/invoices?needs_review=${needs}` : "/invoices";
-  const res = await api.get<Invoice[]>(url);
-  return res.data;
+export type InvoicePage = {
+  items: Invoice[];
+  nextAfterId: number | null; // Cursor für die nächste Seite (null = Ende)
+  total: number | null;
+};
+
+export async function fetchInvoices(needs?: 0 | 1, afterId?: number, limit = 100): Promise<InvoicePage> {
+  const params: Record<string, string | number | boolean> = { limit, with_total: afterId == null };
+  if (needs === 0 || needs === 1) params.needs_review = needs;
+  if (afterId != null) params.after_id = afterId;
+  const res = await api.get<Invoice[]>("/invoices", { params });
+  const next = res.headers["x-next-after-id"];
+  const total = res.headers["x-total-count"];
+  return {
+    items: res.data,
+    nextAfterId: next ? Number(next) : null,
+    total: total != null ? Number(total) : null,
+  };
 }
 
 export async function patchInvoice(id: number, payload: Partial<Invoice>) {